@@ -0,0 +1,198 @@
+"""Preenche um banco vazio com volumes parecidos com os de produção, para os benchmarks.
+
+Os dados são gerados a partir de uma semente fixa: a mesma escala produz sempre o mesmo
+banco, então resultados de commits diferentes podem ser comparados. O banco semeado
+ganha a tabela MARCADOR; executar.py só mexe em bancos vazios ou que a tenham.
+"""
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+from db_context import get_connection
+
+# Quantidades com escala 1.0
+VOLUMES = {
+    'fornecedores': 2000,
+    'produtos': 60,
+    'compras': 30000,
+    'itens_por_compra': 4,
+    'debitos': 300000,
+    'movimentacoes': 300000,
+    'itens_por_movimentacao': 3,
+}
+DIAS_HISTORICO = 3 * 365
+LOTE = 5000  # linhas por executemany
+STATUS_COMPRA = ["Criada", "Emitindo nota", "Efetuando pagamento", "Finalizada", "Concluída"]
+
+MARCADOR = 'benchmark_sintetico'  # tabela que identifica um banco gerado por semear()
+PADRAO_NOME_BANCO = re.compile(r'bench|teste?', re.IGNORECASE)  # nomes aceitos sem --sim-apagar
+
+TABELAS = [
+    'itens_movimentacao', 'movimentacoes', 'saldos_movimentacoes_mensais', 'saldos_fornecedores',
+    'debitos_fornecedores', 'itens_compra', 'compras', 'dados_bancarios_fornecedor',
+    'ajustes_fixos_produto_fornecedor_categoria', 'categorias_fornecedor_por_fornecedor', 'produtos', 'fornecedores',
+]
+
+def _inserir(cursor, conn, sql, linhas):
+    for inicio in range(0, len(linhas), LOTE):
+        cursor.executemany(sql, linhas[inicio:inicio + LOTE])
+        conn.commit()
+
+def _centavos(rng, minimo, maximo):
+    return Decimal(rng.randint(int(minimo * 100), int(maximo * 100))) / 100
+
+def _consultar_um(sql, params=()):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+def nome_do_banco():
+    return _consultar_um("SELECT DATABASE()")
+
+def _tabela_existe(tabela):
+    return _consultar_um("""
+        SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s
+    """, (tabela,)) > 0
+
+def tem_marcador():
+    return _tabela_existe(MARCADOR)
+
+def banco_vazio():
+    """Sem fornecedores (ou ainda sem as tabelas do programa)."""
+    return not _tabela_existe('fornecedores') or _consultar_um("SELECT COUNT(*) FROM fornecedores") == 0
+
+def limpar():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for tabela in TABELAS:
+                cursor.execute(f"DELETE FROM {tabela}")
+            conn.commit()
+        finally:
+            cursor.close()
+
+def semear(escala=1.0, semente=42, ao_registrar=print):
+    """Gera os dados; o banco deve estar migrado e vazio. Devolve as quantidades inseridas."""
+    rng = random.Random(semente)
+    n = {k: max(1, int(v * escala)) if not k.startswith('itens_') else v for k, v in VOLUMES.items()}
+    hoje = date.today()
+    inicio = hoje - timedelta(days=DIAS_HISTORICO)
+
+    def dia():
+        return inicio + timedelta(days=rng.randrange(DIAS_HISTORICO + 1))
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Marca antes de inserir: um banco semeado pela metade também pode ser recriado
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {MARCADOR} (
+                    semente INT NOT NULL,
+                    escala DOUBLE NOT NULL,
+                    criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute(f"INSERT INTO {MARCADOR} (semente, escala) VALUES (%s, %s)", (semente, escala))
+            conn.commit()
+            ao_registrar(f"fornecedores: {n['fornecedores']}")
+            _inserir(cursor, conn, """
+                INSERT INTO fornecedores (id, nome, fornecedores_endereco, fornecedores_numerobalanca)
+                VALUES (%s, %s, %s, %s)
+            """, [(i, f"Fornecedor {i:05d}", f"Rua {i}, Centro", str(i)) for i in range(1, n['fornecedores'] + 1)])
+
+            _inserir(cursor, conn, "INSERT INTO produtos (id, nome, preco_base) VALUES (%s, %s, %s)",
+                     [(i, f"Produto {i:03d}", _centavos(rng, 0.5, 40)) for i in range(1, n['produtos'] + 1)])
+
+            # Categoria "Padrão" (id 1) e uma categoria própria por fornecedor
+            categorias = [(1, None, 'Padrão')] + [
+                (i + 1, i, f"Categoria {i}") for i in range(1, n['fornecedores'] + 1)
+            ]
+            _inserir(cursor, conn,
+                     "INSERT INTO categorias_fornecedor_por_fornecedor (id, fornecedor_id, nome) VALUES (%s, %s, %s)",
+                     categorias)
+            _inserir(cursor, conn, """
+                INSERT INTO ajustes_fixos_produto_fornecedor_categoria (produto_id, categoria_id, ajuste_fixo)
+                VALUES (%s, %s, %s)
+            """, [(p, c[0], _centavos(rng, -2, 2)) for c in categorias[:200] for p in range(1, n['produtos'] + 1)])
+
+            _inserir(cursor, conn, """
+                INSERT INTO dados_bancarios_fornecedor
+                    (fornecedor_id, nome_conta, banco, CPFouCNPJ, agencia, conta, padrao)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [(i, f"Conta {i}", "Banco", f"{i:011d}", "0001", f"{i:06d}-0", 1)
+                  for i in range(1, n['fornecedores'] + 1)])
+
+            ao_registrar(f"compras: {n['compras']}")
+            compras, itens, debitos = [], [], []
+            for compra_id in range(1, n['compras'] + 1):
+                fornecedor_id = rng.randint(1, n['fornecedores'])
+                data_compra = dia()
+                linhas = [(compra_id, rng.randint(1, n['produtos']), rng.randint(1, 500), _centavos(rng, 0.5, 40))
+                          for _ in range(rng.randint(1, 2 * n['itens_por_compra'] - 1))]
+                total = sum(q * p for _, _, q, p in linhas)
+                abatimento = _centavos(rng, 0, float(total) / 4) if rng.random() < 0.3 else Decimal("0")
+                status = STATUS_COMPRA[-1] if data_compra < hoje - timedelta(days=60) else rng.choice(STATUS_COMPRA)
+                compras.append((compra_id, fornecedor_id, data_compra, abatimento, total, status))
+                itens.extend(linhas)
+                if abatimento:
+                    debitos.append((fornecedor_id, compra_id, data_compra, "Abatimento na compra", abatimento,
+                                    'abatimento'))
+                elif rng.random() < 0.1:
+                    debitos.append((fornecedor_id, compra_id, data_compra, "Adiantamento na compra",
+                                    _centavos(rng, 10, 500), 'inclusao'))
+            _inserir(cursor, conn, """
+                INSERT INTO compras (id, fornecedor_id, data_compra, valor_abatimento, total, status)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, compras)
+            ao_registrar(f"itens_compra: {len(itens)}")
+            _inserir(cursor, conn, """
+                INSERT INTO itens_compra (compra_id, produto_id, quantidade, preco_unitario)
+                VALUES (%s, %s, %s, %s)
+            """, itens)
+
+            # Lançamentos manuais completam o volume de débitos
+            while len(debitos) < n['debitos']:
+                tipo = rng.choice(['inclusao', 'abatimento', 'adiantamento'])
+                debitos.append((rng.randint(1, n['fornecedores']), None, dia(), f"Lançamento manual ({tipo})",
+                                _centavos(rng, 5, 2000), tipo))
+            ao_registrar(f"debitos_fornecedores: {len(debitos)}")
+            _inserir(cursor, conn, """
+                INSERT INTO debitos_fornecedores (fornecedor_id, compra_id, data_lancamento, descricao, valor, tipo)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, debitos)
+
+            ao_registrar(f"movimentacoes: {n['movimentacoes']}")
+            movimentacoes, itens_mov = [], []
+            for mov_id in range(1, n['movimentacoes'] + 1):
+                tipo = rng.choices(["compra", "venda", "transação"], weights=[5, 3, 2])[0]
+                direcao = rng.choice(["entrada", "saída"]) if tipo == "transação" else None
+                valor = _centavos(rng, 10, 5000)
+                if tipo != "transação":
+                    for _ in range(rng.randint(1, 2 * n['itens_por_movimentacao'] - 1)):
+                        itens_mov.append((mov_id, rng.randint(1, n['produtos']), rng.randint(1, 200),
+                                          _centavos(rng, 0.5, 40)))
+                movimentacoes.append((mov_id, rng.randint(1, n['fornecedores']), dia(), tipo, direcao, None, valor))
+            _inserir(cursor, conn, """
+                INSERT INTO movimentacoes (id, fornecedor_id, data, tipo, direcao, descricao, valor_operacao)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, movimentacoes)
+            ao_registrar(f"itens_movimentacao: {len(itens_mov)}")
+            _inserir(cursor, conn, """
+                INSERT INTO itens_movimentacao (movimentacao_id, produto_id, quantidade, preco_unitario)
+                VALUES (%s, %s, %s, %s)
+            """, itens_mov)
+        finally:
+            cursor.close()
+
+    from saldos_fornecedores import recalcular_saldos
+    recalcular_saldos()
+    return {
+        'fornecedores': n['fornecedores'], 'compras': len(compras), 'itens_compra': len(itens),
+        'debitos_fornecedores': len(debitos), 'movimentacoes': len(movimentacoes),
+        'itens_movimentacao': len(itens_mov),
+    }
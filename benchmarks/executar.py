@@ -0,0 +1,341 @@
+"""Mede os caminhos mais usados do programa contra um banco MySQL de teste e grava JSON.
+
+    python benchmarks/executar.py --config teste --semear --saida resultados.json
+    python benchmarks/executar.py --host localhost --user root --password x --database bench \\
+        --semear --escala 0.2 --comparar resultados_anteriores.json
+
+--config usa uma configuração de config_bancos.json (sem mudar a ativa); os parâmetros de
+conexão avulsos dispensam o arquivo. --semear aplica as migrações e gera os dados sintéticos
+se o banco estiver vazio (--recriar apaga antes). As medições também apagam dados (fechamentos
+mensais), então o programa se recusa a rodar se o nome do banco não parecer de teste (bench,
+test...) sem --sim-apagar, e sempre que o banco tiver dados sem ter sido semeado por ele.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import mock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(RAIZ, 'src'), os.path.dirname(os.path.abspath(__file__))]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import ajustes
+import diagnostico_sql
+
+BENCHMARKS = []
+
+def benchmark(nome):
+    """Registra uma função de medição; ela recebe o contexto e roda uma repetição."""
+    def registrar(funcao):
+        BENCHMARKS.append((nome, funcao))
+        return funcao
+    return registrar
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@contextmanager
+def _sem_dialogos(data_de, data_ate):
+    """Responde os diálogos das exportações das telas e não abre os arquivos gerados."""
+    from PySide6.QtCore import QDate
+
+    class Periodo:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def exec(self):
+            return True
+
+        def get_datas(self):
+            return QDate(data_de), QDate(data_ate)
+
+    with mock.patch('movimentacoes.DialogFiltroData', Periodo), \
+            mock.patch('movimentacoes.QMessageBox'), \
+            mock.patch('movimentacoes.platform.system', return_value='bench'), \
+            mock.patch('movimentacoes.os.system'):
+        yield
+
+class Contexto:
+    """Dados escolhidos uma vez e compartilhados pelas medições."""
+
+    def __init__(self):
+        from db_context import get_cursor
+        self.hoje = date.today()
+        self.data_de = self.hoje - timedelta(days=365)
+        with get_cursor() as cursor:
+            cursor.execute("""
+                SELECT fornecedor_id, COUNT(*) AS n FROM movimentacoes
+                WHERE data >= %s GROUP BY fornecedor_id ORDER BY n DESC LIMIT 1
+            """, (self.data_de,))
+            linha = cursor.fetchone()
+            self.fornecedor_movimentacoes = linha['fornecedor_id'] if linha else 1
+            cursor.execute("SELECT id FROM fornecedores ORDER BY id LIMIT 100")
+            self.fornecedores = [r['id'] for r in cursor.fetchall()]
+            cursor.execute("""
+                SELECT compra_id, COUNT(*) AS n FROM itens_compra GROUP BY compra_id ORDER BY n DESC LIMIT 1
+            """)
+            linha = cursor.fetchone()
+            self.compra = linha['compra_id'] if linha else 1
+        # As exportações das telas gravam no diretório atual
+        self.pasta = tempfile.mkdtemp(prefix='bench_')
+        os.chdir(self.pasta)
+        self._tela_movimentacoes = None
+        self._tela_debitos = None
+
+    def tela_movimentacoes(self):
+        if self._tela_movimentacoes is None:
+            from movimentacoes import MovimentacaoTabUI
+            from db_context import get_cursor
+            with get_cursor() as cursor:
+                cursor.execute("SELECT * FROM fornecedores WHERE id = %s", (self.fornecedor_movimentacoes,))
+                fornecedor = cursor.fetchone()
+            self._tela_movimentacoes = MovimentacaoTabUI(fornecedor)
+            esperar_tarefas()
+        return self._tela_movimentacoes
+
+    def tela_debitos(self):
+        if self._tela_debitos is None:
+            from debitos import DebitosUI
+            self._tela_debitos = DebitosUI()
+            esperar_tarefas()
+        return self._tela_debitos
+
+def esperar_tarefas():
+    from PySide6.QtWidgets import QApplication
+    from tarefas import pool_threads
+    while not pool_threads().waitForDone(50):
+        QApplication.processEvents()
+    QApplication.processEvents()
+
+# ---- Medições ----
+
+@benchmark("compras_listagem")
+def _compras_listagem(ctx):
+    """listar_compras_resumo do período + montagem do modelo das tabelas (o que preenchia a tabela de compras)."""
+    from PySide6.QtCore import QLocale
+    from compras.compras_db import listar_compras_resumo
+    from compras.compras_model import ComprasTableModel
+    linhas = listar_compras_resumo(status_not="Concluída", data_de=ctx.data_de, data_ate=ctx.hoje)
+    modelo = ComprasTableModel(QLocale(QLocale.Portuguese, QLocale.Brazil))
+    modelo._anexar(linhas)
+    # Uma tela mostra umas 40 linhas; só essas são formatadas
+    for row in range(min(40, modelo.rowCount())):
+        for coluna in range(modelo.columnCount()):
+            modelo.index(row, coluna).data()
+
+@benchmark("compras_primeira_pagina")
+def _compras_primeira_pagina(ctx):
+    from compras.compras_db import listar_compras_resumo
+    from compras.compras_model import TAMANHO_PAGINA
+    listar_compras_resumo(data_de=ctx.data_de, data_ate=ctx.hoje, limite=TAMANHO_PAGINA)
+
+@benchmark("listar_compras")
+def _listar_compras(ctx):
+    from compras.compras_db import listar_compras
+    listar_compras(data_de=ctx.data_de, data_ate=ctx.hoje)
+
+@benchmark("saldo_devedor_fornecedor_x100")
+def _saldo_devedor(ctx):
+    from compras.compras_db import obter_saldo_devedor_fornecedor
+    for fornecedor_id in ctx.fornecedores:
+        obter_saldo_devedor_fornecedor(fornecedor_id)
+
+@benchmark("saldo_movimentacoes_frio")
+def _saldo_movimentacoes_frio(ctx):
+    """MovimentacaoTabUI.obter_saldo_total sem fechamentos mensais guardados."""
+    from db_context import get_cursor
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM saldos_movimentacoes_mensais WHERE fornecedor_id = %s",
+                       (ctx.fornecedor_movimentacoes,))
+    ctx.tela_movimentacoes().obter_saldo_total()
+
+@benchmark("saldo_movimentacoes_quente")
+def _saldo_movimentacoes_quente(ctx):
+    ctx.tela_movimentacoes().obter_saldo_total()
+
+@benchmark("extrato_pdf")
+def _extrato_pdf(ctx):
+    with _sem_dialogos(ctx.data_de, ctx.hoje):
+        ctx.tela_movimentacoes().exportar_movimentacoes_pdf()
+
+@benchmark("extrato_jpg")
+def _extrato_jpg(ctx):
+    with _sem_dialogos(ctx.data_de, ctx.hoje):
+        ctx.tela_movimentacoes().exportar_movimentacoes_jpg()
+
+@benchmark("compra_pdf")
+def _compra_pdf(ctx):
+    from compras.compras_db import obter_detalhes_compra, obter_saldo_devedor_fornecedor
+    from compras.compras_export import exportar_compra_pdf
+    compra, itens = obter_detalhes_compra(ctx.compra)
+    saldo = obter_saldo_devedor_fornecedor(compra['fornecedor_id'])
+    exportar_compra_pdf(compra, itens, saldo, os.path.join(ctx.pasta, 'compra.pdf'),
+                        marca_dagua_texto=str(compra['fornecedores_numerobalanca']), abrir=False)
+
+@benchmark("compra_jpg")
+def _compra_jpg(ctx):
+    from compras.compras_db import obter_detalhes_compra, obter_saldo_devedor_fornecedor
+    from compras.compras_export import exportar_compra_jpg
+    compra, itens = obter_detalhes_compra(ctx.compra)
+    saldo = obter_saldo_devedor_fornecedor(compra['fornecedor_id'])
+    exportar_compra_jpg(compra, itens, saldo, os.path.join(ctx.pasta, 'compra.jpg'),
+                        marca_dagua_texto=str(compra['fornecedores_numerobalanca']), abrir=False)
+
+@benchmark("debitos_atualizar")
+def _debitos_atualizar(ctx):
+    """DebitosUI.atualizar sem filtro de fornecedor, no último ano, até a tabela ser preenchida."""
+    tela = ctx.tela_debitos()
+    tela.combo_fornecedor.setCurrentIndex(-1)
+    tela.data_de.setDate(ctx.data_de)
+    tela.data_ate.setDate(ctx.hoje)
+    tela.atualizar()
+    esperar_tarefas()
+
+@benchmark("tempo_ate_login")
+def _tempo_ate_login(ctx):
+    """Processo novo de main.py até o diálogo de login aparecer (--tempo-inicio --sair-no-login)."""
+    pasta = os.path.join(ctx.pasta, 'inicio')
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, ajustes.CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'configuracoes': {'benchmark': ajustes.get_config()}, 'config_ativa': 'benchmark'}, f)
+    relatorio = os.path.join(pasta, 'inicio.json')
+    subprocess.run([sys.executable, os.path.join(RAIZ, 'src', 'main.py'), f'--tempo-inicio={relatorio}',
+                    '--sair-no-login'], cwd=pasta, env=dict(os.environ, PYTHONPATH=RAIZ),
+                   capture_output=True, check=True, timeout=120)
+    with open(relatorio, encoding='utf-8') as f:
+        ctx.inicio = json.load(f)
+
+# ---- Execução ----
+
+def medir(ctx, nome, funcao, repeticoes):
+    tempos, comandos = [], []
+    for _ in range(repeticoes):
+        diagnostico_sql.limpar()
+        inicio = time.perf_counter()
+        funcao(ctx)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        comandos.append(sum(r['execucoes'] for r in diagnostico_sql.mais_pesados(limite=None)))
+    return {
+        'repeticoes': repeticoes,
+        'min_ms': round(min(tempos), 2),
+        'mediana_ms': round(statistics.median(tempos), 2),
+        'max_ms': round(max(tempos), 2),
+        'comandos_sql': max(comandos),
+    }
+
+def comparar(atual, anterior):
+    print(f"\n{'benchmark':<32}{'antes (ms)':>12}{'agora (ms)':>12}{'variação':>10}")
+    for nome, r in atual['resultados'].items():
+        antes = anterior.get('resultados', {}).get(nome)
+        if not antes:
+            print(f"{nome:<32}{'-':>12}{r['mediana_ms']:>12.1f}")
+            continue
+        variacao = (r['mediana_ms'] / antes['mediana_ms'] - 1) * 100 if antes['mediana_ms'] else 0
+        print(f"{nome:<32}{antes['mediana_ms']:>12.1f}{r['mediana_ms']:>12.1f}{variacao:>+9.1f}%")
+
+def configurar_banco(args):
+    if args.config:
+        if args.config not in ajustes.configuracoes:
+            sys.exit(f"Configuração '{args.config}' não existe em {ajustes.CONFIG_FILE}.")
+        ajustes.config_ativa = args.config  # só neste processo; o arquivo não é alterado
+    else:
+        ajustes.configuracoes['benchmark'] = {
+            'host': args.host, 'user': args.user, 'password': args.password,
+            'database': args.database, 'port': args.port,
+        }
+        ajustes.config_ativa = 'benchmark'
+
+def verificar_banco_de_teste(args):
+    """Sai com erro se o banco ativo pode não ser descartável."""
+    import dados_sinteticos
+    nome = dados_sinteticos.nome_do_banco()
+    if not args.sim_apagar and not dados_sinteticos.PADRAO_NOME_BANCO.search(nome or ''):
+        sys.exit(f"O banco '{nome}' não tem nome de banco de teste; os benchmarks apagam dados nele. "
+                 f"Use um banco com 'bench' ou 'teste' no nome, ou passe --sim-apagar.")
+    if not dados_sinteticos.banco_vazio() and not dados_sinteticos.tem_marcador():
+        sys.exit(f"O banco '{nome}' tem dados que não foram gerados pelos benchmarks (falta a tabela "
+                 f"{dados_sinteticos.MARCADOR}). Use um banco vazio.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de compras.")
+    parser.add_argument('--config', help="nome da configuração em config_bancos.json")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='aprendendo_benchmark')
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--semear', action='store_true', help="migra e gera os dados se o banco estiver vazio")
+    parser.add_argument('--recriar', action='store_true', help="apaga os dados antes de semear")
+    parser.add_argument('--sim-apagar', action='store_true',
+                        help="aceita um banco sem 'bench'/'teste' no nome (ele continua precisando ser vazio ou semeado)")
+    parser.add_argument('--escala', type=float, default=1.0, help="multiplica os volumes gerados")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--somente', nargs='*', help="nomes dos benchmarks a rodar")
+    parser.add_argument('--saida', help="arquivo JSON de resultado (padrão: imprime)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+    # As medições rodam numa pasta temporária; caminhos relativos são do diretório de chamada
+    args.saida = args.saida and os.path.abspath(args.saida)
+    args.comparar = args.comparar and os.path.abspath(args.comparar)
+
+    configurar_banco(args)
+    verificar_banco_de_teste(args)
+
+    from PySide6.QtCore import QLocale
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    QLocale.setDefault(QLocale(QLocale.Portuguese, QLocale.Brazil))
+
+    volumes = None
+    if args.semear or args.recriar:
+        import migracoes
+        import dados_sinteticos
+        migracoes.aplicar_pendentes(print)
+        if args.recriar:
+            dados_sinteticos.limpar()
+        if dados_sinteticos.banco_vazio():
+            inicio = time.perf_counter()
+            volumes = dados_sinteticos.semear(args.escala)
+            print(f"Dados gerados em {time.perf_counter() - inicio:.1f}s")
+
+    ctx = Contexto()
+    resultados = {}
+    for nome, funcao in BENCHMARKS:
+        if args.somente and nome not in args.somente:
+            continue
+        print(f"{nome}...", file=sys.stderr)
+        funcao(ctx)  # aquecimento: caches, importações, fontes
+        resultados[nome] = medir(ctx, nome, funcao, args.repeticoes)
+
+    saida = {
+        'quando': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _commit_atual(),
+        'escala': args.escala,
+        'volumes': volumes,
+        'resultados': resultados,
+        'inicio': getattr(ctx, 'inicio', None),  # etapas e importações da última medição de tempo_ate_login
+    }
+    texto = json.dumps(saida, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(saida, json.load(f))
+    app.quit()
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,27 @@
 import json
 import os
-import sys  # Adicionado para reiniciar o app
 from PySide6.QtWidgets import (
-    QWidget, QLabel, QLineEdit, QPushButton, QListWidget, QVBoxLayout, QHBoxLayout, QMessageBox, QSpinBox
+    QWidget, QLabel, QLineEdit, QPushButton, QListWidget, QVBoxLayout, QHBoxLayout, QMessageBox, QSpinBox,
+    QDialog, QPlainTextEdit, QDialogButtonBox
 )
+from tarefas import ExecutorBanco
+from eventos import eventos
 
 CONFIG_FILE = 'config_bancos.json'
+POOL_SIZE_PADRAO = 5  # conexões mantidas abertas por configuração
+CUSTO_BCRYPT_MIN, CUSTO_BCRYPT_MAX = 4, 16  # cada ponto a mais dobra o tempo do login
 configuracoes = {}
 config_ativa = None
+_ouvintes = []  # chamados com o nome da config quando a ativa muda, é editada ou removida (None)
+
+def ao_mudar_config(funcao):
+    """Registra `funcao(nome)` para ser chamada quando a configuração ativa mudar."""
+    _ouvintes.append(funcao)
+    return funcao
+
+def _avisar_mudanca():
+    for funcao in list(_ouvintes):
+        funcao(config_ativa)
 
 def carregar_configs():
     global configuracoes, config_ativa
@@ -28,37 +42,44 @@ def set_config_ativa(nome):
     global config_ativa
     if nome not in configuracoes:
         raise ValueError(f'Configuração {nome} não existe.')
+    mudou = config_ativa != nome
     config_ativa = nome
     salvar_configs()
+    if mudou:
+        _avisar_mudanca()
 
-def adicionar_ou_editar_config(nome, host, user, password, database, port):
+def adicionar_ou_editar_config(nome, host, user, password, database, port, pool_size=POOL_SIZE_PADRAO,
+                               consulta_lenta_ms=None, custo_bcrypt=None):
     configuracoes[nome] = {
         'host': host,
         'user': user,
         'password': password,
         'database': database,
-        'port': port
+        'port': port,
+        'pool_size': pool_size,
+        'consulta_lenta_ms': consulta_lenta_ms,  # None: não grava o log de consultas lentas
+        'custo_bcrypt': custo_bcrypt  # None: mantém o custo de cada hash; senão, refaz no login
     }
     salvar_configs()
+    if nome == config_ativa:
+        _avisar_mudanca()
 
 def remover_config(nome):
     global config_ativa
     if nome in configuracoes:
         configuracoes.pop(nome)
-        if config_ativa == nome:
+        era_ativa = config_ativa == nome
+        if era_ativa:
             config_ativa = None
         salvar_configs()
+        if era_ativa:
+            _avisar_mudanca()  # pool, cache e telas do banco removido não valem mais
 
 def get_config():
     if config_ativa is None:
         raise RuntimeError("Nenhuma configuração ativa definida.")
     return configuracoes[config_ativa]
 
-def reiniciar_programa():
-    """Reinicia o processo Python."""
-    python = sys.executable
-    os.execl(python, python, *sys.argv)
-
 # Carrega configs ao importar
 carregar_configs()
 
@@ -87,15 +108,30 @@ class AjustesUI(QWidget):
         self.input_port = QSpinBox()
         self.input_port.setRange(1, 65535)
         self.input_port.setValue(3306)
+        self.input_pool_size = QSpinBox()
+        self.input_pool_size.setRange(2, 32)  # uma conexão fica para a thread da interface
+        self.input_pool_size.setValue(POOL_SIZE_PADRAO)
+        self.input_consulta_lenta = QSpinBox()
+        self.input_consulta_lenta.setRange(-1, 600000)
+        self.input_consulta_lenta.setSpecialValueText("Desligado")
+        self.input_consulta_lenta.setSuffix(" ms")
+        self.input_consulta_lenta.setValue(-1)
+        self.input_custo_bcrypt = QSpinBox()
+        self.input_custo_bcrypt.setRange(CUSTO_BCRYPT_MIN - 1, CUSTO_BCRYPT_MAX)
+        self.input_custo_bcrypt.setSpecialValueText("Não alterar")
+        self.input_custo_bcrypt.setValue(CUSTO_BCRYPT_MIN - 1)
 
         # Botões
         self.btn_salvar = QPushButton("Salvar")
         self.btn_remover = QPushButton("Remover")
         self.btn_ativar = QPushButton("Ativar")
+        self.btn_migrar = QPushButton("Atualizar banco de dados")
 
         self.btn_salvar.clicked.connect(self.salvar_config)
         self.btn_remover.clicked.connect(self.remover_config)
         self.btn_ativar.clicked.connect(self.ativar_config)
+        self.btn_migrar.clicked.connect(self.atualizar_banco)
+        self.banco = ExecutorBanco(self)
 
         # Layout
         form_layout = QVBoxLayout()
@@ -111,11 +147,18 @@ class AjustesUI(QWidget):
         form_layout.addWidget(self.input_database)
         form_layout.addWidget(QLabel("Porta"))
         form_layout.addWidget(self.input_port)
+        form_layout.addWidget(QLabel("Conexões simultâneas"))
+        form_layout.addWidget(self.input_pool_size)
+        form_layout.addWidget(QLabel("Registrar consultas mais lentas que"))
+        form_layout.addWidget(self.input_consulta_lenta)
+        form_layout.addWidget(QLabel("Custo do hash das senhas (bcrypt)"))
+        form_layout.addWidget(self.input_custo_bcrypt)
 
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(self.btn_salvar)
         btn_layout.addWidget(self.btn_remover)
         btn_layout.addWidget(self.btn_ativar)
+        btn_layout.addWidget(self.btn_migrar)
 
         main_layout = QHBoxLayout()
         main_layout.addWidget(self.lista_configs)
@@ -140,6 +183,11 @@ class AjustesUI(QWidget):
             self.input_password.setText(c['password'])
             self.input_database.setText(c['database'])
             self.input_port.setValue(c.get('port', 3306))
+            self.input_pool_size.setValue(c.get('pool_size', POOL_SIZE_PADRAO))
+            lenta = c.get('consulta_lenta_ms')
+            self.input_consulta_lenta.setValue(-1 if lenta is None else lenta)
+            custo = c.get('custo_bcrypt')
+            self.input_custo_bcrypt.setValue(CUSTO_BCRYPT_MIN - 1 if custo is None else custo)
 
     def salvar_config(self):
         nome = self.input_nome.text().strip()
@@ -151,7 +199,15 @@ class AjustesUI(QWidget):
         password = self.input_password.text()
         database = self.input_database.text().strip()
         port = self.input_port.value()
-        adicionar_ou_editar_config(nome, host, user, password, database, port)
+        pool_size = self.input_pool_size.value()
+        consulta_lenta_ms = self.input_consulta_lenta.value()
+        if consulta_lenta_ms < 0:
+            consulta_lenta_ms = None
+        custo_bcrypt = self.input_custo_bcrypt.value()
+        if custo_bcrypt < CUSTO_BCRYPT_MIN:
+            custo_bcrypt = None
+        adicionar_ou_editar_config(nome, host, user, password, database, port, pool_size, consulta_lenta_ms,
+                                   custo_bcrypt)
         if nome not in [self.lista_configs.item(i).text() for i in range(self.lista_configs.count())]:
             self.lista_configs.addItem(nome)
         QMessageBox.information(self, "Sucesso", "Configuração salva com sucesso.")
@@ -170,14 +226,45 @@ class AjustesUI(QWidget):
 
     def ativar_config(self):
         nome = self.input_nome.text().strip()
-        global config_ativa
         if nome and nome in configuracoes:
-            mudou = (config_ativa != nome)
+            # Quem ouve a mudança (conexões, cache, telas abertas) passa a usar o novo banco
             set_config_ativa(nome)
             QMessageBox.information(self, "Sucesso", f"Configuração '{nome}' ativada.")
-            if mudou:
-                QMessageBox.information(self, "Reiniciando", "O sistema será reiniciado para aplicar a nova configuração.")
-                self.close()  # Fecha janela antes de reiniciar
-                reiniciar_programa()
+            if self.isWindow():
+                self.close()  # configuração inicial, antes da janela principal
         else:
-            QMessageBox.warning(self, "Erro", "Selecione uma configuração válida para ativar.")
\ No newline at end of file
+            QMessageBox.warning(self, "Erro", "Selecione uma configuração válida para ativar.")
+
+    def atualizar_banco(self):
+        """Aplica as migrações pendentes na configuração ativa e mostra os planos antes e depois."""
+        import migracoes  # db_context importa este módulo; evita a importação circular
+        try:
+            get_config()
+        except RuntimeError:
+            QMessageBox.warning(self, "Erro", "Ative uma configuração antes de atualizar o banco.")
+            return
+        self.btn_migrar.setEnabled(False)
+        self.banco.executar(
+            migracoes.migrar_com_relatorio,
+            ao_concluir=self.mostrar_relatorio_migracao,
+            ao_falhar=self.falha_migracao,
+        )
+
+    def falha_migracao(self, erro):
+        self.btn_migrar.setEnabled(True)
+        QMessageBox.critical(self, "Erro", f"Falha ao atualizar o banco de dados:\n{erro}")
+
+    def mostrar_relatorio_migracao(self, relatorio):
+        self.btn_migrar.setEnabled(True)
+        eventos().banco_atualizado.emit()  # a janela principal confere de novo e libera as telas
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Atualização do banco de dados")
+        dialog.resize(800, 500)
+        texto = QPlainTextEdit(relatorio)
+        texto.setReadOnly(True)
+        botoes = QDialogButtonBox(QDialogButtonBox.Close)
+        botoes.rejected.connect(dialog.reject)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(texto)
+        layout.addWidget(botoes)
+        dialog.exec()
@@ -1,9 +1,26 @@
 import bcrypt
 
-def hash_senha(senha):
-    """Gera um hash seguro para a senha."""
-    return bcrypt.hashpw(senha.encode(), bcrypt.gensalt()).decode()
+def custo_configurado():
+    """Custo do bcrypt definido na configuração ativa (None: não mexe nos hashes existentes)."""
+    from ajustes import get_config
+    return get_config().get('custo_bcrypt')
+
+def hash_senha(senha, custo=None):
+    """Gera um hash seguro para a senha (custo padrão do bcrypt se não houver um configurado)."""
+    custo = custo or custo_configurado()
+    salt = bcrypt.gensalt(rounds=custo) if custo else bcrypt.gensalt()
+    return bcrypt.hashpw(senha.encode(), salt).decode()
 
 def checar_senha(senha, hash_armazenado):
     """Verifica se a senha corresponde ao hash armazenado."""
-    return bcrypt.checkpw(senha.encode(), hash_armazenado.encode())
\ No newline at end of file
+    return bcrypt.checkpw(senha.encode(), hash_armazenado.encode())
+
+def custo_do_hash(hash_armazenado):
+    """Fator de custo gravado no hash ('$2b$12$...' -> 12)."""
+    try:
+        return int(hash_armazenado.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def precisa_refazer_hash(hash_armazenado, custo):
+    return custo is not None and custo_do_hash(hash_armazenado) != custo
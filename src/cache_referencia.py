@@ -0,0 +1,142 @@
+import threading
+import time
+from db_context import get_cursor
+from ajustes import ao_mudar_config
+
+# Dados de referência (fornecedores, produtos, categorias, preços) mudam pouco e são lidos a todo
+# momento para preencher combos. Ficam em memória até uma escrita local invalidar o grupo
+# ou até vencer o TTL, que cobre alterações feitas em outras estações. Preços vão direto
+# para as compras gravadas: vencem mais cedo e são relidos ao escolher fornecedor/categoria.
+TTL_SEGUNDOS = 300
+TTL_PRECOS_SEGUNDOS = 30
+
+FORNECEDORES = "fornecedores"
+PRODUTOS = "produtos"
+CATEGORIAS = "categorias"
+PRECOS = "precos"
+
+_lock = threading.Lock()
+_versoes = {}   # grupo -> versão atual
+_entradas = {}  # (grupo, chave) -> (versão, expira_em, valor)
+
+def versao(grupo):
+    """Muda a cada invalidação do grupo; telas podem comparar para saber se recarregam."""
+    with _lock:
+        return _versoes.get(grupo, 0)
+
+def invalidar(*grupos):
+    """Descarta o que estiver guardado dos grupos; chamar depois de gravar no banco."""
+    with _lock:
+        for grupo in grupos:
+            _versoes[grupo] = _versoes.get(grupo, 0) + 1
+            for chave in [k for k in _entradas if k[0] == grupo]:
+                del _entradas[chave]
+
+@ao_mudar_config
+def invalidar_tudo(_nome=None):
+    """Outro banco ativo: nada do que está guardado vale mais."""
+    invalidar(FORNECEDORES, PRODUTOS, CATEGORIAS, PRECOS)
+
+def _descartar(grupo, chave):
+    with _lock:
+        _entradas.pop((grupo, chave), None)
+
+def _obter(grupo, chave, carregar, ttl=TTL_SEGUNDOS):
+    agora = time.monotonic()
+    with _lock:
+        versao_atual = _versoes.get(grupo, 0)
+        entrada = _entradas.get((grupo, chave))
+        if entrada and entrada[0] == versao_atual and entrada[1] > agora:
+            return entrada[2]
+    valor = carregar()
+    with _lock:
+        # Se alguém invalidou durante a consulta, o valor lido pode já estar velho
+        if _versoes.get(grupo, 0) == versao_atual:
+            _entradas[(grupo, chave)] = (versao_atual, agora + ttl, valor)
+    return valor
+
+def _consultar(query, params=()):
+    with get_cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+# As listas devolvidas são compartilhadas entre as telas: não alterar os dicionários.
+
+def listar_fornecedores():
+    return list(_obter(FORNECEDORES, None, lambda: _consultar("SELECT * FROM fornecedores ORDER BY nome")))
+
+def obter_fornecedor_por_balanca(numero):
+    numero = str(numero).strip()
+    for tentativa in range(2):
+        for f in listar_fornecedores():
+            if str(f['fornecedores_numerobalanca']) == numero:
+                return f
+        if tentativa == 0:
+            # Pode ter sido cadastrado em outra estação depois da última leitura
+            invalidar(FORNECEDORES)
+    return None
+
+def obter_fornecedor_id_por_numero_balanca(numero):
+    f = obter_fornecedor_por_balanca(numero)
+    return f['id'] if f else None
+
+def listar_produtos():
+    return list(_obter(PRODUTOS, None, lambda: _consultar("SELECT id, nome, preco_base FROM produtos ORDER BY nome")))
+
+def obter_produto(produto_id):
+    for tentativa in range(2):
+        for p in listar_produtos():
+            if p['id'] == produto_id:
+                return p
+        if tentativa == 0:
+            invalidar(PRODUTOS)
+    return None
+
+def obter_categorias_do_fornecedor(fornecedor_id):
+    return list(_obter(CATEGORIAS, fornecedor_id, lambda: _consultar(
+        "SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE fornecedor_id = %s ORDER BY nome",
+        (fornecedor_id,)
+    )))
+
+def obter_categoria_padrao():
+    categorias = _obter(CATEGORIAS, "Padrão", lambda: _consultar(
+        "SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE nome = %s LIMIT 1", ('Padrão',)
+    ))
+    return categorias[0] if categorias else None
+
+def obter_id_categoria_padrao():
+    cat = obter_categoria_padrao()
+    return cat['id'] if cat else None
+
+def obter_matriz_precos(categoria_id, recarregar=False):
+    """Preço de todos os produtos na categoria numa consulta: {produto_id: produto com preco_final}.
+
+    `recarregar` ignora o que estiver guardado da categoria (ao escolher fornecedor ou categoria).
+    """
+    if recarregar:
+        _descartar(PRECOS, categoria_id)
+    return _obter(PRECOS, categoria_id, lambda: {p['id']: p for p in _consultar("""
+        SELECT p.id,
+               p.nome,
+               p.preco_base,
+               COALESCE(aj.ajuste_fixo, 0)                  AS ajuste_fixo,
+               (p.preco_base + COALESCE(aj.ajuste_fixo, 0)) AS preco_final
+        FROM produtos p
+                 LEFT JOIN ajustes_fixos_produto_fornecedor_categoria aj
+                           ON p.id = aj.produto_id AND aj.categoria_id = %s
+        ORDER BY p.nome
+    """, (categoria_id,))}, ttl=TTL_PRECOS_SEGUNDOS)
+
+def listar_precos_por_categoria(categoria_id):
+    return list(obter_matriz_precos(categoria_id).values())
+
+def obter_preco(categoria_id, produto_id):
+    """Linha da matriz de preços do produto na categoria, ou None se o produto não existir."""
+    for tentativa in range(2):
+        preco = obter_matriz_precos(categoria_id).get(produto_id)
+        if preco is not None:
+            return preco
+        if tentativa == 0:
+            # Produto novo: relê só esta categoria, sem derrubar as matrizes das outras telas
+            _descartar(PRECOS, categoria_id)
+    return None
@@ -1,35 +1,42 @@
 import sys
+import threading
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
     QHBoxLayout, QGridLayout, QComboBox, QDateEdit, QLineEdit,
-    QSpinBox, QTableWidget, QTableWidgetItem, QMessageBox, QTabWidget, QDialog
+    QSpinBox, QTableWidget, QTableWidgetItem, QTableView, QMessageBox, QTabWidget, QDialog,
+    QInputDialog, QFileDialog, QProgressDialog
 )
 from PySide6.QtGui import QIntValidator
-from PySide6.QtCore import Qt, QTimer, QDate, QLocale, QEvent
+from PySide6.QtCore import Qt, QTimer, QDate, QLocale, QEvent, QObject, Signal
 from decimal import Decimal
 from ..status_delegate_combo import StatusComboDelegate
 from ..utils_permissoes import requer_permissao
+from db_context import transacao
 
 # Importações dos submódulos
 from .compras_db import (
     listar_fornecedores, listar_contas_do_fornecedor, listar_produtos,
-    obter_produto, listar_compras, adicionar_compra, atualizar_compra,
-    listar_itens_compra, obter_fornecedor_id_da_compra, obter_detalhes_compra,
-    obter_total_produtos, obter_valor_com_abatimento_adiantamento, obter_saldo_devedor_fornecedor,
+    obter_preco, obter_matriz_precos, listar_compras_resumo, adicionar_compra, atualizar_compra,
+    listar_itens_compra, obter_fornecedor_id_da_compra, obter_detalhes_compra, obter_detalhes_compras,
+    obter_saldo_devedor_fornecedor, obter_saldos_devedores_fornecedores,
     buscar_nome_conta_padrao, obter_categorias_do_fornecedor, inserir_abatimento,
-    obter_ajuste_fixo, obter_id_categoria_padrao, inserir_adiantamento, remover_lancamentos_antigos,
+    obter_id_categoria_padrao, inserir_adiantamento, remover_lancamentos_antigos,
     obter_dados_para_editar_compra, obter_itens_e_lancamentos_da_compra, excluir_compra,
     obter_fornecedor_id_por_numero_balanca, obter_primeira_categoria_do_fornecedor,
     obter_dados_bancarios_para_campo_copiavel, atualizar_conta_bancaria_da_compra,
-    atualizar_status_compra as atualizar_status_compra_db
+    obter_resumo_compra, atualizar_status_compra as atualizar_status_compra_db
 )
 from .compras_logic import (
     obter_total_produtos_lista, calcular_valor_com_abatimento_adiantamento, formatar_moeda
 )
-from .compras_export import (
-    exportar_compra_pdf, exportar_compra_jpg
-)
 from .compras_dialogs import DiferencaCompraDialog
+from .compras_model import ComprasTableModel
+from tarefas import ExecutorBanco
+from eventos import eventos
+
+class _AvisoProgresso(QObject):
+    """Leva o progresso da exportação em lote da thread de trabalho para a interface."""
+    progrediu = Signal(int, int)  # feitos, total
 
 STATUS_LIST = [
     "Criada", "Emitindo nota", "Efetuando pagamento", "Finalizada", "Concluída"
@@ -48,11 +55,21 @@ class ComprasUI(QWidget):
         self.itens_compra = []
         self.item_edit_index = None
         self.compra_edit_id = None
+        self._categoria_pendente = None
         self.locale = QLocale(QLocale.Portuguese, QLocale.Brazil)
+        self.banco = ExecutorBanco(self)
         self.init_ui()
         self.carregar_fornecedores()
         self.carregar_produtos()
 
+        # Gravações (desta tela ou de outras) atualizam só as linhas e o saldo atingidos
+        ev = eventos()
+        ev.compra_salva.connect(self.ao_salvar_compra)
+        ev.compra_excluida.connect(self.ao_excluir_compra)
+        ev.status_compra_alterado.connect(self.ao_mudar_status_compra)
+        ev.debitos_alterados.connect(self.ao_mudar_debitos)
+        ev.produto_alterado.connect(self.ao_mudar_produto)
+
     # ---- Métodos DB ----
     # Todos os métodos de acesso ao banco foram movidos para compras_db.py
 
@@ -75,8 +92,6 @@ class ComprasUI(QWidget):
 
         self.filtro_combo_fornecedor = QComboBox()
         self.filtro_combo_fornecedor.addItem("Todos os Fornecedores", None)
-        for f in listar_fornecedores():
-            self.filtro_combo_fornecedor.addItem(f"{f['nome']} (ID {f['id']})", f['id'])
         layout_filtros.addWidget(QLabel("Fornecedor:"))
         layout_filtros.addWidget(self.filtro_combo_fornecedor)
 
@@ -127,14 +142,9 @@ class ComprasUI(QWidget):
         # ===================== TAB CONCLUÍDAS =====================
         layout_concluidas = QVBoxLayout()
         self.tab_concluidas.setLayout(layout_concluidas)
-        self.tabela_compras_concluidas = QTableWidget()
-        self.tabela_compras_concluidas.setColumnCount(6)
-        self.tabela_compras_concluidas.setHorizontalHeaderLabels([
-            "ID", "Fornecedor", "Data", "Total dos produtos (R$)", "Valor com abatimento/adiantamento", "Status"
-        ])
-        self.tabela_compras_concluidas.setEditTriggers(QTableWidget.DoubleClicked)
-        self.tabela_compras_concluidas.cellClicked.connect(
-            lambda row, col: self.mostrar_itens_da_compra(row, col, tabela=self.tabela_compras_concluidas)
+        self.tabela_compras_concluidas = self.criar_tabela_compras()
+        self.tabela_compras_concluidas.clicked.connect(
+            lambda index: self.mostrar_itens_da_compra(index.row(), index.column(), tabela=self.tabela_compras_concluidas)
         )
         layout_concluidas.addWidget(self.tabela_compras_concluidas)
 
@@ -173,6 +183,7 @@ class ComprasUI(QWidget):
 
         self.combo_categoria_temporaria = QComboBox()
         self.combo_categoria_temporaria.addItem("Selecione uma categoria", 0)
+        self.combo_categoria_temporaria.currentIndexChanged.connect(self.carregar_precos_da_categoria)
         layout_dados.addWidget(QLabel("Categoria (para esta compra)"), 4, 0)
         layout_dados.addWidget(self.combo_categoria_temporaria, 4, 1)
 
@@ -281,8 +292,6 @@ class ComprasUI(QWidget):
         layout_compras_com_filtros.addWidget(QLabel("Fornecedor:"))
         self.filtro_combo_fornecedor = QComboBox()
         self.filtro_combo_fornecedor.addItem("Todos os Fornecedores", None)
-        for f in listar_fornecedores():
-            self.filtro_combo_fornecedor.addItem(f"{f['nome']} (ID {f['id']})", f['id'])
         layout_compras_com_filtros.addWidget(self.filtro_combo_fornecedor)
 
         layout_compras_com_filtros.addWidget(QLabel("Status:"))
@@ -321,14 +330,11 @@ class ComprasUI(QWidget):
 
         layout_compras_com_filtros.addLayout(linha_datas_e_botoes)
 
-        self.tabela_compras_aberto = QTableWidget()
-        self.tabela_compras_aberto.setColumnCount(6)
-        self.tabela_compras_aberto.setHorizontalHeaderLabels([
-            "ID", "Fornecedor", "Data", "Total dos produtos (R$)", "Valor com abatimento/adiantamento", "Status"
-        ])
-        self.tabela_compras_aberto.setEditTriggers(QTableWidget.DoubleClicked)
-        self.tabela_compras_aberto.cellClicked.connect(lambda row, col: self.mostrar_itens_da_compra(row, col, tabela=self.tabela_compras_aberto))
-        self.tabela_compras_aberto.itemSelectionChanged.connect(self.atualizar_campo_texto_copiavel)
+        self.tabela_compras_aberto = self.criar_tabela_compras()
+        self.tabela_compras_aberto.clicked.connect(
+            lambda index: self.mostrar_itens_da_compra(index.row(), index.column(), tabela=self.tabela_compras_aberto)
+        )
+        self.tabela_compras_aberto.selectionModel().selectionChanged.connect(self.atualizar_campo_texto_copiavel)
         layout_compras_com_filtros.addWidget(self.tabela_compras_aberto)
 
         # Área direita, igual antes
@@ -364,24 +370,30 @@ class ComprasUI(QWidget):
         self.btn_exportar_jpg.clicked.connect(self.exportar_compra_jpg)
         layout_direita.addWidget(self.btn_exportar_jpg)
 
+        self.btn_exportar_lote = QPushButton("Exportar concluídas do período")
+        self.btn_exportar_lote.clicked.connect(self.exportar_compras_concluidas_lote)
+        layout_direita.addWidget(self.btn_exportar_lote)
+
         self.setLayout(layout_principal)
         self.itens_compra = []
         self.atualizar_tabela_itens_adicionados()
-        self.atualizar_tabelas()
         self.status_delegate = StatusComboDelegate(self.STATUS_COLORS, STATUS_LIST, self.tabela_compras_aberto)
-        self.tabela_compras_aberto.setItemDelegateForColumn(5, self.status_delegate)
-        self.tabela_compras_concluidas.setItemDelegateForColumn(5, self.status_delegate)
-        self.tabela_compras_aberto.itemChanged.connect(self.on_status_item_changed)
-        self.tabela_compras_concluidas.itemChanged.connect(self.on_status_item_changed)
+        self.tabela_compras_aberto.setItemDelegateForColumn(ComprasTableModel.COLUNA_STATUS, self.status_delegate)
+        self.tabela_compras_concluidas.setItemDelegateForColumn(ComprasTableModel.COLUNA_STATUS, self.status_delegate)
+        self.tabela_compras_aberto.model().status_alterado.connect(self.on_status_alterado)
+        self.tabela_compras_concluidas.model().status_alterado.connect(self.on_status_alterado)
+        self.atualizar_tabelas()
+
+    def criar_tabela_compras(self):
+        tabela = QTableView()
+        tabela.setModel(ComprasTableModel(self.locale, tabela))
+        tabela.setEditTriggers(QTableView.DoubleClicked)
+        tabela.horizontalHeader().setSortIndicator(ComprasTableModel.COLUNA_DATA, Qt.DescendingOrder)
+        tabela.setSortingEnabled(True)
+        return tabela
 
     def carregar_dados(self):
-        self.atualizar_tabelas()
-        self.combo_produto.blockSignals(True)
-        self.combo_produto.clear()
-        for p in listar_produtos():
-            self.combo_produto.addItem(p['nome'], p['id'])
-        self.combo_produto.setCurrentIndex(-1)
-        self.combo_produto.blockSignals(False)
+        self.carregar_produtos()
         self.atualizar_tabelas()
 
     def mostrar_dialog_diferenca(self, diferenca):
@@ -391,36 +403,31 @@ class ComprasUI(QWidget):
         return None
 
     def selecionar_categoria_do_fornecedor(self, fornecedor_id):
-        categoria_id = obter_primeira_categoria_do_fornecedor(fornecedor_id)
-        if categoria_id is not None:
+        def buscar():
+            categoria_id = obter_primeira_categoria_do_fornecedor(fornecedor_id)
+            return categoria_id if categoria_id is not None else obter_id_categoria_padrao()
+
+        self.banco.executar(buscar, canal='categoria_inicial', ao_concluir=self._aplicar_categoria_inicial)
+
+    def _aplicar_categoria_inicial(self, categoria_id):
+        # A lista de categorias pode ainda não ter chegado; nesse caso fica pendente
+        self._categoria_pendente = categoria_id
+        if categoria_id:
             index = self.combo_categoria_temporaria.findData(categoria_id)
             if index != -1:
                 self.combo_categoria_temporaria.setCurrentIndex(index)
-        else:
-            # Tenta pegar categoria padrão
-            cat_padrao_id = obter_id_categoria_padrao()
-            if cat_padrao_id:
-                index = self.combo_categoria_temporaria.findData(cat_padrao_id)
-                if index != -1:
-                    self.combo_categoria_temporaria.setCurrentIndex(index)
-
-    def carregar_categorias_para_fornecedor(self, fornecedor_id):
-        self.combo_categoria_temporaria.blockSignals(True)
-        self.combo_categoria_temporaria.clear()
-        self.combo_categoria_temporaria.addItem("Selecione uma categoria", 0)
-        categorias = obter_categorias_do_fornecedor(fornecedor_id)
-        for c in categorias:
-            self.combo_categoria_temporaria.addItem(c['nome'], c['id'])
-        self.combo_categoria_temporaria.setCurrentIndex(1 if self.combo_categoria_temporaria.count() > 1 else 0)
-        self.combo_categoria_temporaria.blockSignals(False)
+                self._categoria_pendente = None
 
     def atualizar_campo_texto_copiavel(self):
         compra_id = self.obter_compra_id_selecionado()
         if not compra_id:
+            self.banco.cancelar('texto_copiavel')
             self.campo_texto_copiavel.setText("")
             return
-        texto = obter_dados_bancarios_para_campo_copiavel(compra_id)
-        self.campo_texto_copiavel.setText(texto or "")
+        self.banco.executar(
+            obter_dados_bancarios_para_campo_copiavel, compra_id, canal='texto_copiavel',
+            ao_concluir=lambda texto: self.campo_texto_copiavel.setText(texto or "")
+        )
 
     def focus_quantidade(self):
         self.input_quantidade.setFocus()
@@ -433,11 +440,10 @@ class ComprasUI(QWidget):
     def obter_compra_id_selecionado(self, tabela=None):
         if tabela is None:
             tabela = self.tabela_compras_aberto
-        row = tabela.currentRow()
+        row = tabela.currentIndex().row()
         if row < 0:
             return None
-        item = tabela.item(row, 0)
-        return int(item.text()) if item else None
+        return tabela.model().compra_id(row)
 
     def eventFilter(self, obj, event):
         if obj is self.input_quantidade and event.type() == QEvent.KeyPress:
@@ -448,19 +454,23 @@ class ComprasUI(QWidget):
 
     @requer_permissao(['admin', 'gerente', 'operador'])
     def abrir_dialog_troca_conta_fornecedor(self):
-        from PySide6.QtWidgets import QDialog, QVBoxLayout, QDialogButtonBox, QComboBox, QLabel, QMessageBox
-
         compra_id = self.obter_compra_id_selecionado()
         if not compra_id:
             QMessageBox.warning(self, "Atenção", "Selecione uma compra primeiro.")
             return
 
-        fornecedor_id = obter_fornecedor_id_da_compra(compra_id)
+        def buscar():
+            fornecedor_id = obter_fornecedor_id_da_compra(compra_id)
+            return fornecedor_id, listar_contas_do_fornecedor(fornecedor_id) if fornecedor_id else []
+        self.banco.executar(buscar, canal='troca_conta',
+                            ao_concluir=lambda r: self._escolher_conta_fornecedor(compra_id, *r))
+
+    def _escolher_conta_fornecedor(self, compra_id, fornecedor_id, contas_do_fornecedor):
+        from PySide6.QtWidgets import QDialog, QVBoxLayout, QDialogButtonBox, QComboBox, QLabel, QMessageBox
+
         if not fornecedor_id:
             QMessageBox.warning(self, "Erro", "Não foi possível identificar o fornecedor da compra selecionada.")
             return
-
-        contas_do_fornecedor = listar_contas_do_fornecedor(fornecedor_id)
         if not contas_do_fornecedor:
             QMessageBox.information(self, "Sem contas", "Este fornecedor não possui contas bancárias cadastradas.")
             return
@@ -484,12 +494,12 @@ class ComprasUI(QWidget):
 
         def on_ok():
             conta_id = combo_contas.currentData()
-            compra_id_local = self.obter_compra_id_selecionado()
-            if conta_id and compra_id_local:
-                atualizar_conta_bancaria_da_compra(compra_id_local, conta_id)
-                # Chama o méodo para atualizar o campo copiável
-                self.atualizar_campo_texto_copiavel()
-            dialog.accept()
+            if not conta_id:
+                dialog.accept()
+                return
+            # O diálogo fica travado até a gravação terminar
+            self.banco.gravar(dialog, atualizar_conta_bancaria_da_compra, compra_id, conta_id,
+                              ao_concluir=lambda _: (self.atualizar_campo_texto_copiavel(), dialog.accept()))
 
         def on_cancel():
             dialog.reject()
@@ -506,7 +516,7 @@ class ComprasUI(QWidget):
         data_ate = self.filtro_data_ate.date().toPython()
 
         # Em aberto: todas exceto concluída
-        compras_aberto = listar_compras(
+        self.tabela_compras_aberto.model().carregar(
             status=None if status_filtro == "Concluída" else status_filtro,
             status_not="Concluída",
             data_de=data_de,
@@ -514,43 +524,58 @@ class ComprasUI(QWidget):
             fornecedor_id=fornecedor_id
         )
         # Concluídas: só concluída
-        compras_concluidas = listar_compras(
+        self.tabela_compras_concluidas.model().carregar(
             status="Concluída",
             data_de=data_de,
             data_ate=data_ate,
             fornecedor_id=fornecedor_id
         )
-        self.preencher_tabela_compras(self.tabela_compras_aberto, compras_aberto)
-        self.preencher_tabela_compras(self.tabela_compras_concluidas, compras_concluidas)
 
-    def preencher_tabela_compras(self, tabela, compras):
-        tabela.blockSignals(True)
-        try:
-            tabela.setRowCount(len(compras))
-            for i, c in enumerate(compras):
-                tabela.setItem(i, 0, QTableWidgetItem(str(c['id'])))
-                tabela.setItem(i, 1, QTableWidgetItem(c['fornecedor_nome']))
-                tabela.setItem(i, 2, QTableWidgetItem(str(c['data'])))
-                total_produtos = obter_total_produtos(c['id'])
-                tabela.setItem(i, 3, QTableWidgetItem(self.locale.toString(float(total_produtos), 'f', 2)))
-                valor_final = obter_valor_com_abatimento_adiantamento(c['id'], total_produtos)
-                tabela.setItem(i, 4, QTableWidgetItem(self.locale.toString(float(valor_final), 'f', 2)))
-                tabela.setItem(i, 5, QTableWidgetItem(c['status']))
-                pass
-        finally:
-            tabela.blockSignals(False)
-
-    def on_status_item_changed(self, item):
-        if item.column() == 5:
-            row = item.row()
-            tabela = item.tableWidget()
-            compra_id = int(tabela.item(row, 0).text())
-            novo_status = item.text()
-            self.atualizar_status_compra(compra_id, novo_status)
-            self.atualizar_tabelas()
-
-    def atualizar_status_compra(self, compra_id, novo_status):
-        atualizar_status_compra_db(compra_id, novo_status)
+    def on_status_alterado(self, compra_id, novo_status):
+        # A célula já mostra o novo status; o evento tira a linha da aba se ela mudou de lado
+        self.atualizar_status_compra(compra_id, novo_status)
+
+    # ---- Eventos ----
+
+    def ao_salvar_compra(self, compra_id, fornecedor_id):
+        self.recarregar_compra(compra_id)
+        self.ao_mudar_debitos(fornecedor_id)
+
+    def ao_excluir_compra(self, compra_id, fornecedor_id):
+        for tabela in (self.tabela_compras_aberto, self.tabela_compras_concluidas):
+            tabela.model().aplicar_compra(compra_id, None)
+        self.ao_mudar_debitos(fornecedor_id)
+
+    def ao_mudar_status_compra(self, compra_id, _status):
+        self.recarregar_compra(compra_id)
+
+    def ao_mudar_debitos(self, fornecedor_id):
+        if fornecedor_id == self.combo_fornecedor.currentData():
+            self.atualizar_saldo_fornecedor()
+
+    def ao_mudar_produto(self, _produto_id):
+        self.carregar_produtos()
+        self.carregar_precos_da_categoria()
+
+    def recarregar_compra(self, compra_id):
+        """Busca só a linha da compra e a aplica nas duas abas (ela pode ter mudado de aba)."""
+        def aplicar(resumo):
+            for tabela in (self.tabela_compras_aberto, self.tabela_compras_concluidas):
+                tabela.model().aplicar_compra(compra_id, resumo)
+        self.banco.executar(obter_resumo_compra, compra_id, canal=('compra', compra_id), ao_concluir=aplicar)
+
+    def atualizar_status_compra(self, compra_id, novo_status, mensagem=None):
+        def concluir(_):
+            eventos().status_compra_alterado.emit(compra_id, novo_status)
+            if mensagem:
+                QMessageBox.information(self, "Sucesso", mensagem)
+
+        def falhar(erro):
+            self.recarregar_compra(compra_id)  # a célula volta ao status gravado
+            QMessageBox.critical(self, "Erro", f"Erro ao alterar o status: {erro}")
+
+        self.banco.gravar(self, atualizar_status_compra_db, compra_id, novo_status,
+                          ao_concluir=concluir, ao_falhar=falhar)
 
     def aplicar_filtro_compras(self):
         self.atualizar_tabelas()
@@ -568,12 +593,18 @@ class ComprasUI(QWidget):
     def atualizar_saldo_fornecedor(self):
         fornecedor_id = self.combo_fornecedor.currentData()
         if not fornecedor_id:
+            self.banco.cancelar('saldo')
             self.label_saldo_fornecedor.setText("Saldo devedor: R$ 0,00")
             self.label_saldo_fornecedor.setStyleSheet(
                 "font-weight: bold; color: #808080; font-size: 13px; text-decoration: underline; cursor: pointer;")
             return
 
-        saldo = float(obter_saldo_devedor_fornecedor(fornecedor_id))
+        self.banco.executar(
+            obter_saldo_devedor_fornecedor, fornecedor_id, canal='saldo', ao_concluir=self.mostrar_saldo_fornecedor
+        )
+
+    def mostrar_saldo_fornecedor(self, saldo):
+        saldo = float(saldo)
 
         # Define texto e cor de acordo com o saldo
         if saldo > 0:
@@ -594,12 +625,12 @@ class ComprasUI(QWidget):
     @requer_permissao(['admin', 'gerente', 'operador'])
     def on_saldo_label_clicked(self, event):
         fornecedor_id = self.combo_fornecedor.currentData()
-        if fornecedor_id and hasattr(self, 'janela_debitos'):
-            if hasattr(self.janela_debitos, "filtrar_por_fornecedor"):
-                self.janela_debitos.filtrar_por_fornecedor(fornecedor_id)
+        janela_debitos = self.obter_janela_debitos() if fornecedor_id else None
+        if janela_debitos:
+            if hasattr(janela_debitos, "filtrar_por_fornecedor"):
+                janela_debitos.filtrar_por_fornecedor(fornecedor_id)
             if hasattr(self, "main_window"):
-                index = self.main_window.stack.indexOf(self.janela_debitos)
-                self.main_window.stack.setCurrentIndex(index)
+                self.main_window.stack.setCurrentWidget(janela_debitos)
 
     def set_main_window(self, main_window):
         self.main_window = main_window
@@ -631,11 +662,6 @@ class ComprasUI(QWidget):
             QMessageBox.warning(self, "Erro", "Selecione um produto e uma quantidade válida.")
             return
 
-        produto = obter_produto(produto_id)
-        if produto is None:
-            QMessageBox.critical(self, "Erro", "Produto não encontrado.")
-            return
-
         fornecedor_id = self.combo_fornecedor.currentData()
         if fornecedor_id is None:
             QMessageBox.warning(self, "Erro", "Selecione um fornecedor.")
@@ -648,9 +674,13 @@ class ComprasUI(QWidget):
                 QMessageBox.warning(self, "Erro", "Selecione uma categoria válida para esta compra.")
                 return
 
-        ajuste_fixo = obter_ajuste_fixo(produto_id, categoria_id)
+        # Normalmente já está em memória: a matriz da categoria é carregada ao selecioná-la
+        produto = obter_preco(categoria_id, produto_id)
+        if produto is None:
+            QMessageBox.critical(self, "Erro", "Produto não encontrado.")
+            return
 
-        preco = Decimal(str(produto["preco_base"])) + ajuste_fixo
+        preco = Decimal(str(produto["preco_final"]))
         total = Decimal(str(quantidade)) * preco
 
         self.itens_compra.append({
@@ -666,13 +696,41 @@ class ComprasUI(QWidget):
         self.input_quantidade.clear()
 
     def carregar_categorias_para_fornecedor(self, fornecedor_id):
+        self._categoria_pendente = None
+        self.banco.executar(
+            obter_categorias_do_fornecedor, fornecedor_id, canal='categorias',
+            ao_concluir=self.preencher_categorias
+        )
+
+    def carregar_precos_da_categoria(self, *_):
+        # Relê a matriz de preços ao escolher fornecedor/categoria (pode ter mudado em outra
+        # estação) para que adicionar_item não precise ir ao banco
+        categoria_id = self.combo_categoria_temporaria.currentData()
+
+        def carregar():
+            # Sem categoria escolhida, o item usa a "Padrão"
+            cid = categoria_id or obter_id_categoria_padrao()
+            if cid:
+                obter_matriz_precos(cid, recarregar=True)
+
+        self.banco.executar(carregar, canal='precos')
+
+    def preencher_categorias(self, categorias):
+        atual = self.combo_categoria_temporaria.currentData()
         self.combo_categoria_temporaria.blockSignals(True)
         self.combo_categoria_temporaria.clear()
         self.combo_categoria_temporaria.addItem("Selecione uma categoria", 0)
-        categorias = obter_categorias_do_fornecedor(fornecedor_id)
         for c in categorias:
             self.combo_categoria_temporaria.addItem(c['nome'], c['id'])
-        self.combo_categoria_temporaria.setCurrentIndex(1 if self.combo_categoria_temporaria.count() > 1 else 0)
+        # Mantém a categoria escolhida se ela continua na lista; senão, a primeira
+        indice = self.combo_categoria_temporaria.findData(atual) if atual else -1
+        if indice < 0:
+            indice = 1 if self.combo_categoria_temporaria.count() > 1 else 0
+        self.combo_categoria_temporaria.setCurrentIndex(indice)
+        self.combo_categoria_temporaria.blockSignals(False)
+        self.carregar_precos_da_categoria()
+        if self._categoria_pendente is not None:
+            self._aplicar_categoria_inicial(self._categoria_pendente)
 
     def atualizar_tabela_itens_adicionados(self):
         self.tabela_itens_adicionados.blockSignals(True)
@@ -737,52 +795,65 @@ class ComprasUI(QWidget):
         valor_abatimento = valor_lancamento if tipo_lancamento == "abatimento" else Decimal('0.00')
         valor_inclusao = valor_lancamento if tipo_lancamento == "adiantamento" else Decimal('0.00')
 
-        if self.compra_edit_id is None:
-            compra_id = adicionar_compra(
-                fornecedor_id, data_compra, valor_abatimento, self.itens_compra, status
-            )
-            if tipo_lancamento == "adiantamento" and valor_inclusao > 0:
-                inserir_adiantamento(fornecedor_id, compra_id, data_compra, valor_inclusao)
-            QMessageBox.information(self, "Sucesso", "Compra cadastrada com sucesso.")
-        else:
-            remover_lancamentos_antigos(self.compra_edit_id)
-            # ... atualização de valor_abatimento pode ser função de DB...
-            if tipo_lancamento == "adiantamento" and valor_inclusao > 0:
-                inserir_adiantamento(fornecedor_id, self.compra_edit_id, data_compra, valor_inclusao)
-            elif tipo_lancamento == "abatimento" and valor_abatimento > 0:
-                inserir_abatimento(fornecedor_id, self.compra_edit_id, data_compra, valor_abatimento)
-            atualizar_compra(
-                self.compra_edit_id,
-                fornecedor_id,
-                data_compra,
-                valor_abatimento,
-                self.itens_compra,
-                status
-            )
-            QMessageBox.information(self, "Sucesso", "Compra editada com sucesso.")
-
-        # Limpa e atualiza UI
-        self.limpar_campos()
-        self.atualizar_tabelas()
-        self.limpar_itens()
-        self.carregar_fornecedores()
-        self.carregar_produtos()
-        if hasattr(self, 'janela_debitos'):
-            self.janela_debitos.atualizar()
+        compra_edit_id = self.compra_edit_id
+        itens = list(self.itens_compra)
+
+        def gravar():
+            # Todas as gravações numa só conexão e um commit; se algo falhar, nada fica pela metade.
+            if compra_edit_id is None:
+                with transacao():
+                    compra_id = adicionar_compra(
+                        fornecedor_id, data_compra, valor_abatimento, itens, status
+                    )
+                    if tipo_lancamento == "adiantamento" and valor_inclusao > 0:
+                        inserir_adiantamento(fornecedor_id, compra_id, data_compra, valor_inclusao)
+                return compra_id, fornecedor_id
+            fornecedor_anterior = obter_fornecedor_id_da_compra(compra_edit_id)
+            with transacao():
+                remover_lancamentos_antigos(compra_edit_id)
+                # ... atualização de valor_abatimento pode ser função de DB...
+                if tipo_lancamento == "adiantamento" and valor_inclusao > 0:
+                    inserir_adiantamento(fornecedor_id, compra_edit_id, data_compra, valor_inclusao)
+                elif tipo_lancamento == "abatimento" and valor_abatimento > 0:
+                    inserir_abatimento(fornecedor_id, compra_edit_id, data_compra, valor_abatimento)
+                atualizar_compra(
+                    compra_edit_id,
+                    fornecedor_id,
+                    data_compra,
+                    valor_abatimento,
+                    itens,
+                    status
+                )
+            return compra_edit_id, fornecedor_anterior
+
+        def concluir(resultado):
+            compra_id, fornecedor_anterior = resultado
+            if compra_edit_id is None:
+                QMessageBox.information(self, "Sucesso", "Compra cadastrada com sucesso.")
+            else:
+                QMessageBox.information(self, "Sucesso", "Compra editada com sucesso.")
+
+            # Limpa e avisa as telas abertas
+            self.limpar_campos()
+            self.limpar_itens()
+            eventos().compra_salva.emit(compra_id, fornecedor_id)
+            if fornecedor_anterior and fornecedor_anterior != fornecedor_id:
+                eventos().debitos_alterados.emit(fornecedor_anterior)  # os lançamentos saíram dele
+
+        self.banco.gravar(self, gravar, ao_concluir=concluir,
+                          ao_falhar=lambda e: QMessageBox.critical(self, "Erro", f"Erro ao salvar compra: {e}"))
 
     @requer_permissao(['admin', 'gerente', 'operador'])
     def editar_compra_finalizada(self):
-        linha = self.tabela_compras_aberto.currentRow()
-        if linha < 0:
+        compra_id = self.obter_compra_id_selecionado()
+        if compra_id is None:
             QMessageBox.information(self, "Editar Compra", "Selecione uma compra para editar.")
             return
-        compra_id_item = self.tabela_compras_aberto.item(linha, 0)
-        if compra_id_item is None:
-            return
-        compra_id = int(compra_id_item.text())
 
-        compra, itens, valor_adiantamento = obter_dados_para_editar_compra(compra_id)
+        self.banco.gravar(self, obter_dados_para_editar_compra, compra_id,
+                          ao_concluir=lambda dados: self.preencher_edicao_compra(compra_id, *dados))
 
+    def preencher_edicao_compra(self, compra_id, compra, itens, valor_adiantamento):
         if compra is None:
             QMessageBox.warning(self, "Erro", "Compra não encontrada.")
             return
@@ -825,25 +896,20 @@ class ComprasUI(QWidget):
 
         novo_status, ok = QComboBox.getItem(self, "Alterar Status", "Selecione o novo status:", STATUS_LIST, 0, False)
         if ok and novo_status:
-            self.atualizar_status_compra(compra_id, novo_status)
-            self.atualizar_tabelas()
-            QMessageBox.information(self, "Sucesso", f"Status alterado para {novo_status}.")
-        # Se status for "Concluída", a compra irá automaticamente para a aba de concluídas na próxima atualização.
+            # O evento emitido ao concluir muda a linha de aba ("Concluída")
+            self.atualizar_status_compra(compra_id, novo_status, f"Status alterado para {novo_status}.")
 
     @requer_permissao(['admin', 'gerente'])
     def excluir_compra_finalizada(self):
-        linha = self.tabela_compras_aberto.currentRow()
-        if linha < 0:
+        compra_id = self.obter_compra_id_selecionado()
+        if compra_id is None:
             QMessageBox.information(self, "Excluir Compra", "Selecione uma compra para excluir.")
             return
 
-        compra_id_item = self.tabela_compras_aberto.item(linha, 0)
-        if compra_id_item is None:
-            return
+        self.banco.gravar(self, obter_itens_e_lancamentos_da_compra, compra_id,
+                          ao_concluir=lambda r: self.confirmar_exclusao_compra(compra_id, r[1]))
 
-        compra_id = int(compra_id_item.text())
-
-        _, valor_abatimento, _ = obter_itens_e_lancamentos_da_compra(compra_id)
+    def confirmar_exclusao_compra(self, compra_id, valor_abatimento):
         if valor_abatimento and valor_abatimento > 0:
             confirm = QMessageBox.question(
                 self,
@@ -864,32 +930,38 @@ class ComprasUI(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        try:
+        def excluir():
+            fornecedor_id = obter_fornecedor_id_da_compra(compra_id)
             excluir_compra(compra_id)
+            return fornecedor_id
+
+        def concluir(fornecedor_id):
+            eventos().compra_excluida.emit(compra_id, fornecedor_id or 0)
             QMessageBox.information(self, "Sucesso", "Compra excluída com sucesso.")
-            self.atualizar_tabelas()
             self.tabela_itens_compra.setRowCount(0)
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao excluir compra: {e}")
 
-        if hasattr(self, 'janela_debitos'):
-            self.janela_debitos.atualizar()
+        self.banco.gravar(self, excluir, ao_concluir=concluir,
+                          ao_falhar=lambda e: QMessageBox.critical(self, "Erro", f"Erro ao excluir compra: {e}"))
 
     def selecionar_fornecedor_por_numero_balanca(self, campo_input: QLineEdit, combo_fornecedor: QComboBox):
         numero = campo_input.text().strip()
         if not numero:
             return
 
-        fornecedor_id = obter_fornecedor_id_por_numero_balanca(numero)
-        if fornecedor_id:
-            idx = combo_fornecedor.findData(fornecedor_id)
-            if idx >= 0:
-                combo_fornecedor.setCurrentIndex(idx)
-                if hasattr(self, 'selecionar_categoria_do_fornecedor'):
-                    self.selecionar_categoria_do_fornecedor(fornecedor_id)
-        else:
-            QMessageBox.warning(self, "Fornecedor não encontrado", f"Nenhum fornecedor com número de balança {numero}.")
-            self.input_numero_balanca.clear()
+        def selecionar(fornecedor_id):
+            if fornecedor_id:
+                idx = combo_fornecedor.findData(fornecedor_id)
+                if idx >= 0:
+                    combo_fornecedor.setCurrentIndex(idx)
+                    if hasattr(self, 'selecionar_categoria_do_fornecedor'):
+                        self.selecionar_categoria_do_fornecedor(fornecedor_id)
+            else:
+                QMessageBox.warning(self, "Fornecedor não encontrado", f"Nenhum fornecedor com número de balança {numero}.")
+                self.input_numero_balanca.clear()
+
+        self.banco.executar(
+            obter_fornecedor_id_por_numero_balanca, numero, canal=('balanca', id(campo_input)), ao_concluir=selecionar
+        )
 
     def limpar_campos(self):
         self.combo_fornecedor.setCurrentIndex(0)
@@ -912,13 +984,15 @@ class ComprasUI(QWidget):
     def mostrar_itens_da_compra(self, row, column, tabela=None):
         if tabela is None:
             tabela = self.tabela_compras_aberto
-        compra_id_item = tabela.item(row, 0)
-        if compra_id_item is None:
+        compra_id = tabela.model().compra_id(row)
+        if compra_id is None:
             return
+        self.banco.executar(
+            obter_itens_e_lancamentos_da_compra, compra_id, canal='itens_compra',
+            ao_concluir=lambda dados: self.preencher_itens_da_compra(*dados)
+        )
 
-        compra_id = int(compra_id_item.text())
-        itens, valor_abatimento, valor_adiantamento = obter_itens_e_lancamentos_da_compra(compra_id)
-
+    def preencher_itens_da_compra(self, itens, valor_abatimento, valor_adiantamento):
         subtotal = float(sum(item["total"] for item in itens))
 
         # Mostra linhas dos itens
@@ -954,19 +1028,33 @@ class ComprasUI(QWidget):
         self.atualizar_campo_texto_copiavel()
 
     def carregar_fornecedores(self):
+        self.banco.executar(listar_fornecedores, canal='fornecedores', ao_concluir=self.preencher_fornecedores)
+
+    def preencher_fornecedores(self, fornecedores):
+        # A lista chega depois; mantém o que o usuário já tiver escolhido nesse meio tempo
+        selecionado = self.combo_fornecedor.currentData()
+        filtro = self.filtro_combo_fornecedor.currentData()
+        for combo in (self.combo_fornecedor, self.filtro_combo_fornecedor):
+            combo.blockSignals(True)
         self.combo_fornecedor.clear()
         self.filtro_combo_fornecedor.clear()
         self.filtro_combo_fornecedor.addItem("Todos os Fornecedores", None)
         self.combo_fornecedor.addItem("", None)
-        for f in listar_fornecedores():
+        for f in fornecedores:
             self.combo_fornecedor.addItem(f["nome"], f["id"])
             self.filtro_combo_fornecedor.addItem(f["nome"], f["id"])
+        self.combo_fornecedor.setCurrentIndex(max(0, self.combo_fornecedor.findData(selecionado)))
+        self.filtro_combo_fornecedor.setCurrentIndex(max(0, self.filtro_combo_fornecedor.findData(filtro)))
+        for combo in (self.combo_fornecedor, self.filtro_combo_fornecedor):
+            combo.blockSignals(False)
 
     def carregar_produtos(self):
+        self.banco.executar(listar_produtos, canal='produtos', ao_concluir=self.preencher_produtos)
+
+    def preencher_produtos(self, produtos):
         self.combo_produto.blockSignals(True)
         self.combo_produto.clear()
         self.combo_produto.setEditable(True)
-        produtos = listar_produtos()
         produtos.sort(key=lambda p: p["nome"])
         for p in produtos:
             self.combo_produto.addItem(p['nome'], p['id'])
@@ -997,19 +1085,22 @@ class ComprasUI(QWidget):
             QMessageBox.warning(self, "Erro", "Valor inválido. Digite um número válido.")
 
     def set_janela_debitos(self, janela_debitos):
+        """Recebe a tela de débitos, ou uma função `f(criar)` que a devolve quando for criada sob demanda."""
         self.janela_debitos = janela_debitos
 
+    def obter_janela_debitos(self, criar=True):
+        janela = getattr(self, 'janela_debitos', None)
+        if callable(janela):
+            return janela(criar)
+        return janela
+
     @requer_permissao(['admin', 'gerente', 'operador', 'consulta'])
     def exportar_compra_pdf(self):
         compra_id = self.obter_compra_id_selecionado()
         if compra_id is None:
             QMessageBox.warning(self, "Exportar PDF", "Selecione uma compra para exportar.")
             return
-        compra, itens = obter_detalhes_compra(compra_id)
-        saldo = obter_saldo_devedor_fornecedor(compra['fornecedor_id'])
-        filename = f"compra_{compra_id}.pdf"
-        exportar_compra_pdf(compra, itens, saldo, filename,
-                            marca_dagua_texto=str(compra.get('fornecedores_numerobalanca', '')))
+        self._exportar_compra(compra_id, "pdf")
 
     @requer_permissao(['admin', 'gerente', 'operador', 'consulta'])
     def exportar_compra_jpg(self):
@@ -1017,10 +1108,97 @@ class ComprasUI(QWidget):
         if compra_id is None:
             QMessageBox.warning(self, "Exportar JPG", "Selecione uma compra para exportar.")
             return
-        compra, itens = obter_detalhes_compra(compra_id)
-        saldo = obter_saldo_devedor_fornecedor(compra['fornecedor_id'])
-        filename = f"compra_{compra_id}.jpg"
-        exportar_compra_jpg(compra, itens, saldo, filename, marca_dagua_texto=str(compra.get('fornecedores_numerobalanca', '')))
+        self._exportar_compra(compra_id, "jpg")
+
+    def _exportar_compra(self, compra_id, formato):
+        def exportar():
+            # Busca, renderização e abertura do arquivo fora da thread da interface
+            compra, itens = obter_detalhes_compra(compra_id)
+            saldo = obter_saldo_devedor_fornecedor(compra['fornecedor_id'])
+            filename = f"compra_{compra_id}.{formato}"
+            from . import compras_export  # reportlab/PIL só na primeira exportação
+            exportar_arquivo = compras_export.exportar_compra_pdf if formato == "pdf" else compras_export.exportar_compra_jpg
+            exportar_arquivo(compra, itens, saldo, filename,
+                             marca_dagua_texto=str(compra.get('fornecedores_numerobalanca', '')))
+
+        self.banco.gravar(self, exportar, ao_falhar=lambda e: QMessageBox.critical(
+            self, f"Exportar {formato.upper()}", f"Erro ao exportar: {e}"))
+
+    @requer_permissao(['admin', 'gerente', 'operador', 'consulta'])
+    def exportar_compras_concluidas_lote(self):
+        data_de = self.filtro_data_de.date().toPython()
+        data_ate = self.filtro_data_ate.date().toPython()
+        self.banco.gravar(
+            self, listar_compras_resumo,
+            status="Concluída", data_de=data_de, data_ate=data_ate,
+            fornecedor_id=self.filtro_combo_fornecedor.currentData(),
+            ao_concluir=lambda resumo: self._exportar_lote(resumo, data_de, data_ate)
+        )
+
+    def _exportar_lote(self, resumo, data_de, data_ate):
+        if not resumo:
+            QMessageBox.information(self, "Exportar em lote", "Nenhuma compra concluída no período do filtro.")
+            return
+
+        formato, ok = QInputDialog.getItem(self, "Exportar em lote", "Formato:", ["PDF", "JPG"], 0, False)
+        if not ok:
+            return
+        formato = formato.lower()
+        compactar = QMessageBox.question(
+            self, "Exportar em lote", "Gerar um único arquivo .zip em vez de uma pasta?",
+            QMessageBox.Yes | QMessageBox.No
+        ) == QMessageBox.Yes
+        nome_padrao = f"compras_{data_de.strftime('%Y%m%d')}_{data_ate.strftime('%Y%m%d')}"
+        if compactar:
+            destino, _ = QFileDialog.getSaveFileName(self, "Salvar zip", f"{nome_padrao}.zip", "Zip (*.zip)")
+        else:
+            destino = QFileDialog.getExistingDirectory(self, "Pasta de destino")
+        if not destino:
+            return
+
+        ids = [c['id'] for c in resumo]
+        cancelar = threading.Event()
+        progresso = QProgressDialog("Exportando compras...", "Cancelar", 0, len(ids), self)
+        progresso.setWindowTitle("Exportar em lote")
+        progresso.setWindowModality(Qt.WindowModal)
+        progresso.setMinimumDuration(0)
+        progresso.canceled.connect(cancelar.set)
+        aviso = _AvisoProgresso(progresso)
+        aviso.progrediu.connect(progresso.setValue)
+
+        def exportar():
+            # Busca e renderização no pool de threads; a interface só recebe o progresso
+            detalhes = obter_detalhes_compras(ids)
+            saldos = obter_saldos_devedores_fornecedores(compra['fornecedor_id'] for compra, _ in detalhes.values())
+            compras = [
+                (compra, itens, saldos[compra['fornecedor_id']])
+                for compra, itens in (detalhes[i] for i in ids if i in detalhes)
+            ]
+            from .compras_export import exportar_compras_lote
+            feitos = exportar_compras_lote(
+                compras, formato, destino, compactar=compactar,
+                ao_progredir=aviso.progrediu.emit, cancelado=cancelar.is_set
+            )
+            return feitos, len(compras)
+
+        def concluir(resultado):
+            progresso.close()
+            feitos, total = resultado
+            if feitos < total:
+                QMessageBox.information(
+                    self, "Exportar em lote",
+                    f"Exportação cancelada após {feitos} de {total} compras; nenhum arquivo foi gravado."
+                )
+            else:
+                QMessageBox.information(self, "Exportar em lote", f"{feitos} compras exportadas em:\n{destino}")
+
+        def falhar(erro):
+            progresso.close()
+            QMessageBox.critical(
+                self, "Exportar em lote", f"Erro ao exportar: {erro}\nNenhum arquivo foi gravado."
+            )
+
+        self.banco.executar(exportar, ao_concluir=concluir, ao_falhar=falhar)
 
     def showEvent(self, event):
         super().showEvent(event)
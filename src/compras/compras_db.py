@@ -1,10 +1,14 @@
 from db_context import get_cursor
+from saldos_fornecedores import aplicar_lancamento, estornar_lancamentos, obter_saldo, obter_saldos
 from decimal import Decimal
+from itens_db import inserir_itens, sincronizar_itens, total_itens
+# Dados de referência vêm do cache compartilhado; reexportados para as telas de compras
+from cache_referencia import (
+    listar_fornecedores, listar_produtos, obter_produto, obter_categorias_do_fornecedor,
+    obter_id_categoria_padrao, obter_fornecedor_id_por_numero_balanca, obter_matriz_precos, obter_preco,
+)
 
-def listar_fornecedores():
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id, nome FROM fornecedores ORDER BY nome")
-        return cursor.fetchall()
+TAMANHO_LOTE_IDS = 500  # ids por consulta IN (...)
 
 def listar_contas_do_fornecedor(fornecedor_id):
     if not fornecedor_id:
@@ -29,66 +33,112 @@ def listar_contas_do_fornecedor(fornecedor_id):
             for row in rows
         ]
 
-def listar_produtos():
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id, nome, preco_base FROM produtos ORDER BY nome")
-        return cursor.fetchall()
-
-def obter_produto(produto_id):
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id, nome, preco_base FROM produtos WHERE id = %s", (produto_id,))
-        return cursor.fetchone()
-
-def listar_compras(status=None, status_not=None, data_de=None, data_ate=None, fornecedor_id=None):
-    query = """
-        SELECT c.id, c.data_compra AS data, c.valor_abatimento, c.total, f.nome AS fornecedor_nome, c.status
-        FROM compras c
-        JOIN fornecedores f ON c.fornecedor_id = f.id
-        WHERE 1=1
-    """
+def _filtros_compras(status=None, status_not=None, data_de=None, data_ate=None, fornecedor_id=None, compra_id=None):
+    condicoes = ""
     params = []
+    if compra_id:
+        condicoes += " AND c.id = %s"
+        params.append(compra_id)
     if status:
-        query += " AND c.status = %s"
+        condicoes += " AND c.status = %s"
         params.append(status)
     if status_not:
-        query += " AND c.status != %s"
+        condicoes += " AND c.status != %s"
         params.append(status_not)
     if data_de:
-        query += " AND c.data_compra >= %s"
+        condicoes += " AND c.data_compra >= %s"
         params.append(data_de)
     if data_ate:
-        query += " AND c.data_compra <= %s"
+        condicoes += " AND c.data_compra <= %s"
         params.append(data_ate)
     if fornecedor_id:
-        query += " AND f.id = %s"
+        condicoes += " AND f.id = %s"
         params.append(fornecedor_id)
+    return condicoes, params
+
+def listar_compras(status=None, status_not=None, data_de=None, data_ate=None, fornecedor_id=None):
+    query = """
+        SELECT c.id, c.data_compra AS data, c.valor_abatimento, c.total, f.nome AS fornecedor_nome, c.status
+        FROM compras c
+        JOIN fornecedores f ON c.fornecedor_id = f.id
+        WHERE 1=1
+    """
+    condicoes, params = _filtros_compras(status, status_not, data_de, data_ate, fornecedor_id)
+    query += condicoes
     query += " ORDER BY c.data_compra DESC"
 
     with get_cursor() as cursor:
         cursor.execute(query, params)
         return cursor.fetchall()
 
+def listar_compras_resumo(status=None, status_not=None, data_de=None, data_ate=None, fornecedor_id=None,
+                          limite=None, apos=None, crescente=False, compra_id=None):
+    """Lista as compras já com total dos produtos, abatimento, inclusão e valor final.
+
+    Tudo sai de uma única consulta agrupada, no lugar de consultar cada compra
+    separadamente ao montar as tabelas. Com `limite`, devolve uma página ordenada
+    por (data_compra, id); `apos` recebe o par (data, id) da última linha da página
+    anterior (paginação por chave, sem OFFSET).
+    """
+    query = """
+        SELECT r.*,
+               CASE
+                   WHEN r.valor_inclusao > 0 THEN r.total_produtos + r.valor_inclusao
+                   ELSE r.total_produtos - r.valor_abatimento
+               END AS valor_final
+        FROM (
+            SELECT c.id,
+                   c.fornecedor_id,
+                   f.nome AS fornecedor_nome,
+                   c.data_compra AS data,
+                   c.status,
+                   COALESCE(c.valor_abatimento, 0) AS valor_abatimento,
+                   COALESCE(SUM(i.quantidade * i.preco_unitario), 0) AS total_produtos,
+                   (SELECT COALESCE(SUM(d.valor), 0)
+                    FROM debitos_fornecedores d
+                    WHERE d.compra_id = c.id
+                      AND d.tipo = 'inclusao') AS valor_inclusao
+            FROM compras c
+                 JOIN fornecedores f ON c.fornecedor_id = f.id
+                 LEFT JOIN itens_compra i ON i.compra_id = c.id
+            WHERE 1=1
+    """
+    condicoes, params = _filtros_compras(status, status_not, data_de, data_ate, fornecedor_id, compra_id)
+    query += condicoes
+    comparacao = ">" if crescente else "<"
+    if apos is not None:
+        data_apos, id_apos = apos
+        query += f" AND (c.data_compra {comparacao} %s OR (c.data_compra = %s AND c.id {comparacao} %s))"
+        params += [data_apos, data_apos, id_apos]
+    direcao = "ASC" if crescente else "DESC"
+    query += f"""
+            GROUP BY c.id, c.fornecedor_id, f.nome, c.data_compra, c.status, c.valor_abatimento
+        ) r
+        ORDER BY r.data {direcao}, r.id {direcao}
+    """
+    if limite:
+        query += " LIMIT %s"
+        params.append(int(limite))
+
+    with get_cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def obter_resumo_compra(compra_id):
+    """A linha de listar_compras_resumo de uma compra (None se ela não existe mais)."""
+    linhas = listar_compras_resumo(compra_id=compra_id)
+    return linhas[0] if linhas else None
+
 def adicionar_compra(fornecedor_id, data_compra, valor_abatimento, itens_compra, status):
+    # Sem itens o total fica NULL, como o SUM sobre nenhuma linha deixava
+    total = total_itens(itens_compra) if itens_compra else None
     with get_cursor(commit=True) as cursor:
         cursor.execute(
-            "INSERT INTO compras (fornecedor_id, data_compra, valor_abatimento, status) VALUES (%s, %s, %s, %s)",
-            (fornecedor_id, data_compra, valor_abatimento, status)
+            "INSERT INTO compras (fornecedor_id, data_compra, valor_abatimento, status, total) VALUES (%s, %s, %s, %s, %s)",
+            (fornecedor_id, data_compra, valor_abatimento, status, total)
         )
         compra_id = cursor.lastrowid
-
-        for item in itens_compra:
-            cursor.execute(
-                "INSERT INTO itens_compra (compra_id, produto_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
-                (compra_id, item['produto_id'], item['quantidade'], item['preco'])
-            )
-
-        cursor.execute("""
-            UPDATE compras
-            SET total = (SELECT SUM(quantidade * preco_unitario)
-                         FROM itens_compra
-                         WHERE compra_id = %s)
-            WHERE id = %s
-        """, (compra_id, compra_id))
+        inserir_itens(cursor, 'itens_compra', 'compra_id', compra_id, itens_compra)
 
         if valor_abatimento and valor_abatimento > 0:
             cursor.execute(
@@ -98,35 +148,23 @@ def adicionar_compra(fornecedor_id, data_compra, valor_abatimento, itens_compra,
                 """,
                 (fornecedor_id, compra_id, data_compra, 'Abatimento em compra', abs(valor_abatimento))
             )
+            aplicar_lancamento(cursor, fornecedor_id, 'abatimento', abs(valor_abatimento))
 
     return compra_id
 
 def atualizar_compra(compra_id, fornecedor_id, data_compra, valor_abatimento, itens_compra, status):
+    total = total_itens(itens_compra) if itens_compra else None
     with get_cursor(commit=True) as cursor:
         cursor.execute("""
             UPDATE compras
             SET fornecedor_id=%s,
                 data_compra=%s,
                 valor_abatimento=%s,
-                status=%s
+                status=%s,
+                total=%s
             WHERE id = %s
-        """, (fornecedor_id, data_compra, valor_abatimento, status, compra_id))
-
-        cursor.execute("DELETE FROM itens_compra WHERE compra_id = %s", (compra_id,))
-
-        for item in itens_compra:
-            cursor.execute(
-                "INSERT INTO itens_compra (compra_id, produto_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
-                (compra_id, item['produto_id'], item['quantidade'], item['preco'])
-            )
-
-        cursor.execute("""
-            UPDATE compras
-            SET total = (SELECT SUM(quantidade * preco_unitario)
-                         FROM itens_compra
-                         WHERE compra_id = %s)
-            WHERE id = %s
-        """, (compra_id, compra_id))
+        """, (fornecedor_id, data_compra, valor_abatimento, status, total, compra_id))
+        sincronizar_itens(cursor, 'itens_compra', 'compra_id', compra_id, itens_compra)
 
 def listar_itens_compra(compra_id):
     with get_cursor() as cursor:
@@ -151,7 +189,8 @@ def obter_fornecedor_id_da_compra(compra_id):
 def obter_detalhes_compra(compra_id):
     with get_cursor() as cursor:
         cursor.execute("""
-            SELECT f.id   AS fornecedor_id,
+            SELECT c.id,
+                   f.id   AS fornecedor_id,
                    f.nome AS fornecedor,
                    f.fornecedores_numerobalanca,
                    c.data_compra,
@@ -174,6 +213,44 @@ def obter_detalhes_compra(compra_id):
         itens = cursor.fetchall()
     return compra, itens
 
+def obter_detalhes_compras(compra_ids):
+    """Versão em lote de obter_detalhes_compra: {compra_id: (compra, itens)}."""
+    detalhes = {}
+    ids = list(compra_ids)
+    with get_cursor() as cursor:
+        for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+            lote = ids[inicio:inicio + TAMANHO_LOTE_IDS]
+            marcadores = ", ".join(["%s"] * len(lote))
+            cursor.execute(f"""
+                SELECT c.id,
+                       f.id   AS fornecedor_id,
+                       f.nome AS fornecedor,
+                       f.fornecedores_numerobalanca,
+                       c.data_compra,
+                       c.valor_abatimento
+                FROM compras c
+                     JOIN fornecedores f ON c.fornecedor_id = f.id
+                WHERE c.id IN ({marcadores})
+            """, lote)
+            for compra in cursor.fetchall():
+                detalhes[compra['id']] = (compra, [])
+
+            cursor.execute(f"""
+                SELECT i.compra_id,
+                       p.nome                            AS produto_nome,
+                       i.quantidade,
+                       i.preco_unitario,
+                       (i.quantidade * i.preco_unitario) AS total
+                FROM itens_compra i
+                     JOIN produtos p ON i.produto_id = p.id
+                WHERE i.compra_id IN ({marcadores})
+                ORDER BY i.compra_id
+            """, lote)
+            for item in cursor.fetchall():
+                if item['compra_id'] in detalhes:
+                    detalhes[item['compra_id']][1].append(item)
+    return detalhes
+
 def obter_total_produtos(compra_id):
     with get_cursor() as cursor:
         cursor.execute("""
@@ -208,72 +285,10 @@ def obter_valor_com_abatimento_adiantamento(compra_id, total_produtos=None):
         return total_produtos - abatimento
 
 def obter_saldo_devedor_fornecedor(fornecedor_id):
-    with get_cursor() as cursor:
-        cursor.execute("""
-                        SELECT valor, tipo
-                        FROM debitos_fornecedores
-                        WHERE fornecedor_id = %s
-                        """, (fornecedor_id,))
-        saldo = Decimal('0.00')
-        for row in cursor.fetchall():
-            if row["tipo"] in ("inclusao", "adiantamento"):
-                saldo += Decimal(str(row["valor"]))
-            else:
-                saldo -= Decimal(str(row["valor"]))
-        return saldo
-
-def buscar_nome_conta_padrao(fornecedor_id):
-    try:
-        with get_cursor() as cursor:
-            cursor.execute("""
-                            SELECT nome_conta
-                            FROM dados_bancarios_fornecedor
-                            WHERE fornecedor_id = %s
-                            AND padrao = 1 LIMIT 1
-                            """, (fornecedor_id,))
-            row = cursor.fetchone()
-            return row["nome_conta"] if row else "Conta não cadastrada"
-    except mysql.connector.Error as e:
-        print(f"Erro ao buscar conta padrão: {e}")
-        return "Erro ao buscar conta"
-
-def obter_valor_com_abatimento_adiantamento(compra_id, total_produtos=None):
-    if total_produtos is None:
-        total_produtos = obter_total_produtos(compra_id)
-    with get_cursor() as cursor:
-        # Pega abatimento
-        cursor.execute("SELECT valor_abatimento FROM compras WHERE id = %s", (compra_id,))
-        row = cursor.fetchone()
-        abatimento = Decimal(str(row["valor_abatimento"])) if row and row["valor_abatimento"] else Decimal('0.0')
-        # Pega adiantamento/inclusao
-        cursor.execute("""
-                        SELECT COALESCE(SUM(valor), 0) as adiantamento
-                        FROM debitos_fornecedores
-                        WHERE compra_id = %s
-                        AND tipo = 'inclusao'
-                        """, (compra_id,))
-        row = cursor.fetchone()
-        adiantamento = Decimal(str(row["adiantamento"])) if row and row["adiantamento"] else Decimal('0.0')
-    total_produtos = Decimal(str(total_produtos))
-    if adiantamento > 0:
-        return total_produtos + adiantamento
-    else:
-        return total_produtos - abatimento
+    return obter_saldo(fornecedor_id)
 
-def obter_saldo_devedor_fornecedor(fornecedor_id):
-    with get_cursor() as cursor:
-        cursor.execute("""
-                        SELECT valor, tipo
-                        FROM debitos_fornecedores
-                        WHERE fornecedor_id = %s
-                        """, (fornecedor_id,))
-        saldo = Decimal('0.00')
-        for row in cursor.fetchall():
-            if row["tipo"] in ("inclusao", "adiantamento"):
-                saldo += Decimal(str(row["valor"]))
-            else:
-                saldo -= Decimal(str(row["valor"]))
-        return saldo
+def obter_saldos_devedores_fornecedores(fornecedor_ids):
+    return obter_saldos(fornecedor_ids)
 
 def buscar_nome_conta_padrao(fornecedor_id):
     try:
@@ -290,27 +305,6 @@ def buscar_nome_conta_padrao(fornecedor_id):
         print(f"Erro ao buscar conta padrão: {e}")
         return "Erro ao buscar conta"
 
-def obter_categorias_do_fornecedor(fornecedor_id):
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE fornecedor_id = %s ORDER BY nome", (fornecedor_id,))
-        return cursor.fetchall()
-
-def obter_id_categoria_padrao():
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id FROM categorias_fornecedor_por_fornecedor WHERE nome = %s LIMIT 1", ('Padrão',))
-        cat = cursor.fetchone()
-        return cat['id'] if cat else None
-
-def obter_ajuste_fixo(produto_id, categoria_id):
-    with get_cursor() as cursor:
-        cursor.execute("""
-            SELECT ajuste_fixo
-            FROM ajustes_fixos_produto_fornecedor_categoria
-            WHERE produto_id = %s AND categoria_id = %s
-        """, (produto_id, categoria_id))
-        ajuste = cursor.fetchone()
-    return Decimal(str(ajuste["ajuste_fixo"])) if ajuste else Decimal('0.00')
-
 def inserir_adiantamento(fornecedor_id, compra_id, data_compra, valor_inclusao):
     with get_cursor(commit=True) as cursor:
         cursor.execute(
@@ -321,6 +315,7 @@ def inserir_adiantamento(fornecedor_id, compra_id, data_compra, valor_inclusao):
             """,
             (fornecedor_id, compra_id, data_compra, 'Inclusão em compra', abs(valor_inclusao))
         )
+        aplicar_lancamento(cursor, fornecedor_id, 'inclusao', abs(valor_inclusao))
 
 def inserir_abatimento(fornecedor_id, compra_id, data_compra, valor_abatimento):
     with get_cursor(commit=True) as cursor:
@@ -332,9 +327,11 @@ def inserir_abatimento(fornecedor_id, compra_id, data_compra, valor_abatimento):
             """,
             (fornecedor_id, compra_id, data_compra, 'Abatimento em compra', abs(valor_abatimento))
         )
+        aplicar_lancamento(cursor, fornecedor_id, 'abatimento', abs(valor_abatimento))
 
 def remover_lancamentos_antigos(compra_id):
     with get_cursor(commit=True) as cursor:
+        estornar_lancamentos(cursor, "compra_id = %s AND (tipo = 'abatimento' OR tipo = 'inclusao')", (compra_id,))
         cursor.execute(
             "DELETE FROM debitos_fornecedores WHERE compra_id = %s AND (tipo = 'abatimento' OR tipo = 'inclusao')",
             (compra_id,)
@@ -396,21 +393,14 @@ def obter_itens_e_lancamentos_da_compra(compra_id):
 
 def excluir_compra(compra_id):
     with get_cursor(commit=True) as cursor:
+        estornar_lancamentos(cursor, "compra_id = %s", (compra_id,))
         cursor.execute("DELETE FROM debitos_fornecedores WHERE compra_id = %s", (compra_id,))
         cursor.execute("DELETE FROM itens_compra WHERE compra_id = %s", (compra_id,))
         cursor.execute("DELETE FROM compras WHERE id = %s", (compra_id,))
 
 def obter_primeira_categoria_do_fornecedor(fornecedor_id):
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id FROM categorias_fornecedor_por_fornecedor WHERE fornecedor_id = %s ORDER BY nome LIMIT 1", (fornecedor_id,))
-        result = cursor.fetchone()
-        return result['id'] if result else None
-
-def obter_fornecedor_id_por_numero_balanca(numero):
-    with get_cursor() as cursor:
-        cursor.execute("SELECT id FROM fornecedores WHERE fornecedores_numerobalanca = %s", (numero,))
-        resultado = cursor.fetchone()
-    return resultado['id'] if resultado else None
+    categorias = obter_categorias_do_fornecedor(fornecedor_id)
+    return categorias[0]['id'] if categorias else None
 
 def obter_dados_bancarios_para_campo_copiavel(compra_id):
     with get_cursor() as cursor:
@@ -3,22 +3,33 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib.colors import Color
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
+from marca_dagua import adicionar_marca_dagua_area, fonte_pdf
 import platform
 import os
+import tempfile
+import shutil
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-def exportar_compra_pdf(compra, itens, saldo, filename, marca_dagua_texto=""):
+INTERVALO_PROGRESSO = 0.1  # segundos entre atualizações de progresso no lote
+
+def abrir_arquivo(filename):
+    if platform.system() == "Windows":
+        os.startfile(filename)
+    elif platform.system() == "Darwin":
+        os.system(f"open '{filename}'")
+    else:
+        os.system(f"xdg-open '{filename}'")
+
+def exportar_compra_pdf(compra, itens, saldo, filename, marca_dagua_texto="", abrir=True):
     c = canvas.Canvas(filename, pagesize=A4)
     width, height = A4
     y = height - 30 * mm
 
-    try:
-        pdfmetrics.registerFont(TTFont('Arial', 'arial.ttf'))
-        fonte_padrao = 'Arial'
-    except:
-        fonte_padrao = 'Helvetica'
+    fonte_padrao = fonte_pdf()
 
     c.setFont(fonte_padrao + "-Bold", 14)
     c.drawString(20 * mm, y, f"Compra ID: {compra['id']}")
@@ -103,12 +114,8 @@ def exportar_compra_pdf(compra, itens, saldo, filename, marca_dagua_texto=""):
     c.drawString(20 * mm, y, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
     c.save()
 
-    if platform.system() == "Windows":
-        os.startfile(filename)
-    elif platform.system() == "Darwin":
-        os.system(f"open '{filename}'")
-    else:
-        os.system(f"xdg-open '{filename}'")
+    if abrir:
+        abrir_arquivo(filename)
 
 def adicionar_marca_dagua_pdf_area(c, texto, x_inicio, x_fim, y_topo, altura, tamanho_fonte=30, cor=(0.8, 0.8, 0.8), angulo=25, fonte_nome="Helvetica"):
     c.saveState()
@@ -131,7 +138,7 @@ def adicionar_marca_dagua_pdf_area(c, texto, x_inicio, x_fim, y_topo, altura, ta
         y -= step_y
     c.restoreState()
 
-def exportar_compra_jpg(compra, itens, saldo, filename, marca_dagua_texto=""):
+def exportar_compra_jpg(compra, itens, saldo, filename, marca_dagua_texto="", abrir=True):
     largura, altura = 800, 600 + (len(itens) + 1) * 25
     imagem = Image.new("RGB", (largura, altura), "white")
     draw = ImageDraw.Draw(imagem)
@@ -219,36 +226,72 @@ def exportar_compra_jpg(compra, itens, saldo, filename, marca_dagua_texto=""):
 
     imagem.save(filename)
 
-    if platform.system() == "Windows":
-        os.startfile(filename)
-    elif platform.system() == "Darwin":
-        os.system(f"open '{filename}'")
-    else:
-        os.system(f"xdg-open '{filename}'")
-
-def adicionar_marca_dagua_area(imagem, texto, x_inicio, x_fim, y_inicio, altura, fonte_path="arial.ttf", tamanho_fonte=30, opacidade=80, angulo=25):
+    if abrir:
+        abrir_arquivo(filename)
+
+def _exportar_em_processo(formato, compra, itens, saldo, caminho):
+    """Executada nos processos do pool; precisa ser função de módulo para ser serializável."""
+    exportar = exportar_compra_pdf if formato == "pdf" else exportar_compra_jpg
+    exportar(compra, itens, saldo, caminho,
+             marca_dagua_texto=str(compra.get('fornecedores_numerobalanca', '')), abrir=False)
+    return caminho
+
+def exportar_compras_lote(compras, formato, destino, compactar=False, ao_progredir=None, cancelado=None,
+                          max_processos=None):
+    """Exporta várias compras de uma vez, em paralelo, sem abrir os arquivos.
+
+    `compras` é uma lista de (compra, itens, saldo). Os arquivos vão para a pasta
+    `destino`, ou para o zip `destino` se `compactar`. `ao_progredir(feitos, total)`
+    é chamada a cada arquivo pronto e periodicamente enquanto espera; se `cancelado()`
+    devolver True, o que ainda não começou é descartado. Bloqueia até o fim: rode
+    fora da thread da interface.
+
+    Tudo é gerado numa pasta temporária ao lado do destino e só vai para o lugar
+    quando todas as compras ficaram prontas: cancelada ou com erro, a exportação não
+    deixa arquivos pela metade nem zip truncado. Retorna a quantidade de arquivos
+    gerados; menos que len(compras) quer dizer cancelada, sem nada gravado.
+    """
+    pasta_final = os.path.dirname(os.path.abspath(destino)) if compactar else destino
+    os.makedirs(pasta_final, exist_ok=True)
+    # Na mesma pasta do destino, para o os.replace final ser só uma renomeação
+    pasta = tempfile.mkdtemp(prefix=".compras_", dir=pasta_final)
+    total = len(compras)
+    feitos = 0
+    zip_temporario = os.path.join(pasta, os.path.basename(destino)) if compactar else None
     try:
-        fonte = ImageFont.truetype(fonte_path, tamanho_fonte)
-    except IOError:
-        fonte = ImageFont.load_default()
-    marca = Image.new("RGBA", imagem.size, (255, 255, 255, 0))
-    draw = ImageDraw.Draw(marca)
-
-    bbox = draw.textbbox((0, 0), texto, font=fonte)
-    texto_largura = bbox[2] - bbox[0]
-    texto_altura = bbox[3] - bbox[1]
-
-    step_x = texto_largura + 40
-    step_y = tamanho_fonte * 2
-
-    for y in range(int(y_inicio), int(y_inicio + altura), int(step_y)):
-        for x in range(int(x_inicio), int(x_fim), int(step_x)):
-            txt_img = Image.new("RGBA", (texto_largura + 20, texto_altura + 20), (255, 255, 255, 0))
-            txt_draw = ImageDraw.Draw(txt_img)
-            txt_draw.text((10, 10), texto, font=fonte, fill=(200, 200, 200, opacidade))
-            txt_img = txt_img.rotate(angulo, expand=1, resample=Image.BICUBIC)
-            px = int(x)
-            py = int(y)
-            marca.alpha_composite(txt_img, (px, py))
-    resultado = Image.alpha_composite(imagem.convert("RGBA"), marca)
-    return resultado.convert("RGB")
\ No newline at end of file
+        zip_saida = zipfile.ZipFile(zip_temporario, "w", zipfile.ZIP_DEFLATED) if compactar else None
+        # spawn: o processo principal tem threads do Qt, que não sobrevivem bem a um fork
+        executor = ProcessPoolExecutor(max_workers=max_processos, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futuros = [
+                executor.submit(_exportar_em_processo, formato, compra, itens, saldo,
+                                os.path.join(pasta, f"compra_{compra['id']}.{formato}"))
+                for compra, itens, saldo in compras
+            ]
+            pendentes = set(futuros)
+            while pendentes and not (cancelado and cancelado()):
+                # Acorda periodicamente para avisar o progresso e ver se foi cancelado
+                prontos, pendentes = wait(pendentes, timeout=INTERVALO_PROGRESSO, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    caminho = futuro.result()
+                    if zip_saida:
+                        zip_saida.write(caminho, os.path.basename(caminho))
+                        os.remove(caminho)
+                    feitos += 1
+                if ao_progredir:
+                    ao_progredir(feitos, total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if zip_saida:
+                zip_saida.close()
+        if feitos < total:
+            return feitos
+        if compactar:
+            os.replace(zip_temporario, destino)
+        else:
+            for futuro in futuros:
+                caminho = futuro.result()
+                os.replace(caminho, os.path.join(destino, os.path.basename(caminho)))
+        return feitos
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
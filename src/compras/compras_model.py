@@ -0,0 +1,177 @@
+from PySide6.QtCore import Qt, QModelIndex, Signal
+
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, Coluna, decimal
+from .compras_db import listar_compras_resumo
+
+TAMANHO_PAGINA = 200
+
+class ComprasTableModel(TabelaModel):
+    """Modelo das tabelas de compras, carregado página a página conforme a rolagem.
+
+    As páginas vêm de listar_compras_resumo com paginação por chave em
+    (data_compra, id), buscadas em segundo plano. Ordenar pela data só inverte
+    a direção da consulta; ordenar por outra coluna carrega o restante e ordena
+    em memória, e essa ordenação continua valendo nas cargas seguintes (mudança
+    de filtro). Uma nova carga descarta páginas ainda em trânsito da anterior.
+    """
+
+    COLUNA_DATA = 2
+    COLUNA_STATUS = 5
+
+    status_alterado = Signal(int, str)
+
+    def __init__(self, locale, parent=None):
+        super().__init__([
+            Coluna("ID", 'id'),
+            Coluna("Fornecedor", 'fornecedor_nome'),
+            Coluna("Data", 'data'),
+            Coluna("Total dos produtos (R$)", 'total_produtos', decimal),
+            Coluna("Valor com abatimento/adiantamento", 'valor_final', decimal),
+            Coluna("Status", 'status'),
+        ], locale, parent)
+        self._filtros = None
+        self._tem_mais = False
+        self._buscando = False
+        self._crescente = False
+        self._ordem = None  # (coluna, crescente) quando ordenado por outra coluna que não a data
+        self._banco = ExecutorBanco(self)
+
+    # ---- Carga ----
+
+    def carregar(self, **filtros):
+        """Descarta as linhas atuais e busca a primeira página com os novos filtros."""
+        self.beginResetModel()
+        self._filtros = filtros
+        self._linhas = []
+        self._tem_mais = True
+        self._buscando = False
+        self.endResetModel()
+        if self._ordem is not None:
+            self._carregar_tudo_e_ordenar()
+        else:
+            self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return (not parent.isValid() and self._filtros is not None
+                and self._tem_mais and not self._buscando)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._buscar(TAMANHO_PAGINA, self._receber_pagina)
+
+    def _buscar(self, limite, ao_concluir):
+        apos = None
+        if self._linhas:
+            ultima = self._linhas[-1]
+            apos = (ultima['data'], ultima['id'])
+        self._buscando = True
+        self._banco.executar(
+            listar_compras_resumo, limite=limite, apos=apos, crescente=self._crescente, **self._filtros,
+            canal='pagina', ao_concluir=ao_concluir, ao_falhar=self._falhou
+        )
+
+    def _falhou(self, erro):
+        self._buscando = False
+        self._tem_mais = False
+        self._banco.ao_falhar_padrao(erro)
+
+    def _receber_pagina(self, pagina):
+        self._buscando = False
+        self._tem_mais = len(pagina) == TAMANHO_PAGINA
+        self._anexar(pagina)
+
+    def _anexar(self, linhas):
+        if linhas:
+            inicio = len(self._linhas)
+            self.beginInsertRows(QModelIndex(), inicio, inicio + len(linhas) - 1)
+            self._linhas.extend(linhas)
+            self.endInsertRows()
+
+    def aplicar_compra(self, compra_id, resumo):
+        """Atualiza só a linha de uma compra gravada (resumo None: excluída).
+
+        A linha é trocada, sai se deixou de atender aos filtros, ou entra na posição da
+        ordenação ativa; se essa posição fica além das páginas já carregadas, ela
+        chega junto com a página certa.
+        """
+        if self._filtros is None:
+            return
+        if resumo is not None and not self._atende(resumo):
+            resumo = None
+        chave, decrescente = self._chave_ativa()
+        row = self.encontrar(compra_id)
+        if row >= 0:
+            if resumo is not None and chave(self._linhas[row]) == chave(resumo):
+                self.atualizar_linha(row, **resumo)
+                return
+            self.remover_linha(row)
+        if resumo is None:
+            return
+        posicao = self.posicao_ordenada(resumo, chave, decrescente)
+        if posicao < len(self._linhas) or not self._tem_mais:
+            self.inserir_linha(resumo, posicao)
+
+    def _chave_ativa(self):
+        """(chave, decrescente) da ordenação em uso, para posicionar linhas novas."""
+        if self._ordem is None:
+            return (lambda c: (c['data'], c['id'])), not self._crescente
+        column, crescente = self._ordem
+        return self.chave_ordenacao(column), not crescente
+
+    def _atende(self, c):
+        f = self._filtros
+        return ((not f.get('status') or c['status'] == f['status'])
+                and (not f.get('status_not') or c['status'] != f['status_not'])
+                and (not f.get('data_de') or c['data'] >= f['data_de'])
+                and (not f.get('data_ate') or c['data'] <= f['data_ate'])
+                and (not f.get('fornecedor_id') or c['fornecedor_id'] == f['fornecedor_id']))
+
+    def compra_id(self, row):
+        c = self.linha(row)
+        return c['id'] if c else None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == self.COLUNA_STATUS:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.column() != self.COLUNA_STATUS or role != Qt.EditRole:
+            return False
+        c = self._linhas[index.row()]
+        if c['status'] == value:
+            return False
+        self.atualizar_linha(index.row(), status=value)
+        self.status_alterado.emit(c['id'], value)
+        return True
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        crescente = order == Qt.AscendingOrder
+        if column == self.COLUNA_DATA:
+            self._crescente = crescente
+            self._ordem = None
+            if self._filtros is not None:
+                self.carregar(**self._filtros)
+            return
+        self._ordem = (column, crescente)
+        # Fora da chave de paginação não há como ordenar só o que já veio
+        if self._tem_mais and self._filtros is not None:
+            self._carregar_tudo_e_ordenar()
+            return
+        self._ordenar()
+
+    def _carregar_tudo_e_ordenar(self):
+        def ao_concluir(restante):
+            self._buscando = False
+            self._tem_mais = False
+            self._anexar(restante)
+            self._ordenar()
+        self._buscar(None, ao_concluir)
+
+    def _ordenar(self):
+        if self._ordem is not None:
+            column, crescente = self._ordem
+            super().sort(column, Qt.AscendingOrder if crescente else Qt.DescendingOrder)
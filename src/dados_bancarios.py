@@ -1,11 +1,15 @@
 import sys
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
-    QLineEdit, QMessageBox, QTableWidget, QTableWidgetItem,
+    QLineEdit, QMessageBox,
     QHBoxLayout, QComboBox, QGridLayout
 )
 from db_context import get_cursor
 from PySide6.QtCore import Qt, QLocale
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, TabelaView, Coluna, sim_nao
+from filtro_tabela import IndiceTrechos, FiltroProxyModel, temporizador_filtro
+import cache_referencia
 
 class DB:
     def listar_dados_bancarios(self):
@@ -18,9 +22,7 @@ class DB:
             return cursor.fetchall()
 
     def listar_fornecedores(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome, fornecedores_numerobalanca FROM fornecedores")
-            return cursor.fetchall()
+        return cache_referencia.listar_fornecedores()
 
     def limpar_padrao_anterior(self, fornecedor_id):
         with get_cursor(commit=True) as cursor:
@@ -61,6 +63,8 @@ class DadosBancariosUI(QWidget):
     def __init__(self):
         super().__init__()
         self.db = DB()
+        self.banco = ExecutorBanco(self)
+        self.fornecedores = []
         self.silenciar_sync = False  # flag para evitar loop de sinais
         self.init_ui()
 
@@ -74,7 +78,9 @@ class DadosBancariosUI(QWidget):
         self.input_filtro_nome.setPlaceholderText("Filtrar por nome ou número balança")
         self.btn_aplicar_filtro = QPushButton("Aplicar Filtro")
         self.btn_limpar_filtro = QPushButton("Limpar Filtro")
-        self.btn_aplicar_filtro.clicked.connect(self.carregar_tabela)
+        self.btn_aplicar_filtro.clicked.connect(self.aplicar_filtro)
+        self.timer_filtro = temporizador_filtro(self, self.aplicar_filtro)
+        self.input_filtro_nome.textChanged.connect(lambda _: self.timer_filtro.start())
         self.btn_limpar_filtro.clicked.connect(self.limpar_filtro)
         filtro_layout.addWidget(QLabel("Filtro:"))
         filtro_layout.addWidget(self.input_filtro_nome)
@@ -132,13 +138,21 @@ class DadosBancariosUI(QWidget):
         btn_layout.addWidget(self.btn_excluir)
         btn_layout.addWidget(self.btn_limpar)
 
-        self.tabela = QTableWidget()
-        self.tabela.setColumnCount(9)
-        self.tabela.setHorizontalHeaderLabels([
-            'ID', 'Fornecedor', 'Nº Balança', 'Nome Conta', 'Banco', 'CPF/CNPJ', 'Agência', 'Conta', 'Padrão'
-        ])
-        self.tabela.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela.cellClicked.connect(self.carregar_dado_selecionado)
+        self.modelo = TabelaModel([
+            Coluna('ID', 'id'),
+            Coluna('Fornecedor', 'fornecedor_nome'),
+            Coluna('Nº Balança', 'fornecedores_numerobalanca'),
+            Coluna('Nome Conta', 'nome_conta'),
+            Coluna('Banco', 'banco'),
+            Coluna('CPF/CNPJ', 'CPFouCNPJ'),
+            Coluna('Agência', 'agencia'),
+            Coluna('Conta', 'conta'),
+            Coluna('Padrão', 'padrao', sim_nao),
+        ], parent=self)
+        self.filtro = FiltroProxyModel(self.modelo, self)
+        self.tabela = TabelaView(self.filtro)
+        self._indice = None
+        self.tabela.clicked.connect(self.carregar_dado_selecionado)
 
         layout_principal.addLayout(filtro_layout)
         layout_principal.addLayout(form_layout)
@@ -157,32 +171,37 @@ class DadosBancariosUI(QWidget):
         self.input_num_balanca.textEdited.connect(self.num_balanca_editado)
 
     def carregar_fornecedores(self):
+        self.banco.executar(self.db.listar_fornecedores, ao_concluir=self.preencher_fornecedores,
+                            canal='fornecedores')
+
+    def preencher_fornecedores(self, fornecedores):
+        self.silenciar_sync = True
         self.combo_fornecedor_nome.clear()
-        self.fornecedores = self.db.listar_fornecedores()
+        self.fornecedores = fornecedores
         for f in self.fornecedores:
             self.combo_fornecedor_nome.addItem(f"{f['nome']}", f["id"])
+        self.silenciar_sync = False
 
     def carregar_tabela(self):
-        filtro = self.input_filtro_nome.text().lower()
-        dados = self.db.listar_dados_bancarios()
-        if filtro:
-            dados = [d for d in dados if filtro in d['fornecedor_nome'].lower() or filtro in str(d['fornecedores_numerobalanca'])]
-
-        self.tabela.setRowCount(len(dados))
-        for i, dado in enumerate(dados):
-            self.tabela.setItem(i, 0, QTableWidgetItem(str(dado['id'])))
-            self.tabela.setItem(i, 1, QTableWidgetItem(dado['fornecedor_nome']))
-            self.tabela.setItem(i, 2, QTableWidgetItem(str(dado['fornecedores_numerobalanca'])))
-            self.tabela.setItem(i, 3, QTableWidgetItem(dado.get('nome_conta', '')))  # nome_conta aqui
-            self.tabela.setItem(i, 4, QTableWidgetItem(dado['banco']))
-            self.tabela.setItem(i, 5, QTableWidgetItem(dado['CPFouCNPJ']))
-            self.tabela.setItem(i, 6, QTableWidgetItem(dado['agencia']))
-            self.tabela.setItem(i, 7, QTableWidgetItem(dado['conta']))
-            self.tabela.setItem(i, 8, QTableWidgetItem('Sim' if dado['padrao'] else 'Não'))
+        self.banco.executar(self.db.listar_dados_bancarios, ao_concluir=self.preencher_tabela, canal='tabela')
+
+    def preencher_tabela(self, dados):
+        # Filtrar não volta ao banco: as contas ficam no modelo e o filtro só esconde linhas
+        self.modelo.definir_linhas(dados)
+        self._indice = IndiceTrechos(
+            f"{d['fornecedor_nome'] or ''} {d['fornecedores_numerobalanca'] or ''}" for d in dados
+        )
+        self.filtro.definir_visiveis(None)
+        self.aplicar_filtro()
+
+    def aplicar_filtro(self):
+        self.timer_filtro.stop()
+        if self._indice is not None:
+            self.filtro.definir_visiveis(self._indice.buscar(self.input_filtro_nome.text()))
 
     def limpar_filtro(self):
         self.input_filtro_nome.clear()
-        self.carregar_tabela()
+        self.aplicar_filtro()
 
     def adicionar(self):
         fornecedor_id = self.combo_fornecedor_nome.currentData()
@@ -194,35 +213,28 @@ class DadosBancariosUI(QWidget):
         padrao = 1 if self.input_padrao.currentText() == 'Sim' else 0
 
         if nome_conta and banco and cpf_cnpj and agencia and conta and fornecedor_id is not None:
-            self.db.adicionar_dado_bancario(fornecedor_id, banco, cpf_cnpj, agencia, conta, padrao, nome_conta)
-            self.carregar_tabela()
-            self.limpar()
+            self.banco.gravar(self, self.db.adicionar_dado_bancario,
+                              fornecedor_id, banco, cpf_cnpj, agencia, conta, padrao, nome_conta,
+                              ao_concluir=self.dado_gravado)
         else:
             QMessageBox.warning(self, 'Campos obrigatórios', 'Preencha todos os campos corretamente.')
 
-    def carregar_dado_selecionado(self, row, column):
-        self.dado_selecionado = int(self.tabela.item(row, 0).text())
-        nome_forn = self.tabela.item(row, 1).text()
-        num_balanca = self.tabela.item(row, 2).text()
+    def carregar_dado_selecionado(self, index):
+        dado = self.tabela.linha(index)
+        self.dado_selecionado = dado['id']
 
         # Atualiza combo e campo num balança sem disparar sincronização
         self.silenciar_sync = True
-        # Seleciona combo pelo nome exato
-        for i in range(self.combo_fornecedor_nome.count()):
-            if self.combo_fornecedor_nome.itemText(i) == nome_forn:
-                self.combo_fornecedor_nome.setCurrentIndex(i)
-                break
-        else:
-            self.combo_fornecedor_nome.setCurrentIndex(-1)
+        self.combo_fornecedor_nome.setCurrentIndex(self.combo_fornecedor_nome.findData(dado['fornecedor_id']))
 
-        self.input_num_balanca.setText(num_balanca)
+        self.input_num_balanca.setText(str(dado['fornecedores_numerobalanca'] or ''))
 
-        self.input_nome_conta.setText(self.tabela.item(row, 3).text())
-        self.input_banco.setText(self.tabela.item(row, 4).text())
-        self.input_cpf_cnpj.setText(self.tabela.item(row, 5).text())
-        self.input_agencia.setText(self.tabela.item(row, 6).text())
-        self.input_conta.setText(self.tabela.item(row, 7).text())
-        self.input_padrao.setCurrentText(self.tabela.item(row, 8).text())
+        self.input_nome_conta.setText(dado.get('nome_conta') or '')
+        self.input_banco.setText(dado['banco'] or '')
+        self.input_cpf_cnpj.setText(dado['CPFouCNPJ'] or '')
+        self.input_agencia.setText(dado['agencia'] or '')
+        self.input_conta.setText(dado['conta'] or '')
+        self.input_padrao.setCurrentText(sim_nao(dado['padrao'], None))
         self.silenciar_sync = False
 
     def atualizar(self):
@@ -239,15 +251,18 @@ class DadosBancariosUI(QWidget):
                 QMessageBox.warning(self, 'Erro', 'Fornecedor inválido.')
                 return
 
-            self.db.atualizar_dado_bancario(self.dado_selecionado, fornecedor_id, banco, cpf_cnpj, agencia, conta, padrao, nome_conta)
-            self.carregar_tabela()
-            self.limpar()
+            self.banco.gravar(self, self.db.atualizar_dado_bancario,
+                              self.dado_selecionado, fornecedor_id, banco, cpf_cnpj, agencia, conta, padrao, nome_conta,
+                              ao_concluir=self.dado_gravado)
 
     def excluir(self):
         if self.dado_selecionado:
-            self.db.excluir_dado_bancario(self.dado_selecionado)
-            self.carregar_tabela()
-            self.limpar()
+            self.banco.gravar(self, self.db.excluir_dado_bancario, self.dado_selecionado,
+                              ao_concluir=self.dado_gravado)
+
+    def dado_gravado(self, _=None):
+        self.carregar_tabela()
+        self.limpar()
 
     def limpar(self):
         self.dado_selecionado = None
@@ -1,20 +1,189 @@
+import threading
+import time
 import mysql.connector
 from contextlib import contextmanager
-from ajustes import get_config
+from ajustes import get_config, ao_mudar_config, POOL_SIZE_PADRAO
+import diagnostico_sql
+from tarefas import limitar_ao_pool_conexoes
+
+POOL_TIMEOUT = 10  # segundos esperando uma conexão livre antes de desistir
+INTERVALO_VERIFICACAO = 2  # segundos ociosa antes de testar a conexão com ping
+PARAMETROS_LOCAIS = ('pool_size', 'consulta_lenta_ms', 'custo_bcrypt')  # chaves da config que não vão para o connect()
+
+class PoolConexoes:
+    """Pool limitado de conexões MySQL reaproveitáveis.
+
+    As conexões são abertas sob demanda até `tamanho`; quando todas estão em uso,
+    quem pede espera até `timeout` segundos por uma devolução.
+    """
+
+    def __init__(self, config, tamanho, timeout=POOL_TIMEOUT):
+        self.config = config
+        self.tamanho = max(1, int(tamanho))
+        self.timeout = timeout
+        self._livres = []  # pilha de (conexão, instante da devolução)
+        self._abertas = 0
+        self._fechado = False
+        self._cond = threading.Condition()
+
+    def obter(self):
+        limite = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._fechado:
+                    raise mysql.connector.errors.PoolError("Pool de conexões encerrado.")
+                if self._livres:
+                    conn, devolvida_em = self._livres.pop()
+                    break
+                if self._abertas < self.tamanho:
+                    self._abertas += 1
+                    conn, devolvida_em = None, None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        f"Nenhuma conexão livre no pool após {self.timeout}s."
+                    )
+                self._cond.wait(restante)
+
+        if conn is not None and time.monotonic() - devolvida_em <= INTERVALO_VERIFICACAO:
+            return conn
+        if conn is not None:
+            # Ficou ociosa: confere se o servidor ainda responde antes de entregar
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except mysql.connector.Error:
+                self._fechar_silencioso(conn)
+        try:
+            return mysql.connector.connect(**self.config)
+        except Exception:
+            self._liberar_vaga()
+            raise
+
+    def devolver(self, conn):
+        with self._cond:
+            fechado = self._fechado
+        if fechado:
+            self._fechar_silencioso(conn)
+            self._liberar_vaga()
+            return
+        try:
+            # Desfaz transação pendente e variáveis de sessão do uso anterior
+            conn.reset_session()
+        except Exception:
+            # Erro do conector ou socket meio fechado: a conexão não volta, mas a vaga sim
+            self._fechar_silencioso(conn)
+            self._liberar_vaga()
+            return
+        with self._cond:
+            if self._fechado:
+                self._abertas -= 1
+                self._fechar_silencioso(conn)
+                return
+            self._livres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def fechar(self):
+        with self._cond:
+            self._fechado = True
+            livres, self._livres = self._livres, []
+            self._abertas -= len(livres)
+            self._cond.notify_all()
+        for conn, _ in livres:
+            self._fechar_silencioso(conn)
+
+    def _liberar_vaga(self):
+        with self._cond:
+            self._abertas -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _fechar_silencioso(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+_local = threading.local()  # conexão da transação em andamento nesta thread
+
+def get_pool():
+    """Retorna o pool da configuração ativa, recriando-o se a configuração mudou."""
+    global _pool, _pool_config
+    config = dict(get_config())
+    with _pool_lock:
+        if _pool is None or _pool_config != config:
+            if _pool is not None:
+                _pool.fechar()
+            parametros = {k: v for k, v in config.items() if k not in PARAMETROS_LOCAIS}
+            _pool = PoolConexoes(parametros, config.get('pool_size', POOL_SIZE_PADRAO))
+            _pool_config = config
+            limitar_ao_pool_conexoes(_pool.tamanho)
+            diagnostico_sql.configurar(config.get('consulta_lenta_ms'))
+        return _pool
+
+@ao_mudar_config
+def fechar_pool(_nome=None):
+    """Fecha as conexões livres do pool atual; as que estão em uso fecham ao ser devolvidas.
+
+    Chamado quando a configuração ativa muda: a próxima get_pool() abre o pool do banco novo.
+    """
+    global _pool, _pool_config
+    with _pool_lock:
+        pool, _pool, _pool_config = _pool, None, None
+    if pool is not None:
+        pool.fechar()
 
 @contextmanager
 def get_connection():
-    config = get_config()
-    conn = mysql.connector.connect(**config)
+    pool = get_pool()
+    conn = pool.obter()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.devolver(conn)
+
+@contextmanager
+def transacao():
+    """Unidade de trabalho: todo get_cursor() aberto dentro do bloco, nesta thread, usa a
+    mesma conexão, e o commit acontece uma única vez no final (ou rollback de tudo).
+
+    Blocos aninhados participam da transação de fora. DDL (CREATE TABLE...) faz commit
+    implícito no MySQL, por isso não deve rodar dentro de uma transação.
+    """
+    conn = getattr(_local, 'conexao', None)
+    if conn is not None:
+        yield conn
+        return
+    with get_connection() as conn:
+        _local.conexao = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _local.conexao = None
 
 @contextmanager
 def get_cursor(commit=False):
+    """Cursor de dicionários; cada comando executado nele é medido por diagnostico_sql."""
+    conn = getattr(_local, 'conexao', None)
+    if conn is not None:
+        # Dentro de transacao(): commit e rollback ficam a cargo dela
+        cursor = diagnostico_sql.CursorMedido(conn.cursor(dictionary=True))
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        return
+    inicio = time.perf_counter()
     with get_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
+        cursor = diagnostico_sql.CursorMedido(conn.cursor(dictionary=True), time.perf_counter() - inicio)
         try:
             yield cursor
             if commit:
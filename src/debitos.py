@@ -3,23 +3,70 @@ import os
 import tempfile
 import platform
 import subprocess
+from decimal import Decimal
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QGridLayout,
-    QLineEdit, QComboBox, QDateEdit, QTableWidget, QTableWidgetItem, QMessageBox, QDialog, QFormLayout, QDialogButtonBox
+    QLineEdit, QComboBox, QDateEdit, QMessageBox, QDialog, QFormLayout, QDialogButtonBox
 )
 from PySide6.QtCore import Qt, QDate, QMarginsF, QLocale
 from db_context import get_cursor  # Certifique-se que seu get_cursor usa 'with'
+from saldos_fornecedores import aplicar_lancamento, estornar_lancamentos
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, TabelaView, Coluna, moeda
+from cache_referencia import listar_fornecedores, obter_fornecedor_id_por_numero_balanca
+from eventos import eventos
 from PySide6.QtGui import QPainter, QFont, QImage, QPageLayout
 from PySide6.QtPrintSupport import QPrinter
 
 
+def listar_debitos(fornecedor_id, data_de, data_ate):
+    query = """
+        SELECT d.id, d.fornecedor_id, d.data_lancamento, f.nome as fornecedor_nome, f.fornecedores_numerobalanca, 
+               d.descricao, d.valor, d.tipo,
+               IFNULL(c.id, 'Manual') as origem
+        FROM debitos_fornecedores d
+        LEFT JOIN compras c ON d.compra_id = c.id
+        LEFT JOIN fornecedores f ON d.fornecedor_id = f.id
+        WHERE d.data_lancamento BETWEEN %s AND %s
+    """
+    params = [data_de, data_ate]
+    if fornecedor_id:
+        query += " AND d.fornecedor_id = %s"
+        params.append(fornecedor_id)
+    query += " ORDER BY d.data_lancamento DESC"
+
+    with get_cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def incluir_debito(fornecedor_id, data_lancamento, descricao, valor):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("""
+                       INSERT INTO debitos_fornecedores (fornecedor_id, data_lancamento, descricao, valor, tipo)
+                       VALUES (%s, %s, %s, %s, 'inclusao')
+                       """, (fornecedor_id, data_lancamento, descricao, valor))
+        aplicar_lancamento(cursor, fornecedor_id, 'inclusao', valor)
+
+def excluir_debito(debito_id):
+    with get_cursor(commit=True) as cursor:
+        estornar_lancamentos(cursor, "id = %s", (debito_id,))
+        cursor.execute("DELETE FROM debitos_fornecedores WHERE id = %s", (debito_id,))
+
 class DebitosUI(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Controle de Débitos")
+        self.banco = ExecutorBanco(self)
+        self._filtro_pendente = None
         self.init_ui()
         self.atualizar()
 
+        # Lançamentos gravados em qualquer tela trocam só as linhas do fornecedor atingido
+        ev = eventos()
+        ev.compra_salva.connect(self.ao_mudar_compra)
+        ev.compra_excluida.connect(self.ao_mudar_compra)
+        ev.debitos_alterados.connect(self.recarregar_fornecedor)
+
     def init_ui(self):
         layout_principal = QVBoxLayout()
 
@@ -58,11 +105,16 @@ class DebitosUI(QWidget):
         layout_principal.addLayout(layout_filtros)
 
         # Tabela
-        self.tabela = QTableWidget()
-        self.tabela.setColumnCount(7)
-        self.tabela.setHorizontalHeaderLabels([
-            "Data", "Fornecedor", "Nº Balança", "Descrição", "Valor", "Tipo", "Origem"
-        ])
+        self.modelo = TabelaModel([
+            Coluna("Data", "data_lancamento"),
+            Coluna("Fornecedor", "fornecedor_nome"),
+            Coluna("Nº Balança", "fornecedores_numerobalanca"),
+            Coluna("Descrição", "descricao"),
+            Coluna("Valor", "valor", moeda),
+            Coluna("Tipo", lambda d: "Inclusão" if d["tipo"] == "inclusao" else "Abatimento"),
+            Coluna("Origem", lambda d: str(d["origem"])),
+        ], QLocale(), self)
+        self.tabela = TabelaView(self.modelo)
         layout_principal.addWidget(self.tabela)
 
         self.label_saldo = QLabel("Saldo devedor: R$ 0,00")
@@ -91,65 +143,85 @@ class DebitosUI(QWidget):
         self.carregar_fornecedores()
 
     def carregar_fornecedores(self):
+        self.banco.executar(listar_fornecedores, canal='fornecedores', ao_concluir=self.preencher_fornecedores)
+
+    def preencher_fornecedores(self, fornecedores):
+        selecionado = self.combo_fornecedor.currentData()
+        self.combo_fornecedor.blockSignals(True)
         self.combo_fornecedor.clear()
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome FROM fornecedores")
-            for f in cursor.fetchall():
-                self.combo_fornecedor.addItem(f["nome"], f["id"])
-        self.combo_fornecedor.setCurrentIndex(-1)
+        for f in fornecedores:
+            self.combo_fornecedor.addItem(f["nome"], f["id"])
+        self.combo_fornecedor.setCurrentIndex(self.combo_fornecedor.findData(selecionado) if selecionado else -1)
+        self.combo_fornecedor.blockSignals(False)
+        if self._filtro_pendente is not None:
+            fornecedor_id, self._filtro_pendente = self._filtro_pendente, None
+            self.filtrar_por_fornecedor(fornecedor_id)
 
     def selecionar_fornecedor_por_balanca(self):
         numero = self.input_num_balanca.text().strip()
         if not numero:
             return
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id FROM fornecedores WHERE fornecedores_numerobalanca = %s", (numero,))
-            f = cursor.fetchone()
-            if f:
-                idx = self.combo_fornecedor.findData(f["id"])
+
+        def selecionar(fornecedor_id):
+            if fornecedor_id:
+                idx = self.combo_fornecedor.findData(fornecedor_id)
                 if idx >= 0:
                     self.combo_fornecedor.setCurrentIndex(idx)
             else:
                 QMessageBox.warning(self, "Não encontrado", "Fornecedor não encontrado.")
 
+        self.banco.executar(obter_fornecedor_id_por_numero_balanca, numero, canal='balanca', ao_concluir=selecionar)
+
     def atualizar(self):
         fornecedor_id = self.combo_fornecedor.currentData()
         data_de = self.data_de.date().toPython()
         data_ate = self.data_ate.date().toPython()
 
-        query = """
-            SELECT d.data_lancamento, f.nome as fornecedor_nome, f.fornecedores_numerobalanca, 
-                   d.descricao, d.valor, d.tipo,
-                   IFNULL(c.id, 'Manual') as origem
-            FROM debitos_fornecedores d
-            LEFT JOIN compras c ON d.compra_id = c.id
-            LEFT JOIN fornecedores f ON d.fornecedor_id = f.id
-            WHERE d.data_lancamento BETWEEN %s AND %s
-        """
-        params = [data_de, data_ate]
-        if fornecedor_id:
-            query += " AND d.fornecedor_id = %s"
-            params.append(fornecedor_id)
-        query += " ORDER BY d.data_lancamento DESC"
-
-        with get_cursor() as cursor:
-            cursor.execute(query, params)
-            resultados = cursor.fetchall()
-
-        self.tabela.setRowCount(len(resultados))
-        saldo = 0.0
-        for i, row in enumerate(resultados):
-            self.tabela.setItem(i, 0, QTableWidgetItem(str(row["data_lancamento"])))
-            self.tabela.setItem(i, 1, QTableWidgetItem(str(row.get("fornecedor_nome") or "")))
-            self.tabela.setItem(i, 2, QTableWidgetItem(str(row.get("fornecedores_numerobalanca") or "")))
-            self.tabela.setItem(i, 3, QTableWidgetItem(row["descricao"]))
-            self.tabela.setItem(i, 4, QTableWidgetItem(f"R$ {row['valor']:.2f}"))
-            self.tabela.setItem(i, 5, QTableWidgetItem("Inclusão" if row["tipo"] == "inclusao" else "Abatimento"))
-            self.tabela.setItem(i, 6, QTableWidgetItem(str(row["origem"])))
-            saldo += float(row["valor"]) if row["tipo"] == "inclusao" else -float(row["valor"])
-        self.label_saldo.setText(f"Saldo devedor: R$ {saldo:.2f}")
+        self.banco.executar(
+            listar_debitos, fornecedor_id, data_de, data_ate, canal='debitos', ao_concluir=self.preencher_tabela
+        )
+
+    def preencher_tabela(self, resultados):
+        self.modelo.definir_linhas(resultados)
+        self.atualizar_saldo()
+
+    def atualizar_saldo(self):
+        saldo = sum(
+            (row["valor"] if row["tipo"] == "inclusao" else -row["valor"] for row in self.modelo.linhas()),
+            Decimal("0.00")
+        )
+        self.label_saldo.setText(f"Saldo devedor: {moeda(saldo, self.modelo.locale)}")
+
+    def ao_mudar_compra(self, _compra_id, fornecedor_id):
+        self.recarregar_fornecedor(fornecedor_id)
+
+    def recarregar_fornecedor(self, fornecedor_id):
+        """Busca de novo só os lançamentos de um fornecedor, se ele aparece com o filtro atual."""
+        filtro = self.combo_fornecedor.currentData()
+        if filtro and filtro != fornecedor_id:
+            return
+        if self.banco.pendente('debitos'):
+            self.atualizar()  # uma carga completa já está a caminho; refaz com os dados novos
+            return
+        data_de = self.data_de.date().toPython()
+        data_ate = self.data_ate.date().toPython()
+
+        def aplicar(lancamentos):
+            self.modelo.substituir_linhas(
+                lambda d: d['fornecedor_id'] == fornecedor_id, lancamentos,
+                lambda d: d['data_lancamento'], decrescente=True
+            )
+            self.atualizar_saldo()
+
+        self.banco.executar(
+            listar_debitos, fornecedor_id, data_de, data_ate, canal=('debitos', fornecedor_id), ao_concluir=aplicar
+        )
 
     def filtrar_por_fornecedor(self, fornecedor_id):
+        if self.banco.pendente('fornecedores'):
+            # A lista ainda está chegando; o filtro é aplicado quando ela chegar
+            self._filtro_pendente = fornecedor_id
+            return
         idx = self.combo_fornecedor.findData(fornecedor_id)
         if idx >= 0:
             self.combo_fornecedor.setCurrentIndex(idx)
@@ -166,6 +238,11 @@ class DebitosUI(QWidget):
         self.atualizar()  # atualiza a tabela com filtros limpos
 
     def incluir_debito_manual(self):
+        # A lista de fornecedores vem em segundo plano; o diálogo abre quando ela chegar
+        self.banco.executar(listar_fornecedores, canal='fornecedores_dialogo',
+                            ao_concluir=self.abrir_debito_manual)
+
+    def abrir_debito_manual(self, fornecedores):
         dialog = QDialog(self)
         dialog.setWindowTitle("Novo Débito Manual")
         form = QFormLayout(dialog)
@@ -176,10 +253,6 @@ class DebitosUI(QWidget):
 
         # Campo para selecionar o cliente
         input_cliente = QComboBox()
-        fornecedores = []
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome, fornecedores_numerobalanca FROM fornecedores ORDER BY nome")
-            fornecedores = cursor.fetchall()
         for f in fornecedores:
             nome_display = f"{f['nome']} (Bal: {f['fornecedores_numerobalanca']})" if f['fornecedores_numerobalanca'] else f['nome']
             input_cliente.addItem(nome_display, f["id"])
@@ -243,19 +316,15 @@ class DebitosUI(QWidget):
                 QMessageBox.warning(self, "Erro", "Valor inválido.")
                 return
 
-            with get_cursor(commit=True) as cursor:
-                cursor.execute("""
-                               INSERT INTO debitos_fornecedores (fornecedor_id, data_lancamento, descricao, valor, tipo)
-                               VALUES (%s, %s, %s, %s, 'inclusao')
-                               """, (fornecedor_id, data_lancamento, descricao, valor))
-            self.atualizar()
+            self.banco.gravar(self, incluir_debito, fornecedor_id, data_lancamento, descricao, valor,
+                              ao_concluir=lambda _: eventos().debitos_alterados.emit(fornecedor_id))
 
     def excluir(self):
-        linha = self.tabela.currentRow()
-        if linha < 0:
+        debito = self.tabela.linha_atual()
+        if debito is None:
             return
-        data = self.tabela.item(linha, 0).text()
-        descricao = self.tabela.item(linha, 3).text()
+        data = debito["data_lancamento"]
+        descricao = debito["descricao"]
         confirm = QMessageBox.question(
             self, "Confirmação",
             f"Deseja excluir o débito de {data}\nDescrição: {descricao}?",
@@ -264,19 +333,8 @@ class DebitosUI(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        with get_cursor() as cursor:
-            cursor.execute("""
-                SELECT id FROM debitos_fornecedores
-                WHERE data_lancamento = %s AND descricao = %s LIMIT 1
-            """, (data, descricao))
-            debito = cursor.fetchone()
-            if not debito:
-                QMessageBox.warning(self, "Erro", "Débito não encontrado.")
-                return
-
-        with get_cursor(commit=True) as cursor:
-            cursor.execute("DELETE FROM debitos_fornecedores WHERE id = %s", (debito["id"],))
-        self.atualizar()
+        self.banco.gravar(self, excluir_debito, debito["id"],
+                          ao_concluir=lambda _: eventos().debitos_alterados.emit(debito["fornecedor_id"]))
 
     def exportar_pdf(self):
         path_temp = tempfile.mktemp(suffix=".pdf")
@@ -296,7 +354,7 @@ class DebitosUI(QWidget):
 
     def exportar_jpg(self):
         # Calcula altura com base no número de linhas + cabeçalho + totais
-        linhas = self.tabela.rowCount()
+        linhas = self.modelo.rowCount()
         altura = 100 + (linhas + 5) * 30  # margem + cada linha + espaço para totais
 
         largura = 1200
@@ -359,23 +417,17 @@ class DebitosUI(QWidget):
         total_inclusoes = 0.0
         total_abatimentos = 0.0
 
-        for row in range(self.tabela.rowCount()):
-            # Só pega as colunas desejadas (0, 3, 4, 5, 6)
-            colunas_tabela = [0, 3, 4, 5, 6]
-            tipo = self.tabela.item(row, 5).text().strip().lower()
-            valor_str = self.tabela.item(row, 4).text().replace("R$", "").replace(",", ".").strip()
-            try:
-                valor = float(valor_str)
-            except ValueError:
-                valor = 0.0
-
-            if "inclus" in tipo:
+        # Só pega as colunas desejadas (0, 3, 4, 5, 6)
+        colunas_tabela = [0, 3, 4, 5, 6]
+        for row, debito in enumerate(self.modelo.linhas()):
+            valor = float(debito["valor"] or 0)
+            if debito["tipo"] == "inclusao":
                 total_inclusoes += valor
-            elif "abat" in tipo:
+            else:
                 total_abatimentos += valor
 
             for i, col in enumerate(colunas_tabela):
-                texto = self.tabela.item(row, col).text()
+                texto = self.modelo.index(row, col).data()
                 painter.drawRect(x_offsets[i], y, col_widths[i], row_height)
                 painter.drawText(x_offsets[i] + 5, y + 17, texto)
             y += row_height
@@ -0,0 +1,241 @@
+"""Tempo de cada comando SQL executado pelo programa.
+
+get_cursor() entrega um CursorMedido, que registra para cada comando a impressão digital
+do SQL (literais e listas IN trocados por ?), quantos parâmetros, quantas linhas voltaram,
+quanto tempo levou, quanto se esperou por uma conexão e quem chamou. Os últimos registros
+ficam em memória e os totais por impressão digital servem para achar o que pesa mais:
+muitas chamadas rápidas (N+1) ou poucas chamadas lentas.
+
+Com `consulta_lenta_ms` na configuração ativa, os comandos acima do limite vão também para
+um log rotativo, que pode ser resumido pela linha de comando:
+
+    python diagnostico_sql.py [arquivo]
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from logging.handlers import RotatingFileHandler
+
+TAMANHO_BUFFER = 2000  # últimos comandos guardados em memória
+ARQUIVO_LOG = 'consultas_lentas.log'
+TAMANHO_LOG = 5 * 1024 * 1024
+COPIAS_LOG = 3
+
+# Módulos que ficam entre a tela e o cursor; o chamador registrado é o primeiro fora deles
+_MODULOS_INTERNOS = {__name__, 'db_context', 'contextlib'}
+
+_lock = threading.Lock()
+_recentes = deque(maxlen=TAMANHO_BUFFER)
+_totais = {}  # impressão digital -> Totais
+_limite_lento = None  # ms; None desliga o log
+_log = None
+
+class Totais:
+    __slots__ = ('sql', 'execucoes', 'tempo', 'tempo_max', 'linhas', 'espera', 'chamadores')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.execucoes = 0
+        self.tempo = 0.0
+        self.tempo_max = 0.0
+        self.linhas = 0
+        self.espera = 0.0
+        self.chamadores = Counter()
+
+_RE_TEXTO = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_MARCADOR = re.compile(r"%s|%\(\w+\)s")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+def impressao_digital(sql):
+    """SQL normalizado: mesmo texto para comandos que só diferem nos valores."""
+    sql = _RE_ESPACOS.sub(" ", sql).strip()
+    sql = _RE_TEXTO.sub("?", sql)
+    sql = _RE_MARCADOR.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    return _RE_LISTA.sub("(...)", sql)
+
+def chamador():
+    """'modulo.funcao:linha' do primeiro quadro da pilha fora do acesso ao banco."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        modulo = frame.f_globals.get('__name__', '')
+        if modulo not in _MODULOS_INTERNOS:
+            return f"{modulo}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+def configurar(limite_ms=None, arquivo=ARQUIVO_LOG):
+    """Liga o log de comandos lentos acima de `limite_ms` (None desliga)."""
+    global _limite_lento, _log
+    with _lock:
+        _limite_lento = limite_ms
+        if limite_ms is None or _log is not None:
+            return
+        _log = logging.getLogger('consultas_lentas')
+        _log.propagate = False
+        _log.setLevel(logging.INFO)
+        handler = RotatingFileHandler(arquivo, maxBytes=TAMANHO_LOG, backupCount=COPIAS_LOG, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _log.addHandler(handler)
+
+def registrar(sql, parametros, linhas, tempo, espera, origem):
+    digital = impressao_digital(sql)
+    registro = {
+        'quando': time.time(),
+        'sql': digital,
+        'parametros': parametros,
+        'linhas': linhas,
+        'ms': round(tempo * 1000, 2),
+        'espera_ms': round(espera * 1000, 2),
+        'chamador': origem,
+    }
+    with _lock:
+        _recentes.append(registro)
+        totais = _totais.get(digital)
+        if totais is None:
+            totais = _totais[digital] = Totais(digital)
+        totais.execucoes += 1
+        totais.tempo += tempo
+        totais.tempo_max = max(totais.tempo_max, tempo)
+        totais.linhas += linhas
+        totais.espera += espera
+        totais.chamadores[origem] += 1
+        lento = _log is not None and _limite_lento is not None and registro['ms'] >= _limite_lento
+    if lento:
+        _log.info(json.dumps(registro, ensure_ascii=False))
+
+def recentes():
+    with _lock:
+        return list(_recentes)
+
+def mais_pesados(limite=20):
+    """Comandos com maior tempo total desde que o programa abriu."""
+    with _lock:
+        totais = sorted(_totais.values(), key=lambda t: t.tempo, reverse=True)[:limite]
+        return [_resumo(t) for t in totais]
+
+def limpar():
+    with _lock:
+        _recentes.clear()
+        _totais.clear()
+
+def _resumo(t):
+    return {
+        'sql': t.sql,
+        'execucoes': t.execucoes,
+        'total_ms': round(t.tempo * 1000, 1),
+        'media_ms': round(t.tempo * 1000 / t.execucoes, 2),
+        'max_ms': round(t.tempo_max * 1000, 1),
+        'linhas': t.linhas,
+        'espera_ms': round(t.espera * 1000, 1),
+        'chamadores': t.chamadores.most_common(3),
+    }
+
+def formatar(resumos):
+    linhas = []
+    for r in resumos:
+        linhas.append(
+            f"{r['total_ms']:>10.1f} ms  {r['execucoes']:>6}x  média {r['media_ms']:.2f} ms  "
+            f"máx {r['max_ms']:.1f} ms  {r['linhas']} linhas  espera {r['espera_ms']:.1f} ms"
+        )
+        linhas.append(f"    {r['sql'][:300]}")
+        for origem, vezes in r['chamadores']:
+            linhas.append(f"    ← {origem} ({vezes}x)")
+    return "\n".join(linhas)
+
+class CursorMedido:
+    """Repassa tudo ao cursor do conector, medindo execute/executemany e as leituras."""
+
+    def __init__(self, cursor, espera=0.0):
+        self._cursor = cursor
+        self._espera = espera  # só o primeiro comando carrega a espera pela conexão
+        self._pendente = None   # [sql, parametros, linhas, tempo, espera, chamador]
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        self._fechar_pendente()
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params, *args, **kwargs)
+        finally:
+            self._abrir_pendente(sql, len(params) if params else 0, time.perf_counter() - inicio)
+
+    def executemany(self, sql, seq_params, *args, **kwargs):
+        self._fechar_pendente()
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params, *args, **kwargs)
+        finally:
+            self._abrir_pendente(sql, sum(len(p) for p in seq_params), time.perf_counter() - inicio)
+
+    def fetchone(self):
+        return self._ler(self._cursor.fetchone, lambda r: 0 if r is None else 1)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._ler(lambda: self._cursor.fetchmany(*args, **kwargs), len)
+
+    def fetchall(self):
+        return self._ler(self._cursor.fetchall, len)
+
+    def close(self):
+        self._fechar_pendente()
+        return self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def _ler(self, ler, contar):
+        inicio = time.perf_counter()
+        resultado = ler()
+        if self._pendente is not None:
+            self._pendente[2] += contar(resultado)
+            self._pendente[3] += time.perf_counter() - inicio
+        return resultado
+
+    def _abrir_pendente(self, sql, parametros, tempo):
+        self._pendente = [sql, parametros, 0, tempo, self._espera, chamador()]
+        self._espera = 0.0
+
+    def _fechar_pendente(self):
+        if self._pendente is not None:
+            registrar(*self._pendente)
+            self._pendente = None
+
+def resumir_log(caminho=ARQUIVO_LOG, limite=20):
+    """Totais por impressão digital a partir do log de comandos lentos (e das cópias rotacionadas)."""
+    totais = {}
+    arquivos = [caminho] + [f"{caminho}.{i}" for i in range(1, COPIAS_LOG + 1)]
+    for arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    r = json.loads(linha)
+                except ValueError:
+                    continue
+                t = totais.get(r['sql'])
+                if t is None:
+                    t = totais[r['sql']] = Totais(r['sql'])
+                tempo = r['ms'] / 1000
+                t.execucoes += 1
+                t.tempo += tempo
+                t.tempo_max = max(t.tempo_max, tempo)
+                t.linhas += r.get('linhas', 0)
+                t.espera += r.get('espera_ms', 0) / 1000
+                t.chamadores[r.get('chamador', '?')] += 1
+    return [_resumo(t) for t in sorted(totais.values(), key=lambda t: t.tempo, reverse=True)[:limite]]
+
+if __name__ == '__main__':
+    caminho = sys.argv[1] if len(sys.argv) > 1 else ARQUIVO_LOG
+    resumos = resumir_log(caminho)
+    print(formatar(resumos) if resumos else f"Nenhum comando registrado em {caminho}.")
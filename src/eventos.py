@@ -0,0 +1,29 @@
+"""Avisos entre telas sobre o que mudou no banco.
+
+Quem grava emite o evento depois do commit; cada tela aberta atualiza só as linhas e
+saldos atingidos, em vez de recarregar tudo. Telas ainda não criadas não precisam
+ouvir: carregam os dados atuais quando forem abertas.
+
+    eventos().compra_salva.connect(self.ao_salvar_compra)
+    eventos().compra_salva.emit(compra_id, fornecedor_id)
+
+Emitir e ouvir sempre na thread da interface. Conecte métodos de QObject (não lambdas):
+assim a conexão some sozinha quando a tela é destruída.
+"""
+from PySide6.QtCore import QObject, Signal
+
+class Eventos(QObject):
+    compra_salva = Signal(int, int)             # compra_id, fornecedor_id (nova ou editada)
+    compra_excluida = Signal(int, int)          # compra_id, fornecedor_id
+    status_compra_alterado = Signal(int, str)   # compra_id, novo status
+    debitos_alterados = Signal(int)             # fornecedor_id com lançamento incluído ou excluído
+    produto_alterado = Signal(int)              # produto_id incluído, editado ou excluído
+    banco_atualizado = Signal()                 # migrações aplicadas no banco ativo
+
+_eventos = None
+
+def eventos():
+    global _eventos
+    if _eventos is None:
+        _eventos = Eventos()
+    return _eventos
@@ -0,0 +1,173 @@
+from datetime import datetime
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+LARGURA, ALTURA = A4
+MARGEM = 20 * mm
+ESPACAMENTO_BLOCOS = 10 * mm
+ALTURA_RODAPE = 12
+
+class ExtratoPDF:
+    """Extrato de movimentações em páginas A4, desenhado bloco a bloco.
+
+    Cada página repete o cabeçalho com o saldo transportado da página anterior;
+    blocos que não cabem no resto da página continuam na seguinte. Nada fica guardado
+    depois de desenhado, então as movimentações podem vir de um iterador.
+    """
+
+    def __init__(self, filename, fornecedor, numero_balanca, data_de, data_ate, saldo_inicial,
+                 marca_dagua=None):
+        self.c = canvas.Canvas(filename, pagesize=A4)
+        self.fornecedor = fornecedor
+        self.numero_balanca = numero_balanca
+        self.periodo = f"{data_de.strftime('%d/%m/%Y')} a {data_ate.strftime('%d/%m/%Y')}"
+        self.saldo = saldo_inicial
+        # marca_dagua(c, x_inicio, x_fim, y_topo, altura) desenha o fundo de cada página
+        self.marca_dagua = marca_dagua
+        self.gerado_em = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+        self.pagina = 0
+        self.y = None
+
+    # ---- Páginas ----
+
+    def _nova_pagina(self):
+        if self.pagina:
+            self.c.showPage()
+        self.pagina += 1
+        c = self.c
+        if self.marca_dagua:
+            self.marca_dagua(c, MARGEM, LARGURA - MARGEM, ALTURA - MARGEM, ALTURA - 2 * MARGEM)
+
+        y = ALTURA - MARGEM
+        c.setFillColorRGB(0, 0, 0)
+        c.setFont("Helvetica-Bold", 13)
+        c.drawString(MARGEM, y, f"Extrato de movimentações - {self.fornecedor}")
+        c.setFont("Helvetica", 9)
+        c.drawRightString(LARGURA - MARGEM, y, f"Página {self.pagina}")
+        y -= 14
+        c.setFont("Helvetica", 10)
+        c.drawString(MARGEM, y, f"Nº Balança: {self.numero_balanca}    Período: {self.periodo}")
+        y -= 13
+        rotulo = "Saldo anterior ao período" if self.pagina == 1 else "Saldo transportado"
+        self._texto_saldo(MARGEM, y, f"{rotulo}: R$ {float(self.saldo):,.2f}", self.saldo)
+        y -= 8
+        c.line(MARGEM, y, LARGURA - MARGEM, y)
+
+        c.setFont("Helvetica-Oblique", 8)
+        c.drawString(MARGEM, MARGEM - ALTURA_RODAPE, f"Gerado em: {self.gerado_em}")
+        self.y = y - 18
+
+    def _garantir_espaco(self, altura):
+        """Quebra a página se `altura` não cabe no que resta. Retorna True se quebrou."""
+        if self.y is None or self.y - altura < MARGEM:
+            self._nova_pagina()
+            return True
+        return False
+
+    def _texto_saldo(self, x, y, texto, saldo):
+        c = self.c
+        c.setFont("Helvetica-Bold", 10)
+        if saldo < 0:
+            c.setFillColorRGB(1, 0, 0)  # vermelho
+        else:
+            c.setFillColorRGB(0, 0.39, 0)  # verde escuro (aprox. #006400)
+        c.drawString(x, y, texto)
+        c.setFillColorRGB(0, 0, 0)
+
+    # ---- Blocos ----
+
+    def _cabecalho_produtos(self, continuacao=False):
+        c = self.c
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(MARGEM, self.y, "Produtos (continuação)" if continuacao else "Produtos")
+        self.y -= 12
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(MARGEM, self.y, "Produto")
+        c.drawString(MARGEM + 180, self.y, "Qtd")
+        c.drawString(MARGEM + 240, self.y, "Unitário")
+        c.drawString(MARGEM + 330, self.y, "Total")
+        self.y -= 8
+        c.line(MARGEM, self.y, LARGURA - MARGEM, self.y)
+        self.y -= 8
+        c.setFont("Helvetica", 10)
+
+    def adicionar(self, mov, itens):
+        """Desenha uma movimentação; `mov['saldo']` é o saldo acumulado após ela."""
+        c = self.c
+        tipo = mov['tipo'].capitalize()
+        direcao = (mov.get('direcao') or "").capitalize()
+        descricao = mov['descricao'] or ""
+        valor_operacao = float(mov['valor_operacao'] or 0)
+
+        linhas = [f"Data: {mov['data'].strftime('%d/%m/%Y')}"]
+        if direcao:
+            linhas.append(f"Direção: {direcao}")
+        if descricao:
+            linhas.append(f"Descrição: {descricao}")
+
+        # Cabeçalho do bloco e a primeira linha de produtos ficam sempre juntos
+        self._garantir_espaco(16 + 13 * len(linhas) + (36 if itens else 26))
+        c.setFont("Helvetica-Bold", 13)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawString(MARGEM, self.y, f"Movimentação ID: {mov['id']} | Tipo: {tipo}")
+        self.y -= 16
+        c.setFont("Helvetica", 11)
+        for linha in linhas:
+            c.drawString(MARGEM, self.y, linha)
+            self.y -= 13
+
+        if itens:
+            self.y -= 8
+            self._cabecalho_produtos()
+            total = 0
+            for item in itens:
+                if self._garantir_espaco(13):
+                    self._cabecalho_produtos(continuacao=True)
+                c.drawString(MARGEM, self.y, item['produto_nome'])
+                c.drawString(MARGEM + 180, self.y, str(item['quantidade']))
+                c.drawString(MARGEM + 240, self.y, f"R$ {item['preco_unitario']:.2f}")
+                c.drawString(MARGEM + 330, self.y, f"R$ {item['total']:.2f}")
+                total += float(item['total'])
+                self.y -= 13
+            self._garantir_espaco(44)
+            self.y -= 8
+            c.line(MARGEM, self.y, LARGURA - MARGEM, self.y)
+            self.y -= 10
+            c.setFont("Helvetica-Bold", 11)
+            c.drawString(MARGEM, self.y, f"Subtotal: R$ {total:.2f}")
+            self.y -= 12
+            c.drawString(MARGEM, self.y, f"Total Final (com abatimento): R$ {valor_operacao:.2f}")
+            self.y -= 13
+        else:
+            self.y -= 13
+            c.setFont("Helvetica-Bold", 11)
+            c.drawString(MARGEM, self.y, f"Valor da Operação: R$ {valor_operacao:.2f}")
+            self.y -= 13
+
+        saldo_atual = mov['saldo']
+        self._garantir_espaco(14)
+        self._texto_saldo(
+            MARGEM, self.y, f"SALDO TOTAL APÓS ESTA MOVIMENTAÇÃO: R$ {float(saldo_atual):,.2f}", saldo_atual
+        )
+        self.y -= 14 + ESPACAMENTO_BLOCOS
+        # Só agora o saldo passa a valer para o cabeçalho das próximas páginas
+        self.saldo = saldo_atual
+
+    def adicionar_lotes(self, lotes, buscar_itens):
+        """Desenha as movimentações de `lotes` (iterável de listas) à medida que chegam.
+
+        buscar_itens(lote) devolve {id da movimentação: itens}. Retorna quantas foram desenhadas.
+        """
+        quantidade = 0
+        for lote in lotes:
+            itens_por_mov = buscar_itens(lote)
+            for mov in lote:
+                self.adicionar(mov, itens_por_mov.get(mov['id'], []))
+            quantidade += len(lote)
+        return quantidade
+
+    def salvar(self):
+        if self.pagina == 0:
+            self._nova_pagina()
+        self.c.save()
@@ -0,0 +1,120 @@
+import unicodedata
+from bisect import bisect_left
+from PySide6.QtCore import QSortFilterProxyModel, QTimer
+
+# Filtro das listagens enquanto o usuário digita: os textos de cada linha são dobrados
+# (minúsculas, sem acento) e indexados uma vez quando as linhas chegam; cada tecla só
+# consulta o índice e diz ao proxy quais linhas do modelo ficam visíveis.
+
+ATRASO_FILTRO_MS = 150  # espera a digitação parar antes de filtrar
+TAMANHO_TRECHO = 3
+
+def dobrar(texto):
+    """Minúsculas e sem acentos: 'São João' -> 'sao joao'."""
+    if texto is None:
+        return ""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', str(texto)) if not unicodedata.combining(c)
+    ).lower()
+
+class IndiceTrechos:
+    """Busca por trecho (em qualquer posição) nos textos dobrados das linhas.
+
+    Guarda, para cada trecho de até TAMANHO_TRECHO letras, as linhas que o contêm:
+    buscas curtas saem direto do índice e as longas cruzam os trechos antes de
+    conferir o texto. Uma busca que contém a anterior (mais uma letra digitada)
+    só refiltra o resultado dela.
+    """
+
+    def __init__(self, textos):
+        self._textos = [dobrar(t) for t in textos]
+        self._trechos = {}
+        for row, texto in enumerate(self._textos):
+            for n in range(1, TAMANHO_TRECHO + 1):
+                for i in range(len(texto) - n + 1):
+                    self._trechos.setdefault(texto[i:i + n], set()).add(row)
+        self._ultima = None
+        self._ultimo_resultado = None
+
+    def buscar(self, consulta):
+        """Linhas (índices) cujo texto contém `consulta`; None quando a consulta é vazia."""
+        consulta = dobrar(consulta).strip()
+        if not consulta:
+            return None
+        if self._ultima and self._ultima in consulta:
+            candidatas = self._ultimo_resultado
+        elif len(consulta) <= TAMANHO_TRECHO:
+            candidatas = self._trechos.get(consulta, set())
+        else:
+            conjuntos = sorted(
+                (self._trechos.get(consulta[i:i + TAMANHO_TRECHO], set())
+                 for i in range(len(consulta) - TAMANHO_TRECHO + 1)),
+                key=len
+            )
+            candidatas = conjuntos[0].intersection(*conjuntos[1:])
+        if len(consulta) <= TAMANHO_TRECHO and candidatas is not self._ultimo_resultado:
+            resultado = set(candidatas)
+        else:
+            resultado = {row for row in candidatas if consulta in self._textos[row]}
+        self._ultima, self._ultimo_resultado = consulta, resultado
+        return resultado
+
+class IndicePrefixos:
+    """Busca pelo começo do texto (números de balança), por busca binária numa lista ordenada."""
+
+    def __init__(self, textos):
+        self._ordenados = sorted((dobrar(t), row) for row, t in enumerate(textos))
+        self._chaves = [texto for texto, _ in self._ordenados]
+
+    def buscar(self, prefixo):
+        prefixo = dobrar(prefixo).strip()
+        if not prefixo:
+            return None
+        inicio = bisect_left(self._chaves, prefixo)
+        resultado = set()
+        for texto, row in self._ordenados[inicio:]:
+            if not texto.startswith(prefixo):
+                break
+            resultado.add(row)
+        return resultado
+
+def combinar(*resultados):
+    """Interseção dos resultados de várias buscas; None (sem filtro) é neutro."""
+    ativos = [r for r in resultados if r is not None]
+    if not ativos:
+        return None
+    return set.intersection(*sorted(ativos, key=len))
+
+class FiltroProxyModel(QSortFilterProxyModel):
+    """Mostra só as linhas do modelo de origem escolhidas por definir_visiveis."""
+
+    def __init__(self, modelo, parent=None):
+        super().__init__(parent)
+        self._visiveis = None
+        self._mostrar = None  # bytearray com 1 nas linhas visíveis: filterAcceptsRow roda uma vez por linha
+        self.setSourceModel(modelo)
+
+    def definir_visiveis(self, rows):
+        """`rows`: conjunto de linhas do modelo de origem, ou None para mostrar todas."""
+        if rows == self._visiveis:
+            return
+        self._visiveis = rows
+        if rows is None:
+            self._mostrar = None
+        else:
+            self._mostrar = bytearray(self.sourceModel().rowCount())
+            for row in rows:
+                self._mostrar[row] = 1
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        mostrar = self._mostrar
+        return mostrar is None or source_row >= len(mostrar) or bool(mostrar[source_row])
+
+def temporizador_filtro(parent, funcao, atraso=ATRASO_FILTRO_MS):
+    """QTimer de disparo único: chame start() a cada tecla e `funcao` roda quando a digitação parar."""
+    timer = QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(atraso)
+    timer.timeout.connect(funcao)
+    return timer
@@ -9,15 +9,13 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QLocale
 from PySide6.QtGui import QIntValidator
 from db_context import get_cursor
+from tabela_model import TabelaModel, TabelaView, Coluna
+from filtro_tabela import IndiceTrechos, IndicePrefixos, FiltroProxyModel, combinar, temporizador_filtro
 from PySide6.QtGui import QPixmap
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import Table, TableStyle, Paragraph
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance
+from tarefas import ExecutorBanco
+import cache_referencia
+from cache_referencia import FORNECEDORES, CATEGORIAS, PRECOS
 import os
 import tempfile
 import subprocess
@@ -34,17 +32,19 @@ def abrir_arquivo(caminho):
 
 class DB:
     def listar_fornecedores(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT * FROM fornecedores ORDER BY nome")
-            return cursor.fetchall()
+        return cache_referencia.listar_fornecedores()
 
     def listar_categorias_do_fornecedor(self, fornecedor_id):
-        with get_cursor() as cursor:
-            cursor.execute("""
-                SELECT id, nome FROM categorias_fornecedor_por_fornecedor 
-                WHERE fornecedor_id = %s ORDER BY nome
-            """, (fornecedor_id,))
-            return cursor.fetchall()
+        return cache_referencia.obter_categorias_do_fornecedor(fornecedor_id)
+
+    def listar_categorias_ou_padrao(self, fornecedor_id):
+        categorias = self.listar_categorias_do_fornecedor(fornecedor_id)
+        # Se não houver categorias próprias, tenta pegar a categoria "Padrão"
+        if not categorias:
+            cat_padrao = cache_referencia.obter_categoria_padrao()
+            if cat_padrao:
+                categorias = [cat_padrao]
+        return categorias
 
     def adicionar_fornecedor(self, nome, endereco, numero_balanca):
         with get_cursor(commit=True) as cursor:
@@ -52,10 +52,12 @@ class DB:
                 "INSERT INTO fornecedores (nome, fornecedores_endereco, fornecedores_numerobalanca) VALUES (%s, %s, %s)",
                 (nome, endereco, numero_balanca)
             )
+        cache_referencia.invalidar(FORNECEDORES)
 
     def excluir_fornecedor(self, fornecedor_id):
         with get_cursor(commit=True) as cursor:
             cursor.execute("DELETE FROM fornecedores WHERE id = %s", (fornecedor_id,))
+        cache_referencia.invalidar(FORNECEDORES, CATEGORIAS, PRECOS)
 
     def atualizar_fornecedor(self, fornecedor_id, nome, endereco, numero_balanca):
         with get_cursor(commit=True) as cursor:
@@ -63,21 +65,23 @@ class DB:
                 "UPDATE fornecedores SET nome=%s, fornecedores_endereco=%s, fornecedores_numerobalanca=%s WHERE id=%s",
                 (nome, endereco, numero_balanca, fornecedor_id)
             )
+        cache_referencia.invalidar(FORNECEDORES)
+
+    def excluir_categoria(self, categoria_id):
+        with get_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM categorias_fornecedor_por_fornecedor WHERE id = %s", (categoria_id,))
+            cursor.execute("DELETE FROM ajustes_fixos_produto_fornecedor_categoria WHERE categoria_id = %s",
+                           (categoria_id,))
+        cache_referencia.invalidar(CATEGORIAS, PRECOS)
+
+    def renomear_categoria(self, categoria_id, nome):
+        with get_cursor(commit=True) as cursor:
+            cursor.execute("UPDATE categorias_fornecedor_por_fornecedor SET nome = %s WHERE id = %s",
+                           (nome, categoria_id))
+        cache_referencia.invalidar(CATEGORIAS)
 
     def listar_precos_por_categoria(self, categoria_id):
-        with get_cursor() as cursor:
-            cursor.execute("""
-                           SELECT p.id,
-                                  p.nome,
-                                  p.preco_base,
-                                  COALESCE(aj.ajuste_fixo, 0)                  AS ajuste_fixo,
-                                  (p.preco_base + COALESCE(aj.ajuste_fixo, 0)) AS preco_final
-                           FROM produtos p
-                                    LEFT JOIN ajustes_fixos_produto_fornecedor_categoria aj
-                                              ON p.id = aj.produto_id AND aj.categoria_id = %s
-                           ORDER BY p.nome
-                           """, (categoria_id,))
-            return cursor.fetchall()
+        return cache_referencia.listar_precos_por_categoria(categoria_id)
 
     def adicionar_categoria_para_fornecedor(self, fornecedor_id, nome_categoria):
         with get_cursor(commit=True) as cursor:
@@ -86,23 +90,28 @@ class DB:
                 (fornecedor_id, nome_categoria)
             )
             cursor.execute("SELECT LAST_INSERT_ID() as cid")
-            return cursor.fetchone()['cid']
+            categoria_id = cursor.fetchone()['cid']
+        cache_referencia.invalidar(CATEGORIAS)
+        return categoria_id
 
     def listar_produtos(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome FROM produtos ORDER BY nome")
-            return cursor.fetchall()
+        return cache_referencia.listar_produtos()
+
+    def criar_categoria(self, fornecedor_id, nome_categoria, ajustes: dict):
+        categoria_id = self.adicionar_categoria_para_fornecedor(fornecedor_id, nome_categoria)
+        self.inserir_ajustes_categoria(categoria_id, ajustes)
+        return categoria_id
 
     def inserir_ajustes_categoria(self, categoria_id, ajustes: dict):
         # ajustes: {produto_id: ajuste_fixo}
         if not ajustes:
             return
         with get_cursor(commit=True) as cursor:
-            for produto_id, ajuste in ajustes.items():
-                cursor.execute(
-                    "INSERT INTO ajustes_fixos_produto_fornecedor_categoria (produto_id, categoria_id, ajuste_fixo) VALUES (%s, %s, %s)",
-                    (produto_id, categoria_id, ajuste)
-                )
+            cursor.executemany(
+                "INSERT INTO ajustes_fixos_produto_fornecedor_categoria (produto_id, categoria_id, ajuste_fixo) VALUES (%s, %s, %s)",
+                [(produto_id, categoria_id, ajuste) for produto_id, ajuste in ajustes.items()]
+            )
+        cache_referencia.invalidar(PRECOS)
 
     def atualizar_ajuste_fixo(self, produto_id, categoria_id, ajuste_fixo):
         with get_cursor(commit=True) as cursor:
@@ -111,6 +120,7 @@ class DB:
                 VALUES (%s, %s, %s)
                 ON DUPLICATE KEY UPDATE ajuste_fixo = VALUES(ajuste_fixo)
             """, (produto_id, categoria_id, ajuste_fixo))
+        cache_referencia.invalidar(PRECOS)
 
 class DialogNovaCategoria(QDialog):
     def __init__(self, produtos, parent=None):
@@ -160,9 +170,10 @@ class FornecedoresUI(QWidget):
     def __init__(self):
         super().__init__()
         self.db = DB()
+        self.banco = ExecutorBanco(self)
         self.fornecedores = []
-        self.fornecedores_exibidos = []
         self.categorias_do_fornecedor = []
+        self.precos = []
         self.editando_ajuste = False  # Para bloquear recursão no slot de edição
         self.init_ui()
 
@@ -174,9 +185,8 @@ class FornecedoresUI(QWidget):
         self.conectar_sinais()
         self.organizar_layouts()
 
-        self.atualizar_tabela()
-        self.carregar_combo_fornecedores()
         self.cancelar_edicao()
+        self.atualizar_tabela()
 
     def criar_widgets(self):
         # Filtros
@@ -213,10 +223,15 @@ class FornecedoresUI(QWidget):
         self.btn_cancelar = QPushButton('Cancelar')
 
         # Tabela principal
-        self.tabela = QTableWidget()
-        self.tabela.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela.setColumnCount(4)
-        self.tabela.setHorizontalHeaderLabels(['ID', 'Nome', 'Endereço', 'Nº Balança'])
+        self.modelo = TabelaModel([
+            Coluna('ID', 'id'),
+            Coluna('Nome', 'nome'),
+            Coluna('Endereço', 'fornecedores_endereco'),
+            Coluna('Nº Balança', 'fornecedores_numerobalanca'),
+        ], parent=self)
+        self.filtro = FiltroProxyModel(self.modelo, self)
+        self.tabela = TabelaView(self.filtro)
+        self._indice_nome = self._indice_balanca = None
 
         # Tabela de preços
         self.tabela_precos = QTableWidget()
@@ -233,8 +248,9 @@ class FornecedoresUI(QWidget):
         self.input_numero_balanca.setValidator(QIntValidator())
 
     def conectar_sinais(self):
-        self.input_filtro_nome.textChanged.connect(self.aplicar_filtro)
-        self.input_filtro_balanca.textChanged.connect(self.aplicar_filtro)
+        self.timer_filtro = temporizador_filtro(self, self.aplicar_filtro)
+        self.input_filtro_nome.textChanged.connect(lambda _: self.timer_filtro.start())
+        self.input_filtro_balanca.textChanged.connect(lambda _: self.timer_filtro.start())
         self.combo_fornecedores.currentIndexChanged.connect(self.fornecedor_selecionado)
 
         self.btn_adicionar.clicked.connect(self.adicionar_fornecedor)
@@ -242,7 +258,7 @@ class FornecedoresUI(QWidget):
         self.btn_excluir.clicked.connect(self.excluir_fornecedor_combo)
         self.btn_cancelar.clicked.connect(self.cancelar_edicao)
 
-        self.tabela.cellClicked.connect(self.linha_selecionada)
+        self.tabela.clicked.connect(self.linha_selecionada)
         self.combo_categoria.currentIndexChanged.connect(self.categoria_selecionada)
         self.btn_export_pdf.clicked.connect(self.exportar_pdf)
         self.btn_export_jpg.clicked.connect(self.exportar_jpg)
@@ -318,37 +334,39 @@ class FornecedoresUI(QWidget):
         self.setLayout(layout_principal)
 
     def aplicar_filtro(self):
-        nome_filtro = self.input_filtro_nome.text().lower()
-        balanca_filtro = self.input_filtro_balanca.text()
-        filtrados = []
-
-        for f in self.fornecedores:
-            nome_ok = nome_filtro in f['nome'].lower()
-            balanca_ok = balanca_filtro == '' or str(f.get('fornecedores_numerobalanca', '') or f.get('numerobalanca', '')).startswith(balanca_filtro)
-            if nome_ok and balanca_ok:
-                filtrados.append(f)
-
-        self.atualizar_tabela(filtrados)
-
-    def atualizar_tabela(self, dados=None):
-        if dados is None:
-            self.fornecedores = self.db.listar_fornecedores()
-            dados = self.fornecedores
-
-        self.fornecedores_exibidos = list(dados)
-
-        self.tabela.setRowCount(len(dados))
-        for i, row in enumerate(dados):
-            self.tabela.setItem(i, 0, QTableWidgetItem(str(row['id'])))
-            self.tabela.setItem(i, 1, QTableWidgetItem(row['nome']))
-            self.tabela.setItem(i, 2, QTableWidgetItem(row.get('fornecedores_endereco', '') or row.get('endereco', '')))
-            self.tabela.setItem(i, 3, QTableWidgetItem(
-                str(row.get('fornecedores_numerobalanca', '') or row.get('numerobalanca', ''))))
+        # Nome: trecho em qualquer posição, sem diferenciar acentos; balança: começo do número
+        self.timer_filtro.stop()
+        if self._indice_nome is None:
+            return
+        self.filtro.definir_visiveis(combinar(
+            self._indice_nome.buscar(self.input_filtro_nome.text()),
+            self._indice_balanca.buscar(self.input_filtro_balanca.text()),
+        ))
+
+    def atualizar_tabela(self):
+        # Recarrega do banco; tabela e combo são preenchidos quando a lista chegar
+        self.banco.executar(self.db.listar_fornecedores, ao_concluir=self.receber_fornecedores,
+                            canal='fornecedores')
+
+    def receber_fornecedores(self, fornecedores):
+        self.fornecedores = fornecedores
+        self.modelo.definir_linhas(fornecedores)
+        self._indice_nome = IndiceTrechos(f['nome'] for f in fornecedores)
+        self._indice_balanca = IndicePrefixos(str(f.get('fornecedores_numerobalanca') or '') for f in fornecedores)
+        self.filtro.definir_visiveis(None)  # linhas novas: o conjunto anterior não vale mais
+        self.carregar_combo_fornecedores()
+        self.aplicar_filtro()
 
     def carregar_combo_fornecedores(self):
+        selecionado = self.combo_fornecedores.currentData()
+        self.combo_fornecedores.blockSignals(True)
         self.combo_fornecedores.clear()
         for f in self.fornecedores:
             self.combo_fornecedores.addItem(f['nome'], f['id'])
+        self.combo_fornecedores.setCurrentIndex(
+            self.combo_fornecedores.findData(selecionado) if selecionado is not None else -1
+        )
+        self.combo_fornecedores.blockSignals(False)
 
     def fornecedor_selecionado(self, index):
         if index < 0 or index >= len(self.fornecedores):
@@ -366,19 +384,16 @@ class FornecedoresUI(QWidget):
         self.carregar_categorias_do_fornecedor(f['id'])
 
     def carregar_categorias_do_fornecedor(self, fornecedor_id):
+        self.banco.executar(self.db.listar_categorias_ou_padrao, fornecedor_id,
+                            ao_concluir=self.preencher_categorias, canal='categorias')
+
+    def preencher_categorias(self, categorias):
+        self.categorias_do_fornecedor = categorias
+        self.combo_categoria.blockSignals(True)
         self.combo_categoria.clear()
-        self.categorias_do_fornecedor = self.db.listar_categorias_do_fornecedor(fornecedor_id)
-        # Se não houver categorias próprias, tenta pegar a categoria "Padrão"
-        if not self.categorias_do_fornecedor:
-            # Busca a categoria "Padrão" no banco
-            with get_cursor() as cursor:
-                cursor.execute("SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE nome = %s LIMIT 1",
-                               ('Padrão',))
-                cat_padrao = cursor.fetchone()
-                if cat_padrao:
-                    self.categorias_do_fornecedor = [cat_padrao]
         for c in self.categorias_do_fornecedor:
             self.combo_categoria.addItem(c['nome'], c['id'])
+        self.combo_categoria.blockSignals(False)
         self.tabela_precos.setRowCount(0)
         if self.combo_categoria.count() > 0:
             self.combo_categoria.setCurrentIndex(0)
@@ -412,16 +427,10 @@ class FornecedoresUI(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if resposta == QMessageBox.Yes:
-            try:
-                with get_cursor(commit=True) as cursor:
-                    cursor.execute("DELETE FROM categorias_fornecedor_por_fornecedor WHERE id = %s", (categoria_id,))
-                    cursor.execute("DELETE FROM ajustes_fixos_produto_fornecedor_categoria WHERE categoria_id = %s",
-                                   (categoria_id,))
-                fornecedor_id = self.combo_fornecedores.currentData()
-                self.carregar_categorias_do_fornecedor(fornecedor_id)
-                QMessageBox.information(self, "Categoria", "Categoria excluída com sucesso.")
-            except Exception as e:
-                QMessageBox.critical(self, "Erro", str(e))
+            fornecedor_id = self.combo_fornecedores.currentData()
+            self.banco.gravar(self, self.db.excluir_categoria, categoria_id,
+                              ao_concluir=lambda _: self.categoria_gravada(fornecedor_id, "Categoria excluída com sucesso."),
+                              ao_falhar=self.falha_gravacao)
 
     def editar_categoria(self):
         fornecedor_idx = self.combo_fornecedores.currentIndex()
@@ -440,19 +449,21 @@ class FornecedoresUI(QWidget):
         novo_nome, ok = QInputDialog.getText(self, "Editar Categoria", "Novo nome para a categoria:",
                                              text=categoria_nome)
         if ok and novo_nome.strip():
-            try:
-                with get_cursor(commit=True) as cursor:
-                    cursor.execute("UPDATE categorias_fornecedor_por_fornecedor SET nome = %s WHERE id = %s",
-                                   (novo_nome.strip(), categoria_id))
-                fornecedor_id = self.combo_fornecedores.currentData()
-                self.carregar_categorias_do_fornecedor(fornecedor_id)
-                QMessageBox.information(self, "Categoria", "Categoria atualizada com sucesso.")
-            except Exception as e:
-                QMessageBox.critical(self, "Erro", str(e))
-
-    def linha_selecionada(self, row, column):
-        if 0 <= row < len(self.fornecedores_exibidos):
-            f = self.fornecedores_exibidos[row]
+            fornecedor_id = self.combo_fornecedores.currentData()
+            self.banco.gravar(self, self.db.renomear_categoria, categoria_id, novo_nome.strip(),
+                              ao_concluir=lambda _: self.categoria_gravada(fornecedor_id, "Categoria atualizada com sucesso."),
+                              ao_falhar=self.falha_gravacao)
+
+    def categoria_gravada(self, fornecedor_id, mensagem):
+        self.carregar_categorias_do_fornecedor(fornecedor_id)
+        QMessageBox.information(self, "Categoria", mensagem)
+
+    def falha_gravacao(self, erro):
+        QMessageBox.critical(self, "Erro", str(erro))
+
+    def linha_selecionada(self, index):
+        f = self.tabela.linha(index)
+        if f is not None:
             index_combo = self.combo_fornecedores.findData(f['id'])
             if index_combo != -1:
                 self.combo_fornecedores.setCurrentIndex(index_combo)
@@ -462,17 +473,19 @@ class FornecedoresUI(QWidget):
             self.input_numero_balanca.setText(
                 str(f.get('fornecedores_numerobalanca', '') or f.get('numerobalanca', '')))
             self.carregar_categorias_do_fornecedor(f['id'])
-            if self.combo_categoria.count() > 0:
-                self.combo_categoria.setCurrentIndex(0)
-                self.categoria_selecionada(0)
 
     def preencher_tabela_precos(self, categoria_id):
-        self.editando_ajuste = True
         self.tabela_precos.setRowCount(0)
+        self.precos = []
         if not categoria_id:
-            self.editando_ajuste = False
+            self.banco.cancelar('precos')
             return
-        precos = self.db.listar_precos_por_categoria(categoria_id)
+        self.banco.executar(self.db.listar_precos_por_categoria, categoria_id,
+                            ao_concluir=self.mostrar_precos, canal='precos')
+
+    def mostrar_precos(self, precos):
+        self.editando_ajuste = True
+        self.precos = [dict(p) for p in precos]  # cópia: a edição do ajuste altera as linhas
         self.tabela_precos.setRowCount(len(precos))
         for i, p in enumerate(precos):
             self.tabela_precos.setItem(i, 0, QTableWidgetItem(p['nome']))
@@ -493,19 +506,21 @@ class FornecedoresUI(QWidget):
         except ValueError:
             QMessageBox.warning(self, "Valor inválido", "Digite um número válido para o ajuste.")
             # Restaura o valor antigo
-            categoria_id = self.combo_categoria.currentData()
-            precos = self.db.listar_precos_por_categoria(categoria_id)
             self.tabela_precos.blockSignals(True)
-            item.setText(f"{precos[row]['ajuste_fixo']:.2f}")
+            item.setText(f"{self.precos[row]['ajuste_fixo']:.2f}")
             self.tabela_precos.blockSignals(False)
             return
 
         categoria_id = self.combo_categoria.currentData()
-        precos = self.db.listar_precos_por_categoria(categoria_id)
-        produto_id = precos[row]['id']
+        produto_id = self.precos[row]['id']
 
         # Atualiza ou insere o ajuste fixo no banco
-        self.db.atualizar_ajuste_fixo(produto_id, categoria_id, novo_ajuste)
+        self.banco.gravar(self, self.db.atualizar_ajuste_fixo, produto_id, categoria_id, novo_ajuste,
+                          ao_concluir=lambda _: self.ajuste_fixo_gravado(row, novo_ajuste),
+                          ao_falhar=lambda erro: self.falha_ajuste_fixo(row, erro))
+
+    def ajuste_fixo_gravado(self, row, novo_ajuste):
+        self.precos[row]['ajuste_fixo'] = novo_ajuste
 
         # Atualiza o preço final na tabela
         preco_base = float(self.tabela_precos.item(row, 1).text().replace(',', '.'))
@@ -513,20 +528,21 @@ class FornecedoresUI(QWidget):
         self.tabela_precos.setItem(row, 3, QTableWidgetItem(f"{preco_base + novo_ajuste:.2f}"))
         self.tabela_precos.blockSignals(False)
 
+    def falha_ajuste_fixo(self, row, erro):
+        # Restaura o valor antigo
+        self.tabela_precos.blockSignals(True)
+        self.tabela_precos.item(row, 2).setText(f"{self.precos[row]['ajuste_fixo']:.2f}")
+        self.tabela_precos.blockSignals(False)
+        self.falha_gravacao(erro)
+
     def adicionar_fornecedor(self):
         nome = self.input_nome.text().strip()
         endereco = self.input_endereco.text().strip()
         numero_balanca = self.input_numero_balanca.text().strip()
 
         if nome and endereco and numero_balanca:
-            try:
-                self.db.adicionar_fornecedor(nome, endereco, numero_balanca)
-                self.cancelar_edicao()
-                self.atualizar_tabela()
-                self.carregar_combo_fornecedores()
-                self.aplicar_filtro()
-            except Exception as e:
-                QMessageBox.critical(self, 'Erro', str(e))
+            self.banco.gravar(self, self.db.adicionar_fornecedor, nome, endereco, numero_balanca,
+                              ao_concluir=self.fornecedor_gravado, ao_falhar=self.falha_gravacao)
         else:
             QMessageBox.warning(self, 'Campos obrigatórios', 'Preencha todos os campos.')
 
@@ -539,14 +555,8 @@ class FornecedoresUI(QWidget):
             numero_balanca = self.input_numero_balanca.text().strip()
 
             if nome and endereco and numero_balanca:
-                try:
-                    self.db.atualizar_fornecedor(fornecedor_id, nome, endereco, numero_balanca)
-                    self.cancelar_edicao()
-                    self.atualizar_tabela()
-                    self.carregar_combo_fornecedores()
-                    self.aplicar_filtro()
-                except Exception as e:
-                    QMessageBox.critical(self, 'Erro', str(e))
+                self.banco.gravar(self, self.db.atualizar_fornecedor, fornecedor_id, nome, endereco, numero_balanca,
+                                  ao_concluir=self.fornecedor_gravado, ao_falhar=self.falha_gravacao)
             else:
                 QMessageBox.warning(self, 'Campos obrigatórios', 'Preencha todos os campos para atualizar.')
 
@@ -563,14 +573,12 @@ class FornecedoresUI(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if resposta == QMessageBox.Yes:
-            try:
-                self.db.excluir_fornecedor(fornecedor_id)
-                self.cancelar_edicao()
-                self.atualizar_tabela()
-                self.carregar_combo_fornecedores()
-                self.aplicar_filtro()
-            except Exception as e:
-                QMessageBox.critical(self, 'Erro', str(e))
+            self.banco.gravar(self, self.db.excluir_fornecedor, fornecedor_id,
+                              ao_concluir=self.fornecedor_gravado, ao_falhar=self.falha_gravacao)
+
+    def fornecedor_gravado(self, _=None):
+        self.cancelar_edicao()
+        self.atualizar_tabela()
 
     def cancelar_edicao(self):
         self.combo_fornecedores.setCurrentIndex(-1)
@@ -588,26 +596,31 @@ class FornecedoresUI(QWidget):
             QMessageBox.warning(self, "Adicionar Categoria", "Selecione um fornecedor antes de criar uma categoria.")
             return
         fornecedor_id = self.combo_fornecedores.currentData()
+        # Os produtos vêm em segundo plano; o diálogo abre quando eles chegarem
+        self.banco.executar(self.db.listar_produtos, canal='produtos_categoria',
+                            ao_concluir=lambda produtos: self.abrir_nova_categoria(fornecedor_id, produtos))
 
-        produtos = self.db.listar_produtos()
+    def abrir_nova_categoria(self, fornecedor_id, produtos):
         dialog = DialogNovaCategoria(produtos, self)
         if dialog.exec() == QDialog.Accepted:
             nome_categoria, ajustes = dialog.get_dados()
             if not nome_categoria:
                 QMessageBox.warning(self, "Categoria", "Nome da categoria não pode ser vazio.")
                 return
-            try:
-                categoria_id = self.db.adicionar_categoria_para_fornecedor(fornecedor_id, nome_categoria)
-                if ajustes:
-                    self.db.inserir_ajustes_categoria(categoria_id, ajustes)
-                self.carregar_categorias_do_fornecedor(fornecedor_id)
-                QMessageBox.information(self, "Categoria", "Categoria e ajustes adicionados com sucesso.")
-            except Exception as e:
-                QMessageBox.critical(self, "Erro", str(e))
+            self.banco.gravar(self, self.db.criar_categoria, fornecedor_id, nome_categoria, ajustes,
+                              ao_concluir=lambda _: self.categoria_gravada(
+                                  fornecedor_id, "Categoria e ajustes adicionados com sucesso."),
+                              ao_falhar=self.falha_gravacao)
 
     # ... [Os métodos exportar_pdf e exportar_jpg permanecem inalterados] ...
 
     def exportar_pdf(self):
+        # reportlab só é carregado na primeira exportação
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib import colors
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Table, TableStyle
         fornecedor_idx = self.combo_fornecedores.currentIndex()
         categoria_idx = self.combo_categoria.currentIndex()
         if fornecedor_idx < 0 or categoria_idx < 0:
@@ -707,12 +720,8 @@ class FornecedoresUI(QWidget):
 
     def adicionar_marca_dagua_pdf_area(self, c, texto, x_inicio, x_fim, y_topo, altura, tamanho_fonte=30, cor=(0.8, 0.8, 0.8), angulo=25):
         from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        try:
-            pdfmetrics.registerFont(TTFont('Arial', 'arial.ttf'))
-            fonte_nome = 'Arial'
-        except:
-            fonte_nome = 'Helvetica'
+        from marca_dagua import fonte_pdf
+        fonte_nome = fonte_pdf()
         c.saveState()
         c.setFont(fonte_nome, tamanho_fonte)
         c.setFillColorRGB(*cor, alpha=0.3)
@@ -733,6 +742,8 @@ class FornecedoresUI(QWidget):
         c.restoreState()
 
     def exportar_jpg(self):
+        from PIL import Image, ImageDraw, ImageFont
+        from marca_dagua import adicionar_marca_dagua_area
         fornecedor_idx = self.combo_fornecedores.currentIndex()
         categoria_idx = self.combo_categoria.currentIndex()
         if fornecedor_idx < 0 or categoria_idx < 0:
@@ -800,7 +811,7 @@ class FornecedoresUI(QWidget):
         y_fim_tabela = y
         y_inicio_tabela = margem_topo + 50 + altura_linha
 
-        img_base = self.adicionar_marca_dagua_area(
+        img_base = adicionar_marca_dagua_area(
             img_base,
             texto=num_balanca,
             x_inicio=col1_x,
@@ -823,33 +834,6 @@ class FornecedoresUI(QWidget):
         QMessageBox.information(self, "Exportar JPG", f"Arquivo JPG gerado:\n{arquivo_jpg}")
         abrir_arquivo(arquivo_jpg)
 
-    def adicionar_marca_dagua_area(self, imagem, texto, x_inicio, x_fim, y_inicio, altura, fonte_path="arial.ttf", tamanho_fonte=30, opacidade=80, angulo=25):
-        try:
-            fonte = ImageFont.truetype(fonte_path, tamanho_fonte)
-        except IOError:
-            fonte = ImageFont.load_default()
-        marca = Image.new("RGBA", imagem.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(marca)
-
-        bbox = draw.textbbox((0, 0), texto, font=fonte)
-        texto_largura = bbox[2] - bbox[0]
-        texto_altura = bbox[3] - bbox[1]
-
-        step_x = texto_largura + 40
-        step_y = tamanho_fonte * 2
-
-        for y in range(int(y_inicio), int(y_inicio + altura), int(step_y)):
-            for x in range(int(x_inicio), int(x_fim), int(step_x)):
-                txt_img = Image.new("RGBA", (texto_largura + 20, texto_altura + 20), (255, 255, 255, 0))
-                txt_draw = ImageDraw.Draw(txt_img)
-                txt_draw.text((10, 10), texto, font=fonte, fill=(200, 200, 200, opacidade))
-                txt_img = txt_img.rotate(angulo, expand=1, resample=Image.BICUBIC)
-                px = int(x)
-                py = int(y)
-                marca.alpha_composite(txt_img, (px, py))
-        resultado = Image.alpha_composite(imagem.convert("RGBA"), marca)
-        return resultado.convert("RGB")
-
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     QLocale.setDefault(QLocale(QLocale.Portuguese, QLocale.Brazil))
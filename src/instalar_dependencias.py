@@ -0,0 +1,34 @@
+"""Instala o requirements.txt (e o pip, se faltar) no Python atual.
+
+Roda só quando pedido, antes de qualquer importação do PySide6:
+
+    python main.py --instalar-dependencias
+    python instalar_dependencias.py
+"""
+import os
+import subprocess
+import sys
+import urllib.request
+
+OPCAO = '--instalar-dependencias'
+
+def instalar_pip():
+    url = "https://bootstrap.pypa.io/get-pip.py"
+    script = "get-pip.py"
+    urllib.request.urlretrieve(url, script)
+    subprocess.check_call([sys.executable, script])
+    os.remove(script)
+
+def instalar_dependencias():
+    try:
+        import PySide6
+    except ImportError:
+        try:
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        except FileNotFoundError:
+            print("Pip não encontrado. Tentando instalar pip automaticamente...")
+            instalar_pip()
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+
+if __name__ == '__main__':
+    instalar_dependencias()
@@ -0,0 +1,72 @@
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+
+# Gravação das linhas de itens (itens_compra, itens_movimentacao): produto, quantidade e
+# preço unitário presos a uma compra/movimentação pela coluna `coluna_pai`.
+
+CENTAVO = Decimal("0.01")
+
+def preco_item(preco):
+    """Preço unitário como fica gravado na coluna DECIMAL de 2 casas."""
+    return Decimal(str(preco)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+def total_itens(itens):
+    """Soma de quantidade x preço unitário, o mesmo que um SUM sobre as linhas gravadas."""
+    return sum((Decimal(str(i['quantidade'])) * preco_item(i['preco']) for i in itens), Decimal("0.00"))
+
+def _chave(produto_id, quantidade, preco):
+    return produto_id, Decimal(str(quantidade)), preco_item(preco)
+
+def inserir_itens(cursor, tabela, coluna_pai, pai_id, itens):
+    """Insere todas as linhas numa chamada; o conector transforma em um INSERT de várias linhas."""
+    if not itens:
+        return
+    cursor.executemany(
+        f"INSERT INTO {tabela} ({coluna_pai}, produto_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
+        [(pai_id,) + _chave(i['produto_id'], i['quantidade'], i['preco']) for i in itens]
+    )
+
+def sincronizar_itens(cursor, tabela, coluna_pai, pai_id, itens):
+    """Deixa as linhas do banco iguais a `itens` mexendo só no que mudou.
+
+    Linhas de mesmo conteúdo são intercambiáveis, então a comparação é por
+    (produto, quantidade, preço). Uma linha trocada do mesmo produto vira UPDATE.
+    """
+    cursor.execute(
+        f"SELECT produto_id, quantidade, preco_unitario FROM {tabela} WHERE {coluna_pai} = %s", (pai_id,)
+    )
+    antigos = Counter(_chave(r['produto_id'], r['quantidade'], r['preco_unitario']) for r in cursor.fetchall())
+    novos = Counter(_chave(i['produto_id'], i['quantidade'], i['preco']) for i in itens)
+    removidos = list((antigos - novos).elements())
+    inseridos = list((novos - antigos).elements())
+
+    alteracoes = []
+    for novo in list(inseridos):
+        antigo = next((r for r in removidos if r[0] == novo[0]), None)
+        if antigo is not None:
+            removidos.remove(antigo)
+            inseridos.remove(novo)
+            alteracoes.append((novo[1], novo[2], pai_id) + antigo)
+
+    # As linhas são localizadas pelo conteúdo; se alguma não for encontrada, regrava tudo
+    localizadas = 0
+    if alteracoes:
+        cursor.executemany(f"""
+            UPDATE {tabela} SET quantidade = %s, preco_unitario = %s
+            WHERE {coluna_pai} = %s AND produto_id = %s AND quantidade = %s AND preco_unitario = %s
+            LIMIT 1
+        """, alteracoes)
+        localizadas += cursor.rowcount
+    if removidos:
+        cursor.executemany(f"""
+            DELETE FROM {tabela}
+            WHERE {coluna_pai} = %s AND produto_id = %s AND quantidade = %s AND preco_unitario = %s
+            LIMIT 1
+        """, [(pai_id,) + r for r in removidos])
+        localizadas += cursor.rowcount
+    if localizadas != len(alteracoes) + len(removidos):
+        cursor.execute(f"DELETE FROM {tabela} WHERE {coluna_pai} = %s", (pai_id,))
+        inserir_itens(cursor, tabela, coluna_pai, pai_id, itens)
+        return
+    inserir_itens(cursor, tabela, coluna_pai, pai_id,
+                  [{'produto_id': r[0], 'quantidade': r[1], 'preco': r[2]} for r in inseridos])
@@ -1,4 +1,39 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QLabel, QPushButton, QMessageBox
+import traceback
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QLabel, QPushButton, QMessageBox, QProgressBar
+from tarefas import ExecutorBanco
+
+def verificar_login(usuario, senha):
+    """Busca o usuário e confere a senha (fora da thread da interface: o bcrypt é lento de propósito).
+
+    Devolve (usuario, None) ou (None, mensagem). Se a configuração pede outro custo de bcrypt,
+    o hash é refeito com a senha que acabou de ser conferida.
+    """
+    from db_context import get_cursor
+    from auth_utils import checar_senha, hash_senha, custo_configurado, precisa_refazer_hash
+    with get_cursor() as cursor:
+        cursor.execute(
+            "SELECT id, nome, username, nivel, ativo, senha_hash FROM usuarios WHERE username = %s AND ativo = 1",
+            (usuario,)
+        )
+        user = cursor.fetchone()
+    if not user:
+        return None, "Usuário não encontrado ou inativo!"
+    senha_hash = user.pop('senha_hash')
+    if not checar_senha(senha, senha_hash):
+        return None, "Senha incorreta!"
+
+    custo = custo_configurado()
+    if precisa_refazer_hash(senha_hash, custo):
+        try:
+            with get_cursor(commit=True) as cursor:
+                # Só troca se ninguém mudou a senha nesse meio tempo
+                cursor.execute(
+                    "UPDATE usuarios SET senha_hash = %s WHERE id = %s AND senha_hash = %s",
+                    (hash_senha(senha, custo), user['id'], senha_hash)
+                )
+        except Exception:
+            traceback.print_exc()  # o login vale com o hash antigo; tenta de novo no próximo
+    return user, None
 
 class LoginDialog(QDialog):
     def __init__(self, parent=None):
@@ -12,13 +47,27 @@ class LoginDialog(QDialog):
         self.password.setEchoMode(QLineEdit.Password)
         self.btn = QPushButton("Entrar")
         self.btn.clicked.connect(self.login)
+        self.progresso = QProgressBar()
+        self.progresso.setRange(0, 0)  # indeterminado
+        self.progresso.setTextVisible(False)
+        self.progresso.hide()
         layout.addWidget(QLabel("Usuário:"))
         layout.addWidget(self.username)
         layout.addWidget(QLabel("Senha:"))
         layout.addWidget(self.password)
         layout.addWidget(self.btn)
+        layout.addWidget(self.progresso)
         self.setLayout(layout)
         self.usuario_autenticado = None
+        self.banco = ExecutorBanco(self)
+
+    def set_ocupado(self, texto=None):
+        """Com um texto, trava o formulário e mostra o indicador; com None, libera."""
+        ocupado = texto is not None
+        for widget in (self.username, self.password, self.btn):
+            widget.setEnabled(not ocupado)
+        self.btn.setText(texto or "Entrar")
+        self.progresso.setVisible(ocupado)
 
     def login(self):
         usuario = self.username.text().strip()
@@ -26,16 +75,20 @@ class LoginDialog(QDialog):
         if not usuario or not senha:
             QMessageBox.warning(self, "Erro", "Preencha usuário e senha!")
             return
-        from db_context import get_cursor
-        with get_cursor() as cursor:
-            cursor.execute("SELECT * FROM usuarios WHERE username = %s AND ativo = 1", (usuario,))
-            user = cursor.fetchone()
-        if not user:
-            QMessageBox.warning(self, "Erro", "Usuário não encontrado ou inativo!")
-            return
-        from auth_utils import checar_senha
-        if not checar_senha(senha, user['senha_hash']):
-            QMessageBox.warning(self, "Erro", "Senha incorreta!")
+        self.set_ocupado("Entrando...")
+        self.banco.executar(verificar_login, usuario, senha, canal='login',
+                            ao_concluir=self.login_verificado, ao_falhar=self.falha_login)
+
+    def login_verificado(self, resultado):
+        user, erro = resultado
+        self.set_ocupado(None)
+        if erro:
+            QMessageBox.warning(self, "Erro", erro)
+            self.password.setFocus()
             return
         self.usuario_autenticado = user
-        self.accept()
\ No newline at end of file
+        self.accept()
+
+    def falha_login(self, erro):
+        self.set_ocupado(None)
+        QMessageBox.warning(self, "Erro", f"Não foi possível verificar o login:\n{erro}")
@@ -1,45 +1,61 @@
 import sys
-import subprocess
-import os
-import urllib.request
+import tempo_inicio
+tempo_inicio.ligar_se_pedido(sys.argv)  # antes das outras importações, para medi-las
+
+if '--instalar-dependencias' in sys.argv:
+    # Só quando pedido: pode chamar o pip e baixar o get-pip.py
+    from instalar_dependencias import instalar_dependencias
+    instalar_dependencias()
+
+import multiprocessing
 import ajustes
+from ajustes import AjustesUI
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QPushButton, QStackedWidget, QHBoxLayout, QMessageBox
 )
-from PySide6.QtCore import Qt, QLocale
+from PySide6.QtCore import Qt, QLocale, QTimer
+from PySide6.QtGui import QShortcut, QKeySequence
 from login_dialog import LoginDialog
 from utils_permissoes import requer_permissao
+from tarefas import ExecutorBanco
+from eventos import eventos
 
-def instalar_pip():
-    url = "https://bootstrap.pypa.io/get-pip.py"
-    script = "get-pip.py"
-    urllib.request.urlretrieve(url, script)
-    subprocess.check_call([sys.executable, script])
-    os.remove(script)
+# Cada tela (e o que ela importa: reportlab, PIL, modelos) só é carregada na primeira navegação.
+# Os imports ficam escritos dentro das funções para o PyInstaller continuar encontrando-os.
+def _tela_compras():
+    from src.compras.compras import ComprasUI
+    return ComprasUI()
 
-def instalar_dependencias():
-    try:
-        import PySide6
-    except ImportError:
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
-        except FileNotFoundError:
-            print("Pip não encontrado. Tentando instalar pip automaticamente...")
-            instalar_pip()
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
-
-instalar_dependencias()
-
-# Importando os módulos
-from src.compras.compras import ComprasUI
-from produtos import ProdutosUI
-from debitos import DebitosUI
-from dados_bancarios import DadosBancariosUI
-from fornecedores import FornecedoresUI
-from ajustes import AjustesUI
-from movimentacoes import MovimentacoesUI
-from usuarios import UsuariosUI  # --- USUÁRIOS ---
+def _tela_movimentacoes():
+    from movimentacoes import MovimentacoesUI
+    return MovimentacoesUI()
+
+def _tela_produtos():
+    from produtos import ProdutosUI
+    return ProdutosUI()
+
+def _tela_debitos():
+    from debitos import DebitosUI
+    return DebitosUI()
+
+def _tela_dados_bancarios():
+    from dados_bancarios import DadosBancariosUI
+    return DadosBancariosUI()
+
+def _tela_fornecedores():
+    from fornecedores import FornecedoresUI
+    return FornecedoresUI()
+
+def migracoes_pendentes():
+    """Migrações que faltam no banco ativo, só lendo schema_migracoes (roda fora da thread da interface)."""
+    import migracoes  # traz o conector MySQL; carregado já com o login na tela
+    return migracoes.pendentes()
+
+TELA_COMPRAS = 0
+TELA_DEBITOS = 3
+TELA_AJUSTES = 6
+TELA_USUARIOS = 7
 
 class MainWindow(QMainWindow):
     def __init__(self, usuario_logado):
@@ -64,41 +80,22 @@ class MainWindow(QMainWindow):
         self.stack = QStackedWidget()
         main_layout.addWidget(self.stack)
 
-        # Inicializando os módulos
-        self.compras_ui = ComprasUI()
-        self.produtos_ui = ProdutosUI()
-        self.debitos_ui = DebitosUI()
-        self.dados_bancarios_ui = DadosBancariosUI()
-        self.fornecedores_ui = FornecedoresUI()
-        self.movimentacoes_ui = MovimentacoesUI()
-        self.ajustes_ui = AjustesUI()
+        # Telas criadas só na primeira navegação: cada uma consulta o banco ao ser construída
+        self.fabricas = [
+            _tela_compras,                                      # 0
+            _tela_movimentacoes,                                # 1
+            _tela_produtos,                                     # 2
+            _tela_debitos,                                      # 3
+            _tela_dados_bancarios,                              # 4
+            _tela_fornecedores,                                 # 5
+            AjustesUI,                                          # 6
+        ]
         # --- USUÁRIOS ---
         if self.usuario_logado['nivel'] == 'admin':
-            self.usuarios_ui = UsuariosUI(self.usuario_logado)
-        else:
-            self.usuarios_ui = None
-
-        # Passa o usuário logado para as UIs que precisam de permissões (exemplo)
-        for ui in [self.compras_ui, self.produtos_ui, self.debitos_ui,
-                   self.dados_bancarios_ui, self.fornecedores_ui,
-                   self.movimentacoes_ui, self.ajustes_ui]:
-            ui.usuario_logado = self.usuario_logado
-        if self.usuarios_ui:
-            self.usuarios_ui.usuario_logado = self.usuario_logado
-
-        self.compras_ui.set_janela_debitos(self.debitos_ui)
-        self.compras_ui.set_main_window(self)
-
-        # Adicionando os módulos ao stack
-        self.stack.addWidget(self.compras_ui)           # 0
-        self.stack.addWidget(self.movimentacoes_ui)     # 1
-        self.stack.addWidget(self.produtos_ui)          # 2
-        self.stack.addWidget(self.debitos_ui)           # 3
-        self.stack.addWidget(self.dados_bancarios_ui)   # 4
-        self.stack.addWidget(self.fornecedores_ui)      # 5
-        self.stack.addWidget(self.ajustes_ui)           # 6
-        if self.usuarios_ui:                            # --- USUÁRIOS ---
-            self.stack.addWidget(self.usuarios_ui)      # 7
+            self.fabricas.append(self._tela_usuarios)  # 7
+        self.telas = {}
+        for _ in self.fabricas:
+            self.stack.addWidget(QWidget())  # marcador até a tela ser criada
 
         # Define permissões para cada módulo
         permissoes_modulos = [
@@ -111,7 +108,7 @@ class MainWindow(QMainWindow):
             (["admin"]),                                        # Ajustes
         ]
         # --- USUÁRIOS ---
-        if self.usuarios_ui:
+        if len(self.fabricas) > TELA_USUARIOS:
             permissoes_modulos.append(["admin"])                # Usuários
 
         botoes = [
@@ -124,7 +121,7 @@ class MainWindow(QMainWindow):
             ("Ajustes", 6),
         ]
         # --- USUÁRIOS ---
-        if self.usuarios_ui:
+        if len(self.fabricas) > TELA_USUARIOS:
             botoes.append(("Usuários", 7))
 
         for i, (nome, idx) in enumerate(botoes):
@@ -134,7 +131,7 @@ class MainWindow(QMainWindow):
             def make_abrir_modulo(index, niveis):
                 @requer_permissao(niveis)
                 def abrir_modulo(self):
-                    self.stack.setCurrentIndex(index)
+                    self.mostrar_tela(index)
                 return abrir_modulo
 
             # Vincula a função ao clique do botão
@@ -143,9 +140,145 @@ class MainWindow(QMainWindow):
 
         menu_layout.addStretch()
 
+        # Painel escondido com o tempo gasto por comando SQL
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.abrir_diagnostico)
+
+        # Trocar de banco em Ajustes vale na hora, sem reiniciar nem pedir login de novo
+        self.banco = ExecutorBanco(self)
+        ajustes.ao_mudar_config(self.config_alterada)
+        eventos().banco_atualizado.connect(self.banco_atualizado)
+
+        # As telas de dados esperam o banco estar na versão do código: com migrações pendentes
+        # elas consultariam tabelas e colunas que ainda não existem
+        self.pendentes = None  # None: ainda não conferido no banco ativo
+        self.tela_pedida = TELA_COMPRAS
+
+        # A primeira tela é montada logo depois da janela aparecer; seus dados chegam em segundo plano
+        QTimer.singleShot(0, lambda: self.mostrar_tela(TELA_COMPRAS))
+
+    def obter_tela(self, index, criar=True):
+        """Devolve a tela do índice, criando-a na primeira vez (ou None se criar=False)."""
+        tela = self.telas.get(index)
+        if tela is None and criar:
+            tela = self.fabricas[index]()
+            tela.usuario_logado = self.usuario_logado
+            if index == TELA_COMPRAS:
+                tela.set_janela_debitos(lambda criar=True: self.obter_tela(TELA_DEBITOS, criar))
+                tela.set_main_window(self)
+            marcador = self.stack.widget(index)
+            atual = self.stack.currentIndex()
+            self.stack.removeWidget(marcador)
+            self.stack.insertWidget(index, tela)
+            marcador.deleteLater()
+            self.stack.setCurrentIndex(atual)
+            self.telas[index] = tela
+        return tela
+
+    def _tela_usuarios(self):
+        from usuarios import UsuariosUI
+        return UsuariosUI(self.usuario_logado)
+
+    def config_alterada(self, nome):
+        # O pool e o cache já foram descartados; as telas voltam lendo o banco novo
+        self.pendentes = None
+        if nome is None:
+            # A configuração ativa foi removida: só Ajustes funciona até outra ser ativada
+            self.recriar_telas(remontar_atual=False)
+            self.mostrar_tela(TELA_AJUSTES)
+            QMessageBox.warning(self, "Banco de dados",
+                                "A configuração ativa foi removida. Ative outra em Ajustes para continuar.")
+            return
+        # A tela visível só volta depois de conferida a versão do banco novo
+        self.recriar_telas(remontar_atual=False)
+        atual = self.stack.currentIndex()
+        if atual != TELA_AJUSTES:
+            self.mostrar_tela(atual)
+        else:
+            self.conferir_migracoes()
+
+    def banco_atualizado(self):
+        # Migrações aplicadas em Ajustes: confere de novo (podem ter ficado algumas para trás)
+        self.pendentes = None
+        self.conferir_migracoes()
+
+    def conferir_migracoes(self):
+        """Lê em segundo plano as migrações pendentes do banco ativo e, se não houver, abre a tela pedida."""
+        self.banco.executar(migracoes_pendentes, canal='migracoes',
+                            ao_concluir=self.migracoes_conferidas,
+                            ao_falhar=self.falha_conferir_migracoes)
+
+    def migracoes_conferidas(self, pendentes):
+        self.pendentes = pendentes
+        if pendentes:
+            self.recriar_telas(remontar_atual=False)
+            self.bloquear_telas()
+        elif self.tela_pedida != TELA_AJUSTES:
+            self.mostrar_tela(self.tela_pedida)
+
+    def falha_conferir_migracoes(self, erro):
+        # Continua sem conferir (self.pendentes None): a próxima navegação tenta de novo
+        QMessageBox.warning(self, "Banco de dados",
+                            f"Não foi possível conferir a versão do banco de dados:\n{erro}")
+
+    def bloquear_telas(self):
+        """Avisa que o banco está desatualizado; ao administrador, oferece atualizar na hora."""
+        texto = (f"O banco de dados está desatualizado ({len(self.pendentes)} atualização(ões) "
+                 "pendente(s)). As telas de dados ficam bloqueadas até que sejam aplicadas.")
+        if self.usuario_logado['nivel'] != 'admin':
+            QMessageBox.warning(self, "Banco de dados",
+                                texto + "\nPeça a um administrador para aplicá-las em Ajustes > "
+                                "Atualizar banco de dados ou com 'python migracoes.py'.")
+            return
+        self.tela_pedida = TELA_AJUSTES
+        self.stack.setCurrentWidget(self.obter_tela(TELA_AJUSTES))
+        resposta = QMessageBox.question(self, "Banco de dados", texto + "\n\nAtualizar o banco agora?")
+        if resposta == QMessageBox.Yes:
+            self.obter_tela(TELA_AJUSTES).atualizar_banco()
+
+    def recriar_telas(self, remontar_atual=True):
+        """Descarta as telas criadas (exceto Ajustes) para que voltem com os dados do banco ativo.
+
+        Recriar é mais seguro que recarregar campo a campo: ids guardados em combos e seleções
+        pertencem ao banco anterior. A tela visível é montada de novo (se `remontar_atual`);
+        as outras, na próxima navegação.
+        """
+        atual = self.stack.currentIndex()
+        for index, tela in list(self.telas.items()):
+            if index == TELA_AJUSTES:
+                continue
+            self.stack.removeWidget(tela)
+            self.stack.insertWidget(index, QWidget())
+            tela.deleteLater()
+            del self.telas[index]
+        self.stack.setCurrentIndex(atual)
+        if remontar_atual and atual != TELA_AJUSTES:
+            self.mostrar_tela(atual)
+
+    def abrir_diagnostico(self):
+        from painel_diagnostico import PainelDiagnostico
+        PainelDiagnostico(self).show()
+
+    def mostrar_tela(self, index):
+        if index != TELA_AJUSTES:
+            if ajustes.config_ativa is None:
+                QMessageBox.warning(self, "Banco de dados", "Nenhuma configuração ativa. Ative uma em Ajustes.")
+                index = TELA_AJUSTES
+            elif self.pendentes is None:
+                # Ainda conferindo a versão do banco: a tela abre quando a conferência terminar
+                self.tela_pedida = index
+                self.conferir_migracoes()
+                return
+            elif self.pendentes:
+                self.bloquear_telas()
+                return
+        self.tela_pedida = index
+        self.stack.setCurrentWidget(self.obter_tela(index))
+
 def main():
+    tempo_inicio.marcar("importações")
     app = QApplication(sys.argv)
     QLocale.setDefault(QLocale(QLocale.Portuguese, QLocale.Brazil))
+    tempo_inicio.marcar("QApplication criada")
 
     # Verifica se há configuração ativa
     try:
@@ -166,6 +299,14 @@ def main():
 
     # ==== TELA DE LOGIN ====
     login = LoginDialog()
+
+    def login_exibido():
+        tempo_inicio.marcar("login exibido")
+        tempo_inicio.concluir()
+        if tempo_inicio.sair_no_login(sys.argv):
+            login.reject()
+    QTimer.singleShot(0, login_exibido)
+
     if not login.exec():
         sys.exit(0)  # Usuário cancelou o login
 
@@ -183,4 +324,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == '__main__':
+    # Necessário para a exportação em lote (ProcessPoolExecutor) no executável empacotado
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+@lru_cache(maxsize=16)
+def carregar_fonte(fonte_path, tamanho):
+    try:
+        return ImageFont.truetype(fonte_path, tamanho)
+    except IOError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=32)
+def carimbo(texto, fonte_path, tamanho_fonte, angulo, opacidade):
+    """Texto da marca d'água já rotacionado, e o passo horizontal entre repetições."""
+    fonte = carregar_fonte(fonte_path, tamanho_fonte)
+    bbox = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), texto, font=fonte)
+    texto_largura = bbox[2] - bbox[0]
+    texto_altura = bbox[3] - bbox[1]
+
+    txt_img = Image.new("RGBA", (texto_largura + 20, texto_altura + 20), (255, 255, 255, 0))
+    ImageDraw.Draw(txt_img).text((10, 10), texto, font=fonte, fill=(200, 200, 200, opacidade))
+    return txt_img.rotate(angulo, expand=1, resample=Image.BICUBIC), texto_largura + 40
+
+@lru_cache(maxsize=8)
+def _faixa(texto, fonte_path, tamanho_fonte, angulo, opacidade, largura):
+    """Uma linha inteira de carimbos lado a lado, cobrindo `largura` pixels."""
+    img, passo_x = carimbo(texto, fonte_path, tamanho_fonte, angulo, opacidade)
+    repeticoes = max(1, -(-largura // passo_x))
+    faixa = Image.new("RGBA", (passo_x * (repeticoes - 1) + img.width, img.height), (255, 255, 255, 0))
+    for i in range(repeticoes):
+        faixa.alpha_composite(img, (i * passo_x, 0))
+    return faixa
+
+def carimbar(imagem, texto, x_inicio, x_fim, y_inicio, altura, fonte_path="arial.ttf", tamanho_fonte=30,
+             opacidade=80, angulo=25):
+    """Aplica a marca d'água na área, alterando `imagem` (RGBA) no lugar."""
+    x_inicio, y_inicio = max(0, int(x_inicio)), max(0, int(y_inicio))
+    if x_fim <= x_inicio or altura <= 0:
+        return
+    faixa = _faixa(texto, fonte_path, tamanho_fonte, angulo, opacidade, int(x_fim) - x_inicio)
+    passo_y = int(tamanho_fonte * 2)
+
+    # Só a região coberta é recortada e recomposta, não a imagem inteira
+    caixa = (
+        x_inicio, y_inicio,
+        min(imagem.width, x_inicio + faixa.width),
+        min(imagem.height, int(y_inicio + altura) + faixa.height),
+    )
+    if caixa[2] <= caixa[0] or caixa[3] <= caixa[1]:
+        return
+    regiao = imagem.crop(caixa)
+    for y in range(y_inicio, int(y_inicio + altura), passo_y):
+        regiao.alpha_composite(faixa, (0, y - y_inicio))
+    imagem.paste(regiao, caixa[:2])
+
+def adicionar_marca_dagua_area(imagem, texto, x_inicio, x_fim, y_inicio, altura, fonte_path="arial.ttf",
+                               tamanho_fonte=30, opacidade=80, angulo=25):
+    """Retorna uma cópia RGB de `imagem` com a marca d'água repetida na área indicada."""
+    resultado = imagem.convert("RGBA")
+    carimbar(resultado, texto, x_inicio, x_fim, y_inicio, altura, fonte_path, tamanho_fonte, opacidade, angulo)
+    return resultado.convert("RGB")
+
+@lru_cache(maxsize=None)
+def fonte_pdf(fonte_path="arial.ttf", nome="Arial"):
+    """Registra a fonte TrueType no reportlab uma única vez; cai para Helvetica se não existir."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    try:
+        pdfmetrics.registerFont(TTFont(nome, fonte_path))
+        return nome
+    except Exception:
+        return "Helvetica"
@@ -0,0 +1,390 @@
+"""Versões do esquema do banco.
+
+Cada migração tem um número, uma descrição e os passos (SQL ou função que recebe o
+cursor). As já aplicadas ficam registradas em schema_migracoes. Aplicar é sempre um
+pedido explícito, pela tela de Ajustes ou pela linha de comando; ao abrir, o programa
+só confere (sem escrever nada) se há pendentes e avisa:
+
+    python migracoes.py             aplica as pendentes, com EXPLAIN antes e depois
+    python migracoes.py --status    lista as migrações e se já foram aplicadas
+    python migracoes.py --explain   só mostra o plano das consultas mais usadas
+"""
+import sys
+from datetime import date, timedelta
+from db_context import get_connection
+
+NOME_TRAVA = 'schema_migracoes'  # + o banco: travas do GET_LOCK valem para o servidor inteiro
+ESPERA_TRAVA = 60  # segundos esperando outra estação terminar de migrar
+
+def _criar_indice(tabela, nome, colunas):
+    """MySQL não tem CREATE INDEX IF NOT EXISTS; confere no information_schema antes."""
+    def passo(cursor):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (tabela, nome))
+        if cursor.fetchone()['n'] == 0:
+            cursor.execute(f"CREATE INDEX {nome} ON {tabela} ({colunas})")
+    return passo
+
+def _adicionar_coluna(tabela, coluna, definicao):
+    def passo(cursor):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (tabela, coluna))
+        if cursor.fetchone()['n'] == 0:
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+    return passo
+
+def _adicionar_chave_estrangeira(tabela, nome, definicao):
+    def passo(cursor):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.table_constraints
+            WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = %s
+        """, (tabela, nome))
+        if cursor.fetchone()['n'] == 0:
+            cursor.execute(f"ALTER TABLE {tabela} ADD CONSTRAINT {nome} {definicao}")
+    return passo
+
+def _vincular_abatimentos_existentes(cursor):
+    # Até aqui o abatimento só se ligava à movimentação pelo texto da descrição
+    prefixo = "Abatimento automático referente à movimentação "
+    cursor.execute("""
+        UPDATE movimentacoes a
+            JOIN movimentacoes o
+                 ON o.id = CAST(SUBSTRING(a.descricao, CHAR_LENGTH(%s) + 1) AS UNSIGNED)
+        SET a.movimentacao_origem_id = o.id
+        WHERE a.tipo = 'transação'
+          AND a.direcao = 'entrada'
+          AND a.movimentacao_origem_id IS NULL
+          AND a.descricao = CONCAT(%s, o.id)
+    """, (prefixo, prefixo))
+
+def _recalcular_saldos_fornecedores(cursor):
+    from saldos_fornecedores import recalcular_todos
+    recalcular_todos(cursor)
+
+ESQUEMA_INICIAL = [
+    """
+    CREATE TABLE IF NOT EXISTS fornecedores (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(150) NOT NULL,
+        fornecedores_endereco VARCHAR(255),
+        fornecedores_numerobalanca VARCHAR(20)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS produtos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(150) NOT NULL,
+        preco_base DECIMAL(10, 2) NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categorias_fornecedor_por_fornecedor (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fornecedor_id INT,
+        nome VARCHAR(100) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ajustes_fixos_produto_fornecedor_categoria (
+        produto_id INT NOT NULL,
+        categoria_id INT NOT NULL,
+        ajuste_fixo DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (produto_id, categoria_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dados_bancarios_fornecedor (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fornecedor_id INT NOT NULL,
+        nome_conta VARCHAR(100),
+        banco VARCHAR(100),
+        CPFouCNPJ VARCHAR(20),
+        agencia VARCHAR(20),
+        conta VARCHAR(30),
+        padrao TINYINT(1) NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS compras (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fornecedor_id INT NOT NULL,
+        data_compra DATE NOT NULL,
+        valor_abatimento DECIMAL(12, 2) DEFAULT 0,
+        total DECIMAL(12, 2),
+        status VARCHAR(30) NOT NULL DEFAULT 'Criada',
+        dados_bancarios_id INT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS itens_compra (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        compra_id INT NOT NULL,
+        produto_id INT NOT NULL,
+        quantidade INT NOT NULL,
+        preco_unitario DECIMAL(10, 2) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS debitos_fornecedores (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fornecedor_id INT NOT NULL,
+        compra_id INT,
+        data_lancamento DATE NOT NULL,
+        descricao VARCHAR(255),
+        valor DECIMAL(12, 2) NOT NULL,
+        tipo VARCHAR(20) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS movimentacoes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        fornecedor_id INT NOT NULL,
+        data DATE NOT NULL,
+        tipo VARCHAR(20) NOT NULL,
+        direcao VARCHAR(20),
+        descricao VARCHAR(255),
+        valor_operacao DECIMAL(12, 2)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS itens_movimentacao (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        movimentacao_id INT NOT NULL,
+        produto_id INT NOT NULL,
+        quantidade INT NOT NULL,
+        preco_unitario DECIMAL(10, 2) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(150) NOT NULL,
+        username VARCHAR(60) NOT NULL UNIQUE,
+        senha_hash VARCHAR(255) NOT NULL,
+        nivel VARCHAR(20) NOT NULL,
+        ativo TINYINT(1) NOT NULL DEFAULT 1
+    )
+    """,
+]
+
+# Índices pensados para os filtros e ordenações das telas
+INDICES_CONSULTAS = [
+    # Lista de compras: período + status, paginada por (data_compra, id); e por fornecedor
+    _criar_indice('compras', 'idx_compras_data_status_fornecedor', 'data_compra, status, fornecedor_id'),
+    _criar_indice('compras', 'idx_compras_fornecedor_data', 'fornecedor_id, data_compra'),
+    # Soma dos itens de cada compra sem ler a tabela (índice cobre as colunas somadas)
+    _criar_indice('itens_compra', 'idx_itens_compra_compra',
+                  'compra_id, produto_id, quantidade, preco_unitario'),
+    # Lançamentos da compra (inclusão/abatimento) e débitos do fornecedor por tipo e período
+    _criar_indice('debitos_fornecedores', 'idx_debitos_compra_tipo', 'compra_id, tipo'),
+    _criar_indice('debitos_fornecedores', 'idx_debitos_fornecedor_tipo', 'fornecedor_id, tipo'),
+    _criar_indice('debitos_fornecedores', 'idx_debitos_fornecedor_data', 'fornecedor_id, data_lancamento'),
+    _criar_indice('debitos_fornecedores', 'idx_debitos_data', 'data_lancamento'),
+    # Extrato e saldo de movimentações, em ordem de (data, id)
+    _criar_indice('movimentacoes', 'idx_movimentacoes_fornecedor_data', 'fornecedor_id, data, id'),
+    _criar_indice('itens_movimentacao', 'idx_itens_movimentacao_movimentacao', 'movimentacao_id'),
+    _criar_indice('fornecedores', 'idx_fornecedores_numerobalanca', 'fornecedores_numerobalanca'),
+    _criar_indice('dados_bancarios_fornecedor', 'idx_dados_bancarios_fornecedor_padrao', 'fornecedor_id, padrao'),
+    _criar_indice('categorias_fornecedor_por_fornecedor', 'idx_categorias_fornecedor_nome', 'fornecedor_id, nome'),
+    _criar_indice('categorias_fornecedor_por_fornecedor', 'idx_categorias_nome', 'nome'),
+]
+
+TABELAS_SALDOS = [
+    """
+    CREATE TABLE IF NOT EXISTS saldos_fornecedores (
+        fornecedor_id INT NOT NULL PRIMARY KEY,
+        saldo DECIMAL(14, 2) NOT NULL DEFAULT 0
+    )
+    """,
+    _recalcular_saldos_fornecedores,
+    """
+    CREATE TABLE IF NOT EXISTS saldos_movimentacoes_mensais (
+        fornecedor_id INT NOT NULL,
+        mes DATE NOT NULL,
+        saldo DECIMAL(14, 2) NOT NULL,
+        PRIMARY KEY (fornecedor_id, mes)
+    )
+    """,
+]
+
+ABATIMENTO_VINCULADO = [
+    _adicionar_coluna('movimentacoes', 'movimentacao_origem_id', 'INT NULL'),
+    _vincular_abatimentos_existentes,
+    _criar_indice('movimentacoes', 'idx_movimentacoes_origem', 'movimentacao_origem_id'),
+    # SET NULL: excluir a movimentação mantém o abatimento, como antes do vínculo
+    _adicionar_chave_estrangeira('movimentacoes', 'fk_movimentacoes_origem', """
+        FOREIGN KEY (movimentacao_origem_id) REFERENCES movimentacoes (id) ON DELETE SET NULL
+    """),
+]
+
+MIGRACOES = [
+    (1, "Esquema inicial", ESQUEMA_INICIAL),
+    (2, "Índices para os filtros das telas", INDICES_CONSULTAS),
+    (3, "Saldos de fornecedores e fechamentos mensais de movimentações", TABELAS_SALDOS),
+    (4, "Abatimento automático ligado à movimentação de origem", ABATIMENTO_VINCULADO),
+]
+
+def _criar_controle(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INT NOT NULL PRIMARY KEY,
+            descricao VARCHAR(200) NOT NULL,
+            aplicada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _nome_trava(cursor):
+    """Nome da trava deste banco; o MD5 mantém o nome dentro dos 64 caracteres do GET_LOCK."""
+    cursor.execute("SELECT CONCAT(%s, ':', MD5(DATABASE())) AS nome", (NOME_TRAVA,))
+    return cursor.fetchone()['nome']
+
+def _versoes_aplicadas(cursor):
+    cursor.execute("SELECT versao FROM schema_migracoes")
+    return {row['versao'] for row in cursor.fetchall()}
+
+def versoes_aplicadas():
+    """Só lê: num banco sem schema_migracoes, nenhuma versão foi aplicada."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT COUNT(*) AS n FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'schema_migracoes'
+            """)
+            if cursor.fetchone()['n'] == 0:
+                return set()
+            return _versoes_aplicadas(cursor)
+        finally:
+            cursor.close()
+
+def pendentes():
+    aplicadas = versoes_aplicadas()
+    return [(versao, descricao) for versao, descricao, _ in MIGRACOES if versao not in aplicadas]
+
+def aplicar_pendentes(ao_registrar=None):
+    """Aplica em ordem as migrações que faltam e devolve os números aplicados.
+
+    DDL faz commit implícito no MySQL, então cada migração roda numa conexão própria,
+    fora de transacao(). Uma trava nomeada impede duas estações de migrarem o mesmo
+    banco juntas; outros bancos no mesmo servidor não esperam por ela.
+    """
+    registrar = ao_registrar or (lambda mensagem: None)
+    aplicadas_agora = []
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            trava = _nome_trava(cursor)
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS ok", (trava, ESPERA_TRAVA))
+            if not cursor.fetchone()['ok']:
+                raise RuntimeError("Outra estação está atualizando o banco; tente de novo em instantes.")
+            try:
+                _criar_controle(cursor)
+                aplicadas = _versoes_aplicadas(cursor)
+                for versao, descricao, passos in MIGRACOES:
+                    if versao in aplicadas:
+                        continue
+                    registrar(f"Aplicando migração {versao}: {descricao}")
+                    for passo in passos:
+                        if callable(passo):
+                            passo(cursor)
+                        else:
+                            cursor.execute(passo)
+                    cursor.execute(
+                        "INSERT INTO schema_migracoes (versao, descricao) VALUES (%s, %s)", (versao, descricao)
+                    )
+                    conn.commit()
+                    aplicadas_agora.append(versao)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (trava,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+    if not aplicadas_agora:
+        registrar("Banco já está na versão mais recente.")
+    return aplicadas_agora
+
+# ---- Planos de execução ----
+
+def _consultas_quentes():
+    hoje = date.today()
+    inicio = hoje - timedelta(days=30)
+    return [
+        ("Compras do período (primeira página)", """
+            SELECT c.id, c.data_compra FROM compras c JOIN fornecedores f ON c.fornecedor_id = f.id
+            WHERE c.status != %s AND c.data_compra >= %s AND c.data_compra <= %s
+            ORDER BY c.data_compra DESC, c.id DESC LIMIT 50
+        """, ('Concluída', inicio, hoje)),
+        ("Compras de um fornecedor", """
+            SELECT c.id FROM compras c WHERE c.fornecedor_id = %s AND c.data_compra >= %s
+        """, (1, inicio)),
+        ("Total dos itens de uma compra", """
+            SELECT SUM(quantidade * preco_unitario) FROM itens_compra WHERE compra_id = %s
+        """, (1,)),
+        ("Inclusão lançada numa compra", """
+            SELECT COALESCE(SUM(valor), 0) FROM debitos_fornecedores WHERE compra_id = %s AND tipo = 'inclusao'
+        """, (1,)),
+        ("Débitos de um fornecedor no período", """
+            SELECT d.data_lancamento, d.valor FROM debitos_fornecedores d
+            WHERE d.fornecedor_id = %s AND d.data_lancamento BETWEEN %s AND %s
+        """, (1, inicio, hoje)),
+        ("Extrato de movimentações", """
+            SELECT m.id, m.data FROM movimentacoes m
+            WHERE m.fornecedor_id = %s AND m.data >= %s AND m.data <= %s ORDER BY m.data, m.id
+        """, (1, inicio, hoje)),
+        ("Abatimento de uma movimentação", """
+            SELECT id FROM movimentacoes WHERE movimentacao_origem_id = %s LIMIT 1
+        """, (1,)),
+        ("Fornecedor pelo número da balança", """
+            SELECT id FROM fornecedores WHERE fornecedores_numerobalanca = %s
+        """, ('1',)),
+        ("Conta bancária padrão", """
+            SELECT nome_conta FROM dados_bancarios_fornecedor WHERE fornecedor_id = %s AND padrao = 1 LIMIT 1
+        """, (1,)),
+    ]
+
+def explicar_consultas():
+    """Texto com o EXPLAIN de cada consulta quente: tabela, tipo de acesso, índice e linhas estimadas."""
+    linhas = []
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for titulo, sql, params in _consultas_quentes():
+                linhas.append(titulo)
+                try:
+                    cursor.execute("EXPLAIN " + sql, params)
+                    for plano in cursor.fetchall():
+                        linhas.append(
+                            f"    {plano.get('table')}: acesso={plano.get('type')} "
+                            f"índice={plano.get('key') or '-'} linhas≈{plano.get('rows')} "
+                            f"{plano.get('Extra') or ''}".rstrip()
+                        )
+                except Exception as e:
+                    linhas.append(f"    (não foi possível analisar: {e})")
+        finally:
+            cursor.close()
+    return "\n".join(linhas)
+
+def migrar_com_relatorio():
+    """Aplica as pendentes e devolve o relatório com os planos antes e depois."""
+    mensagens = ["== Planos antes ==", explicar_consultas(), ""]
+    aplicar_pendentes(mensagens.append)
+    mensagens += ["", "== Planos depois ==", explicar_consultas()]
+    return "\n".join(mensagens)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--status" in argv:
+        aplicadas = versoes_aplicadas()
+        for versao, descricao, _ in MIGRACOES:
+            print(f"{versao:>3}  {'aplicada' if versao in aplicadas else 'pendente':<9} {descricao}")
+    elif "--explain" in argv:
+        print(explicar_consultas())
+    else:
+        print(migrar_com_relatorio())
+
+if __name__ == '__main__':
+    main()
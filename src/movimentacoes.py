@@ -9,13 +9,11 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QDate, QLocale
 from decimal import Decimal, InvalidOperation
 from db_context import get_cursor
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib.colors import Color
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PIL import Image, ImageDraw, ImageFont
+import saldos_movimentacoes
+from itens_db import inserir_itens, sincronizar_itens
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, TabelaView, Coluna, decimal
+import cache_referencia
 from datetime import datetime
 
 def decimal_para_str_brasil(valor, locale=None):
@@ -72,6 +70,8 @@ class DialogFiltroData(QDialog):
     def get_datas(self):
         return self.input_data_de.date(), self.input_data_ate.date()
 
+TAMANHO_LOTE_IDS = 500  # ids por consulta IN (...)
+
 def remove_acento(txt):
     if not txt:
         return ""
@@ -80,6 +80,106 @@ def remove_acento(txt):
         if not unicodedata.combining(c)
     ).lower().strip()
 
+def inserir_abatimento(cursor, fornecedor_id, data, movimentacao_id, valor_abatimento):
+    """Grava a entrada de abatimento ligada à movimentação de origem por movimentacao_origem_id."""
+    cursor.execute(
+        "INSERT INTO movimentacoes (fornecedor_id, data, tipo, direcao, descricao, valor_operacao, movimentacao_origem_id) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        (
+            fornecedor_id,
+            data,
+            "transação",
+            "entrada",
+            f"Abatimento automático referente à movimentação {movimentacao_id}",
+            valor_abatimento,
+            movimentacao_id
+        )
+    )
+
+# Leituras e gravações das ações do formulário: rodam fora da thread da interface
+def carregar_movimentacao(movimentacao_id):
+    """(movimentação, itens, abatimento) para preencher o formulário de edição."""
+    with get_cursor() as cursor:
+        cursor.execute("""
+                       SELECT fornecedor_id, data, tipo, direcao, descricao, valor_operacao
+                       FROM movimentacoes
+                       WHERE id = %s
+                       """, (movimentacao_id,))
+        movimentacao = cursor.fetchone()
+
+        cursor.execute("""
+                       SELECT p.nome                            AS produto_nome,
+                              i.produto_id,
+                              i.quantidade,
+                              i.preco_unitario,
+                              (i.quantidade * i.preco_unitario) AS total
+                       FROM itens_movimentacao i
+                                JOIN produtos p ON i.produto_id = p.id
+                       WHERE i.movimentacao_id = %s
+                       """, (movimentacao_id,))
+        itens = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT valor_operacao FROM movimentacoes WHERE movimentacao_origem_id = %s LIMIT 1",
+            (movimentacao_id,)
+        )
+        abat = cursor.fetchone()
+    return movimentacao, itens, abat
+
+def incluir_movimentacao(fornecedor_id, data, tipo, direcao, descricao, valor_operacao, itens, valor_abatimento):
+    with get_cursor(commit=True) as cursor:
+        saldos_movimentacoes.invalidar(cursor, fornecedor_id, data)
+        cursor.execute(
+            "INSERT INTO movimentacoes (fornecedor_id, data, tipo, direcao, descricao, valor_operacao) VALUES (%s, %s, %s, %s, %s, %s)",
+            (fornecedor_id, data, tipo, direcao, descricao, valor_operacao)
+        )
+        movimentacao_id = cursor.lastrowid
+        if tipo != "transação":
+            inserir_itens(cursor, 'itens_movimentacao', 'movimentacao_id', movimentacao_id, itens)
+            if valor_abatimento and valor_abatimento > 0:
+                inserir_abatimento(cursor, fornecedor_id, data, movimentacao_id, valor_abatimento)
+    return movimentacao_id
+
+def editar_movimentacao(fornecedor_id, movimentacao_id, data, tipo, direcao, descricao, valor_operacao, itens,
+                        valor_abatimento):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("SELECT data FROM movimentacoes WHERE id = %s", (movimentacao_id,))
+        anterior = cursor.fetchone()
+        saldos_movimentacoes.invalidar(cursor, fornecedor_id, data)
+        if anterior:
+            saldos_movimentacoes.invalidar(cursor, fornecedor_id, anterior['data'])
+        # UPDATE para o registro principal
+        cursor.execute(
+            "UPDATE movimentacoes SET data=%s, tipo=%s, direcao=%s, descricao=%s, valor_operacao=%s WHERE id=%s",
+            (data, tipo, direcao, descricao, valor_operacao, movimentacao_id)
+        )
+        # Para compra/venda, grava só os itens que mudaram; transação não tem itens
+        sincronizar_itens(cursor, 'itens_movimentacao', 'movimentacao_id', movimentacao_id, itens)
+        # Atualiza/insere/limpa abatimento, se houver
+        cursor.execute(
+            "SELECT id FROM movimentacoes WHERE movimentacao_origem_id = %s LIMIT 1", (movimentacao_id,)
+        )
+        abat = cursor.fetchone()
+        if tipo != "transação" and valor_abatimento and valor_abatimento > 0:
+            if abat:
+                cursor.execute(
+                    "UPDATE movimentacoes SET data=%s, valor_operacao=%s WHERE id=%s",
+                    (data, valor_abatimento, abat['id'])
+                )
+            else:
+                inserir_abatimento(cursor, fornecedor_id, data, movimentacao_id, valor_abatimento)
+        elif abat:
+            cursor.execute("DELETE FROM movimentacoes WHERE id=%s", (abat['id'],))
+
+def excluir_movimentacao(fornecedor_id, movimentacao_id):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("SELECT data FROM movimentacoes WHERE id = %s", (movimentacao_id,))
+        mov = cursor.fetchone()
+        if mov:
+            saldos_movimentacoes.invalidar(cursor, fornecedor_id, mov['data'])
+        cursor.execute("DELETE FROM itens_movimentacao WHERE movimentacao_id = %s", (movimentacao_id,))
+        cursor.execute("DELETE FROM movimentacoes WHERE id = %s", (movimentacao_id,))
+
 class MovimentacaoTabUI(QWidget):
     STATUS_LIST = [
         "Compra", "Venda", "Transação"
@@ -94,26 +194,21 @@ class MovimentacaoTabUI(QWidget):
         self.fornecedor = fornecedor
         self.itens_movimentacao = []
         self.movimentacao_edit_id = None
+        self.produtos = []
+        self.banco = ExecutorBanco(self)
         self.init_ui()
         self.carregar_produtos()
         self.atualizar_tabela()
 
     def obter_categoria_principal(self):
-        with get_cursor() as cursor:
-            cursor.execute(
-                "SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE fornecedor_id = %s ORDER BY id ASC LIMIT 1",
-                (self.fornecedor['id'],)
-            )
-            cat = cursor.fetchone()
-            if not cat:
-                cursor.execute("SELECT id, nome FROM categorias_fornecedor_por_fornecedor WHERE nome = %s LIMIT 1", ('Padrão',))
-                cat = cursor.fetchone()
-            return cat
+        # A principal é a primeira cadastrada para o fornecedor; sem nenhuma, vale a "Padrão"
+        categorias = cache_referencia.obter_categorias_do_fornecedor(self.fornecedor['id'])
+        if categorias:
+            return min(categorias, key=lambda c: c['id'])
+        return cache_referencia.obter_categoria_padrao()
 
     def listar_produtos(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome, preco_base FROM produtos ORDER BY nome")
-            return cursor.fetchall()
+        return cache_referencia.listar_produtos()
 
     def listar_movimentacoes(self, data_de=None, data_ate=None):
         query = """
@@ -144,29 +239,33 @@ class MovimentacaoTabUI(QWidget):
             """, (movimentacao_id,))
             return cursor.fetchall()
 
-    def obter_saldo_total(self):
-        saldo = Decimal("0.00")
+    def listar_itens_das_movimentacoes(self, movimentacao_ids):
+        """Itens de várias movimentações em poucas consultas, agrupados por movimentação."""
+        itens_por_mov = {mid: [] for mid in movimentacao_ids}
+        ids = list(itens_por_mov)
         with get_cursor() as cursor:
-            cursor.execute("""
-                           SELECT tipo, direcao, valor_operacao
-                           FROM movimentacoes
-                           WHERE fornecedor_id = %s
-                           """, (self.fornecedor['id'],))
-            movimentacoes = cursor.fetchall()
-            for mov in movimentacoes:
-                tipo = remove_acento(mov['tipo'] or '')
-                direcao = remove_acento(mov['direcao'] or '')
-                valor_op = Decimal(mov['valor_operacao']) if mov['valor_operacao'] is not None else Decimal('0.00')
-                if tipo == "compra":
-                    saldo += valor_op
-                elif tipo == "venda":
-                    saldo -= valor_op
-                elif tipo == "transacao":
-                    if direcao == "entrada":
-                        saldo += valor_op
-                    elif direcao == "saida":
-                        saldo -= valor_op
-        return saldo
+            for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+                lote = ids[inicio:inicio + TAMANHO_LOTE_IDS]
+                marcadores = ", ".join(["%s"] * len(lote))
+                cursor.execute(f"""
+                    SELECT i.movimentacao_id,
+                           p.nome                            AS produto_nome,
+                           i.quantidade,
+                           i.preco_unitario,
+                           (i.quantidade * i.preco_unitario) AS total
+                    FROM itens_movimentacao i
+                             JOIN produtos p ON i.produto_id = p.id
+                    WHERE i.movimentacao_id IN ({marcadores})
+                    ORDER BY i.movimentacao_id, i.id
+                """, lote)
+                for item in cursor.fetchall():
+                    itens_por_mov[item['movimentacao_id']].append(item)
+        return itens_por_mov
+
+    def obter_saldo_total(self):
+        # Roda em segundo plano: fecha os meses que faltam antes de ler
+        saldos_movimentacoes.atualizar_fechamentos(self.fornecedor['id'])
+        return saldos_movimentacoes.obter_saldo_ate(self.fornecedor['id'])
 
     def qdate_to_pydate(qdate):
         if hasattr(qdate, 'toPython'):
@@ -178,35 +277,15 @@ class MovimentacaoTabUI(QWidget):
             return datetime(qdate.year(), qdate.month(), qdate.day()).date()
 
     def editar_movimentacao_finalizada(self):
-        linha = self.tabela_movimentacoes.currentRow()
-        if linha < 0:
+        selecionada = self.tabela_movimentacoes.linha_atual()
+        if selecionada is None:
             QMessageBox.information(self, "Editar Movimentação", "Selecione uma movimentação para editar.")
             return
-        movimentacao_id_item = self.tabela_movimentacoes.item(linha, 0)
-        if movimentacao_id_item is None:
-            return
-        movimentacao_id = int(movimentacao_id_item.text())
-
-        with get_cursor() as cursor:
-            cursor.execute("""
-                           SELECT fornecedor_id, data, tipo, direcao, descricao, valor_operacao
-                           FROM movimentacoes
-                           WHERE id = %s
-                           """, (movimentacao_id,))
-            movimentacao = cursor.fetchone()
-
-            cursor.execute("""
-                           SELECT p.nome                            AS produto_nome,
-                                  i.produto_id,
-                                  i.quantidade,
-                                  i.preco_unitario,
-                                  (i.quantidade * i.preco_unitario) AS total
-                           FROM itens_movimentacao i
-                                    JOIN produtos p ON i.produto_id = p.id
-                           WHERE i.movimentacao_id = %s
-                           """, (movimentacao_id,))
-            itens = cursor.fetchall()
+        movimentacao_id = selecionada["id"]
+        self.banco.gravar(self, carregar_movimentacao, movimentacao_id,
+                          ao_concluir=lambda dados: self.preencher_edicao(movimentacao_id, *dados))
 
+    def preencher_edicao(self, movimentacao_id, movimentacao, itens, abat):
         if movimentacao is None:
             QMessageBox.warning(self, "Erro", "Movimentação não encontrada.")
             return
@@ -258,16 +337,7 @@ class MovimentacaoTabUI(QWidget):
                     "total": item['total']
                 })
             self.atualizar_tabela_itens_adicionados()
-            # Abatimento: tente encontrar se há uma transação de entrada de abatimento para esta movimentação
-            with get_cursor() as cursor:
-                cursor.execute("""
-                               SELECT valor_operacao
-                               FROM movimentacoes
-                               WHERE tipo = 'transação'
-                                 AND direcao = 'entrada'
-                                 AND descricao LIKE %s
-                               """, (f"Abatimento automático referente à movimentação {movimentacao_id}",))
-                abat = cursor.fetchone()
+            # Abatimento: a transação de entrada ligada a esta movimentação, se houver
             if abat:
                 self.input_valor_abatimento.setText(str(abat['valor_operacao']))
             else:
@@ -279,16 +349,12 @@ class MovimentacaoTabUI(QWidget):
         self.movimentacao_edit_id = movimentacao_id
 
     def excluir_movimentacao_finalizada(self):
-        linha = self.tabela_movimentacoes.currentRow()
-        if linha < 0:
+        selecionada = self.tabela_movimentacoes.linha_atual()
+        if selecionada is None:
             QMessageBox.information(self, "Excluir Movimentação", "Selecione uma movimentação para excluir.")
             return
 
-        movimentacao_id_item = self.tabela_movimentacoes.item(linha, 0)
-        if movimentacao_id_item is None:
-            return
-
-        movimentacao_id = int(movimentacao_id_item.text())
+        movimentacao_id = selecionada["id"]
 
         confirm = QMessageBox.question(
             self,
@@ -300,15 +366,14 @@ class MovimentacaoTabUI(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        try:
-            with get_cursor(commit=True) as cursor:
-                cursor.execute("DELETE FROM itens_movimentacao WHERE movimentacao_id = %s", (movimentacao_id,))
-                cursor.execute("DELETE FROM movimentacoes WHERE id = %s", (movimentacao_id,))
-            QMessageBox.information(self, "Sucesso", "Movimentação excluída com sucesso.")
-            self.atualizar_tabela()
-            self.tabela_itens.setRowCount(0)
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao excluir movimentação: {e}")
+        self.banco.gravar(self, excluir_movimentacao, self.fornecedor['id'], movimentacao_id,
+                          ao_concluir=self.movimentacao_excluida,
+                          ao_falhar=lambda e: QMessageBox.critical(self, "Erro", f"Erro ao excluir movimentação: {e}"))
+
+    def movimentacao_excluida(self, _=None):
+        QMessageBox.information(self, "Sucesso", "Movimentação excluída com sucesso.")
+        self.atualizar_tabela()
+        self.tabela_itens.setRowCount(0)
 
     def acao_cancelar(self):
         self.limpar_campos()
@@ -356,6 +421,8 @@ class MovimentacaoTabUI(QWidget):
             QMessageBox.warning(self, "Erro", f"Valor inválido: {e}")
 
     def exportar_movimentacoes_pdf(self):
+        # reportlab e PIL só são carregados na primeira exportação
+        from extrato_pdf import ExtratoPDF
         dialog = DialogFiltroData(self.filtro_data_de.date(), self.filtro_data_ate.date(), self)
         if not dialog.exec():
             return
@@ -365,201 +432,37 @@ class MovimentacaoTabUI(QWidget):
 
         fornecedor_id = self.fornecedor['id']
 
-        with get_cursor() as cursor:
-            cursor.execute("""
-                           SELECT m.id,
-                                  m.data,
-                                  f.nome as fornecedor,
-                                  f.fornecedores_numerobalanca,
-                                  m.tipo,
-                                  m.direcao,
-                                  m.descricao,
-                                  m.valor_operacao
-                           FROM movimentacoes m
-                                    JOIN fornecedores f ON m.fornecedor_id = f.id
-                           WHERE m.fornecedor_id = %s
-                             AND m.data >= %s
-                             AND m.data <= %s
-                           ORDER BY m.data, m.id
-                           """, (fornecedor_id, data_de, data_ate))
-            movimentacoes = cursor.fetchall()
-
-        if not movimentacoes:
-            QMessageBox.warning(self, "Exportar PDF", "Nenhuma movimentação encontrada no período selecionado.")
-            return
-
-        # Função para saldo acumulado
-        def obter_saldos_acumulados(fornecedor_id, data_de, data_ate):
-            with get_cursor() as cursor:
-                cursor.execute("""
-                               SELECT m.id, m.data, m.tipo, m.direcao, m.valor_operacao
-                               FROM movimentacoes m
-                               WHERE m.fornecedor_id = %s
-                               ORDER BY m.data, m.id
-                               """, (fornecedor_id,))
-                todas_movs = cursor.fetchall()
-
-            saldo = Decimal("0.00")
-            saldo_por_id = {}
-            for mov in todas_movs:
-                tipo = remove_acento(mov['tipo'] or '')
-                direcao = remove_acento(mov['direcao'] or '')
-                valor_op = Decimal(mov['valor_operacao']) if mov['valor_operacao'] is not None else Decimal('0.00')
-                if tipo == "compra":
-                    saldo += valor_op
-                elif tipo == "venda":
-                    saldo -= valor_op
-                elif tipo == "transacao":
-                    if direcao == "entrada":
-                        saldo += valor_op
-                    elif direcao == "saida":
-                        saldo -= valor_op
-                saldo_por_id[mov['id']] = saldo
-
-            with get_cursor() as cursor:
-                cursor.execute("""
-                               SELECT m.id
-                               FROM movimentacoes m
-                               WHERE m.fornecedor_id = %s
-                                 AND m.data >= %s
-                                 AND m.data <= %s
-                               ORDER BY m.data, m.id
-                               """, (fornecedor_id, data_de, data_ate))
-                exportadas = [row['id'] for row in cursor.fetchall()]
-            return {mid: saldo_por_id[mid] for mid in exportadas}
-
-        saldo_por_id = obter_saldos_acumulados(fornecedor_id, data_de, data_ate)
-
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import mm
-        from reportlab.lib.colors import Color
-
-        largura, _ = A4
-        margem = 20 * mm
-        espacamento_blocos = 10 * mm
-
-        altura_total = margem
-        blocos = []
-        for mov in movimentacoes:
-            bloco = {}
-            bloco['mov'] = mov
-            with get_cursor() as cursor:
-                itens = []
-                if mov['tipo'].lower() in ("compra", "venda"):
-                    cursor.execute("""
-                                   SELECT p.nome                            AS produto_nome,
-                                          i.quantidade,
-                                          i.preco_unitario,
-                                          (i.quantidade * i.preco_unitario) AS total
-                                   FROM itens_movimentacao i
-                                            JOIN produtos p ON i.produto_id = p.id
-                                   WHERE i.movimentacao_id = %s
-                                   """, (mov['id'],))
-                    itens = cursor.fetchall()
-            bloco['itens'] = itens
-            bloco['altura'] = 110 + 15 * (len(itens) if itens else 1) + 60
-            altura_total += bloco['altura'] + espacamento_blocos
-            blocos.append(bloco)
-
+        saldo_inicial = saldos_movimentacoes.obter_saldo_ate(fornecedor_id, data_de)
+        numero_balanca = self.fornecedor['fornecedores_numerobalanca']
         filename = f"movimentacoes_{data_de.strftime('%Y%m%d')}_{data_ate.strftime('%Y%m%d')}_extrato.pdf"
-        c = canvas.Canvas(filename, pagesize=(largura, altura_total))
-        y = altura_total - margem
-
-        for bloco in blocos:
-            mov = bloco['mov']
-            itens = bloco['itens']
-            tipo = mov['tipo'].capitalize()
-            direcao = (mov.get('direcao') or "").capitalize()
-            descricao = mov['descricao'] or ""
-            valor_operacao = float(mov['valor_operacao'] or 0)
-            saldo_atual = saldo_por_id.get(mov['id'], 0)
-
-            c.setFont("Helvetica-Bold", 13)
-            c.setFillColorRGB(0, 0, 0)
-            c.drawString(margem, y, f"Movimentação ID: {mov['id']} | Tipo: {tipo}")
-            y -= 16
-            c.setFont("Helvetica", 11)
-            c.drawString(margem, y, f"Fornecedor: {mov['fornecedor']}")
-            y -= 13
-            c.drawString(margem, y, f"Nº Balança: {mov['fornecedores_numerobalanca']}")
-            y -= 13
-            c.drawString(margem, y, f"Data: {mov['data'].strftime('%d/%m/%Y')}")
-            y -= 13
-            if direcao:
-                c.drawString(margem, y, f"Direção: {direcao}")
-                y -= 13
-            if descricao:
-                c.drawString(margem, y, f"Descrição: {descricao}")
-                y -= 13
-
-            # Marca d'água para o bloco
-            self.adicionar_marca_dagua_pdf_area(
+        extrato = ExtratoPDF(
+            filename, self.fornecedor['nome'], numero_balanca, data_de, data_ate,
+            saldo_inicial,
+            marca_dagua=lambda c, x_inicio, x_fim, y_topo, altura: self.adicionar_marca_dagua_pdf_area(
                 c,
-                texto=str(mov['fornecedores_numerobalanca']),
-                x_inicio=margem,
-                x_fim=largura - margem,
-                y_topo=y + 73,  # topo do bloco (ajustar se desejar)
-                altura=bloco['altura'] - 18,
-                tamanho_fonte=24,  # menor
+                texto=str(numero_balanca),
+                x_inicio=x_inicio,
+                x_fim=x_fim,
+                y_topo=y_topo,
+                altura=altura,
+                tamanho_fonte=24,
                 cor=(0.8, 0.8, 0.8),
                 angulo=25
             )
-
-            if itens:
-                y -= 8
-                c.setFont("Helvetica-Bold", 11)
-                c.setFillColorRGB(0, 0, 0)
-                c.drawString(margem, y, "Produtos")
-                y -= 12
-                c.setFont("Helvetica-Bold", 10)
-                c.drawString(margem, y, "Produto")
-                c.drawString(margem + 180, y, "Qtd")
-                c.drawString(margem + 240, y, "Unitário")
-                c.drawString(margem + 330, y, "Total")
-                y -= 8
-                c.line(margem, y, largura - margem, y)
-                y -= 8
-                c.setFont("Helvetica", 10)
-                total = 0
-                for item in itens:
-                    c.drawString(margem, y, item['produto_nome'])
-                    c.drawString(margem + 180, y, str(item['quantidade']))
-                    c.drawString(margem + 240, y, f"R$ {item['preco_unitario']:.2f}")
-                    c.drawString(margem + 330, y, f"R$ {item['total']:.2f}")
-                    total += float(item['total'])
-                    y -= 13
-                y -= 8
-                c.line(margem, y, largura - margem, y)
-                y -= 10
-                c.setFont("Helvetica-Bold", 11)
-                c.setFillColorRGB(0, 0, 0)
-                c.drawString(margem, y, f"Subtotal: R$ {total:.2f}")
-                y -= 12
-                c.drawString(margem, y, f"Total Final (com abatimento): R$ {valor_operacao:.2f}")
-                y -= 13
-            else:
-                y -= 13
-                c.setFont("Helvetica-Bold", 11)
-                c.setFillColorRGB(0, 0, 0)
-                c.drawString(margem, y, f"Valor da Operação: R$ {valor_operacao:.2f}")
-                y -= 13
-
-            # SALDO TOTAL APÓS ESTA MOVIMENTAÇÃO (cor e fonte menor)
-            c.setFont("Helvetica-Bold", 10)
-            if saldo_atual < 0:
-                c.setFillColorRGB(1, 0, 0)  # vermelho
-            else:
-                c.setFillColorRGB(0, 0.39, 0)  # verde escuro (aprox. #006400)
-            c.drawString(margem, y, f"SALDO TOTAL APÓS ESTA MOVIMENTAÇÃO: R$ {float(saldo_atual):,.2f}")
-            c.setFillColorRGB(0, 0, 0)
-            y -= 14
-
-            c.setFont("Helvetica-Oblique", 8)
-            c.drawString(margem, y, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-            y -= espacamento_blocos
-
-        c.save()
+        )
+        # Movimentações lidas do servidor por lote; os itens de cada lote são buscados,
+        # desenhados e descartados antes do próximo
+        desenhadas = extrato.adicionar_lotes(
+            saldos_movimentacoes.listar_extrato(fornecedor_id, data_de, data_ate, saldo_inicial),
+            lambda lote: self.listar_itens_das_movimentacoes(
+                [mov['id'] for mov in lote if mov['tipo'].lower() in ("compra", "venda")]
+            )
+        )
+        if not desenhadas:
+            # O canvas só cria o arquivo em salvar()
+            QMessageBox.warning(self, "Exportar PDF", "Nenhuma movimentação encontrada no período selecionado.")
+            return
+        extrato.salvar()
         QMessageBox.information(self, "Exportar PDF", f"PDF gerado com sucesso:\n{filename}")
 
         if platform.system() == "Windows":
@@ -571,11 +474,10 @@ class MovimentacaoTabUI(QWidget):
 
     def adicionar_marca_dagua_pdf_area(self, c, texto, x_inicio, x_fim, y_topo, altura, tamanho_fonte=30,
                                        cor=(0.8, 0.8, 0.8), angulo=25):
-        try:
-            pdfmetrics.registerFont(TTFont('Arial', 'arial.ttf'))
-            fonte_nome = 'Arial'
-        except:
-            fonte_nome = 'Helvetica'
+        from reportlab.lib.colors import Color
+        from reportlab.pdfbase import pdfmetrics
+        from marca_dagua import fonte_pdf
+        fonte_nome = fonte_pdf()
         c.saveState()
         c.setFont(fonte_nome, tamanho_fonte)
         c.setFillColor(Color(*cor))
@@ -598,6 +500,8 @@ class MovimentacaoTabUI(QWidget):
         c.restoreState()
 
     def exportar_movimentacoes_jpg(self):
+        from PIL import Image, ImageDraw, ImageFont
+        from marca_dagua import carimbar
         dialog = DialogFiltroData(self.filtro_data_de.date(), self.filtro_data_ate.date(), self)
         if not dialog.exec():
             return
@@ -609,71 +513,17 @@ class MovimentacaoTabUI(QWidget):
         fornecedor_id = self.fornecedor['id']
 
         # Busca as movimentações a exportar
-        with get_cursor() as cursor:
-            cursor.execute("""
-                           SELECT m.id,
-                                  m.data,
-                                  f.nome as fornecedor,
-                                  f.fornecedores_numerobalanca,
-                                  m.tipo,
-                                  m.direcao,
-                                  m.descricao,
-                                  m.valor_operacao
-                           FROM movimentacoes m
-                                    JOIN fornecedores f ON m.fornecedor_id = f.id
-                           WHERE m.fornecedor_id = %s
-                             AND m.data >= %s
-                             AND m.data <= %s
-                           ORDER BY m.data, m.id
-                           """, (fornecedor_id, data_de, data_ate))
-            movimentacoes = cursor.fetchall()
+        # A imagem precisa da altura total antes de desenhar, então aqui as movimentações ficam todas em memória
+        saldo_inicial = saldos_movimentacoes.obter_saldo_ate(fornecedor_id, data_de)
+        movimentacoes = [
+            mov for lote in saldos_movimentacoes.listar_extrato(fornecedor_id, data_de, data_ate, saldo_inicial)
+            for mov in lote
+        ]
 
         if not movimentacoes:
             QMessageBox.warning(self, "Exportar JPG", "Nenhuma movimentação encontrada no período selecionado.")
             return
 
-        # Função para saldo acumulado
-        def obter_saldos_acumulados(fornecedor_id, data_de, data_ate):
-            with get_cursor() as cursor:
-                cursor.execute("""
-                               SELECT m.id, m.data, m.tipo, m.direcao, m.valor_operacao
-                               FROM movimentacoes m
-                               WHERE m.fornecedor_id = %s
-                               ORDER BY m.data, m.id
-                               """, (fornecedor_id,))
-                todas_movs = cursor.fetchall()
-
-            saldo = Decimal("0.00")
-            saldo_por_id = {}
-            for mov in todas_movs:
-                tipo = remove_acento(mov['tipo'] or '')
-                direcao = remove_acento(mov['direcao'] or '')
-                valor_op = Decimal(mov['valor_operacao']) if mov['valor_operacao'] is not None else Decimal('0.00')
-                if tipo == "compra":
-                    saldo += valor_op
-                elif tipo == "venda":
-                    saldo -= valor_op
-                elif tipo == "transacao":
-                    if direcao == "entrada":
-                        saldo += valor_op
-                    elif direcao == "saida":
-                        saldo -= valor_op
-                saldo_por_id[mov['id']] = saldo
-
-            with get_cursor() as cursor:
-                cursor.execute("""
-                               SELECT m.id
-                               FROM movimentacoes m
-                               WHERE m.fornecedor_id = %s
-                                 AND m.data >= %s
-                                 AND m.data <= %s
-                               ORDER BY m.data, m.id
-                               """, (fornecedor_id, data_de, data_ate))
-                exportadas = [row['id'] for row in cursor.fetchall()]
-            return {mid: saldo_por_id[mid] for mid in exportadas}
-
-        saldo_por_id = obter_saldos_acumulados(fornecedor_id, data_de, data_ate)
-
         # Layout de imagem
         largura = 1200
         margem = 30
@@ -689,22 +539,13 @@ class MovimentacaoTabUI(QWidget):
 
         altura_total = margem
         blocos = []
+        itens_por_mov = self.listar_itens_das_movimentacoes(
+            [mov['id'] for mov in movimentacoes if mov['tipo'].lower() in ("compra", "venda")]
+        )
         for mov in movimentacoes:
             bloco = {}
             bloco['mov'] = mov
-            with get_cursor() as cursor:
-                itens = []
-                if mov['tipo'].lower() in ("compra", "venda"):
-                    cursor.execute("""
-                                   SELECT p.nome                            AS produto_nome,
-                                          i.quantidade,
-                                          i.preco_unitario,
-                                          (i.quantidade * i.preco_unitario) AS total
-                                   FROM itens_movimentacao i
-                                            JOIN produtos p ON i.produto_id = p.id
-                                   WHERE i.movimentacao_id = %s
-                                   """, (mov['id'],))
-                    itens = cursor.fetchall()
+            itens = itens_por_mov.get(mov['id'], [])
             bloco['itens'] = itens
             bloco['altura'] = 180 + 35 * (len(itens) if itens else 1) + 80  # Mais espaço por conta do saldo
             altura_total += bloco['altura'] + 25
@@ -722,7 +563,7 @@ class MovimentacaoTabUI(QWidget):
             direcao = (mov.get('direcao') or "").capitalize()
             descricao = mov['descricao'] or ""
             valor_operacao = float(mov['valor_operacao'] or 0)
-            saldo_atual = saldo_por_id.get(mov['id'], 0)
+            saldo_atual = mov['saldo']
             y = y_base
 
             draw.text((margem, y), f"Movimentação ID: {mov['id']} | Tipo: {tipo}", fill="black", font=fonte_bold)
@@ -795,9 +636,10 @@ class MovimentacaoTabUI(QWidget):
 
             y_base += bloco['altura'] + 25
 
-        # Aplica as marcas d'água reatribuindo imagem
+        # Aplica as marcas d'água numa única cópia RGBA da imagem
+        imagem = imagem.convert("RGBA")
         for md in marca_dagua_blocos:
-            imagem = self.adicionar_marca_dagua_area(
+            carimbar(
                 imagem,
                 texto=md["texto"],
                 x_inicio=md["x_inicio"],
@@ -821,33 +663,6 @@ class MovimentacaoTabUI(QWidget):
         else:
             os.system(f"xdg-open '{nome_arquivo}'")
 
-    def adicionar_marca_dagua_area(self, imagem, texto, x_inicio, x_fim, y_inicio, altura, fonte_path="arial.ttf", tamanho_fonte=30, opacidade=80, angulo=25):
-        try:
-            fonte = ImageFont.truetype(fonte_path, tamanho_fonte)
-        except IOError:
-            fonte = ImageFont.load_default()
-        marca = Image.new("RGBA", imagem.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(marca)
-
-        bbox = draw.textbbox((0, 0), texto, font=fonte)
-        texto_largura = bbox[2] - bbox[0]
-        texto_altura = bbox[3] - bbox[1]
-
-        step_x = texto_largura + 40
-        step_y = tamanho_fonte * 2
-
-        for y in range(int(y_inicio), int(y_inicio + altura), int(step_y)):
-            for x in range(int(x_inicio), int(x_fim), int(step_x)):
-                txt_img = Image.new("RGBA", (texto_largura + 20, texto_altura + 20), (255, 255, 255, 0))
-                txt_draw = ImageDraw.Draw(txt_img)
-                txt_draw.text((10, 10), texto, font=fonte, fill=(200, 200, 200, opacidade))
-                txt_img = txt_img.rotate(angulo, expand=1, resample=Image.BICUBIC)
-                px = int(x)
-                py = int(y)
-                marca.alpha_composite(txt_img, (px, py))
-        resultado = Image.alpha_composite(imagem.convert("RGBA"), marca)
-        return resultado.convert("RGB")
-
     def init_ui(self):
         layout_root = QHBoxLayout(self)
         layout_esq = QVBoxLayout()
@@ -872,6 +687,8 @@ class MovimentacaoTabUI(QWidget):
         if categoria_principal:
             self.combo_categoria.addItem(categoria_principal['nome'], categoria_principal['id'])
             self.combo_categoria.setCurrentIndex(1)
+            self.banco.executar(cache_referencia.obter_matriz_precos, categoria_principal['id'], recarregar=True,
+                                canal='precos')
         form_grid.addWidget(QLabel("Categoria"), 2, 0)
         form_grid.addWidget(self.combo_categoria, 2, 1)
 
@@ -997,13 +814,16 @@ class MovimentacaoTabUI(QWidget):
         layout_filtros.addWidget(btn_filtrar)
         layout_meio.addLayout(layout_filtros)
 
-        self.tabela_movimentacoes = QTableWidget()
-        self.tabela_movimentacoes.setColumnCount(6)
-        self.tabela_movimentacoes.setHorizontalHeaderLabels([
-            "ID", "Data", "Tipo", "Direção", "Descrição", "Valor Operação"
-        ])
-        self.tabela_movimentacoes.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela_movimentacoes.cellClicked.connect(self.mostrar_itens_movimentacao)
+        self.modelo_movimentacoes = TabelaModel([
+            Coluna("ID", "id"),
+            Coluna("Data", "data"),
+            Coluna("Tipo", lambda m: m["tipo"].capitalize()),
+            Coluna("Direção", lambda m: m["direcao"].capitalize() if m["direcao"] else ""),
+            Coluna("Descrição", "descricao"),
+            Coluna("Valor Operação", "valor_operacao", decimal),
+        ], self.locale, self)
+        self.tabela_movimentacoes = TabelaView(self.modelo_movimentacoes)
+        self.tabela_movimentacoes.clicked.connect(self.mostrar_itens_movimentacao)
         self.tabela_movimentacoes.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         layout_meio.addWidget(self.tabela_movimentacoes)
         layout_root.addLayout(layout_meio, 1)
@@ -1048,15 +868,11 @@ class MovimentacaoTabUI(QWidget):
         self.atualizar_total_movimentacao()
 
     def carregar_produtos(self):
+        self.banco.executar(self.listar_produtos, ao_concluir=self.preencher_produtos, canal='produtos')
+
+    def preencher_produtos(self, produtos):
         self.combo_produto.clear()
         self.combo_produto.setEditable(True)
-        with get_cursor() as cursor:
-            cursor.execute("""
-                SELECT p.id, p.nome, p.preco_base
-                FROM produtos p
-                ORDER BY p.nome
-            """)
-            produtos = cursor.fetchall()
         self.produtos = produtos
         self.combo_produto.addItem("", None)  # Insere um item vazio no topo, opcional
         for p in produtos:
@@ -1069,29 +885,18 @@ class MovimentacaoTabUI(QWidget):
             QMessageBox.warning(self, "Erro", "Selecione um produto e uma quantidade válida.")
             return
 
-        produto = next((p for p in self.produtos if p["id"] == produto_id), None)
-        if produto is None:
-            QMessageBox.critical(self, "Erro", "Produto não encontrado.")
-            return
-
         categoria_id = self.combo_categoria.currentData()
         if not categoria_id:
             QMessageBox.warning(self, "Erro", "Selecione uma categoria.")
             return
-        with get_cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT ajuste_fixo
-                FROM ajustes_fixos_produto_fornecedor_categoria
-                WHERE produto_id = %s AND categoria_id = %s
-                """,
-                (produto_id, categoria_id)
-            )
-            ajuste_row = cursor.fetchone()
-        ajuste_fixo = Decimal(str(ajuste_row["ajuste_fixo"])) if ajuste_row and "ajuste_fixo" in ajuste_row else Decimal("0.00")
 
-        preco_base = produto["preco_base"]
-        preco_unitario = Decimal(str(preco_base)) + ajuste_fixo
+        # A matriz de preços da categoria já foi carregada ao abrir a aba
+        produto = cache_referencia.obter_preco(categoria_id, produto_id)
+        if produto is None:
+            QMessageBox.critical(self, "Erro", "Produto não encontrado.")
+            return
+
+        preco_unitario = Decimal(str(produto["preco_final"]))
         total = quantidade * preco_unitario
 
         self.itens_movimentacao.append({
@@ -1165,84 +970,20 @@ class MovimentacaoTabUI(QWidget):
                 '0.00')
             valor_operacao = total - valor_abatimento
 
+        itens = list(self.itens_movimentacao) if tipo != "transação" else []
         if self.movimentacao_edit_id is not None:
-            movimentacao_id = self.movimentacao_edit_id
-            try:
-                with get_cursor(commit=True) as cursor:
-                    # UPDATE para o registro principal
-                    cursor.execute(
-                        "UPDATE movimentacoes SET data=%s, tipo=%s, direcao=%s, descricao=%s, valor_operacao=%s WHERE id=%s",
-                        (data, tipo, direcao, descricao, valor_operacao, movimentacao_id)
-                    )
-                    # Para compra/venda, atualize itens
-                    cursor.execute("DELETE FROM itens_movimentacao WHERE movimentacao_id = %s", (movimentacao_id,))
-                    if tipo != "transação":
-                        for item in self.itens_movimentacao:
-                            cursor.execute(
-                                "INSERT INTO itens_movimentacao (movimentacao_id, produto_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
-                                (movimentacao_id, item["produto_id"], item["quantidade"], item["preco"])
-                            )
-                    # Atualiza/insere/limpa abatimento, se houver
-                    cursor.execute("""
-                                   SELECT id
-                                   FROM movimentacoes
-                                   WHERE tipo = 'transação'
-                                     AND direcao = 'entrada'
-                                     AND descricao LIKE %s
-                                   """, (f"Abatimento automático referente à movimentação {movimentacao_id}",))
-                    abat = cursor.fetchone()
-                    if tipo != "transação" and valor_abatimento and valor_abatimento > 0:
-                        if abat:
-                            cursor.execute(
-                                "UPDATE movimentacoes SET data=%s, valor_operacao=%s WHERE id=%s",
-                                (data, valor_abatimento, abat['id'])
-                            )
-                        else:
-                            cursor.execute(
-                                "INSERT INTO movimentacoes (fornecedor_id, data, tipo, direcao, descricao, valor_operacao) VALUES (%s, %s, %s, %s, %s, %s)",
-                                (
-                                    self.fornecedor['id'],
-                                    data,
-                                    "transação",
-                                    "entrada",
-                                    f"Abatimento automático referente à movimentação {movimentacao_id}",
-                                    valor_abatimento
-                                )
-                            )
-                    elif abat:
-                        cursor.execute("DELETE FROM movimentacoes WHERE id=%s", (abat['id'],))
-                QMessageBox.information(self, "Sucesso", "Movimentação editada com sucesso.")
-            except Exception as e:
-                QMessageBox.critical(self, "Erro", f"Erro ao editar movimentação: {e}")
-            self.movimentacao_edit_id = None
+            self.banco.gravar(self, editar_movimentacao, self.fornecedor['id'], self.movimentacao_edit_id,
+                              data, tipo, direcao, descricao, valor_operacao, itens, valor_abatimento,
+                              ao_concluir=lambda _: self.movimentacao_gravada("Movimentação editada com sucesso."),
+                              ao_falhar=lambda e: QMessageBox.critical(self, "Erro", f"Erro ao editar movimentação: {e}"))
         else:
-            # Novo registro (inclusão)
-            with get_cursor(commit=True) as cursor:
-                cursor.execute(
-                    "INSERT INTO movimentacoes (fornecedor_id, data, tipo, direcao, descricao, valor_operacao) VALUES (%s, %s, %s, %s, %s, %s)",
-                    (self.fornecedor['id'], data, tipo, direcao, descricao, valor_operacao)
-                )
-                movimentacao_id = cursor.lastrowid
-                if tipo != "transação":
-                    for item in self.itens_movimentacao:
-                        cursor.execute(
-                            "INSERT INTO itens_movimentacao (movimentacao_id, produto_id, quantidade, preco_unitario) VALUES (%s, %s, %s, %s)",
-                            (movimentacao_id, item["produto_id"], item["quantidade"], item["preco"])
-                        )
-                    if valor_abatimento and valor_abatimento > 0:
-                        cursor.execute(
-                            "INSERT INTO movimentacoes (fornecedor_id, data, tipo, direcao, descricao, valor_operacao) VALUES (%s, %s, %s, %s, %s, %s)",
-                            (
-                                self.fornecedor['id'],
-                                data,
-                                "transação",
-                                "entrada",
-                                f"Abatimento automático referente à movimentação {movimentacao_id}",
-                                valor_abatimento
-                            )
-                        )
-            QMessageBox.information(self, "Sucesso", "Movimentação cadastrada com sucesso.")
+            self.banco.gravar(self, incluir_movimentacao, self.fornecedor['id'],
+                              data, tipo, direcao, descricao, valor_operacao, itens, valor_abatimento,
+                              ao_concluir=lambda _: self.movimentacao_gravada("Movimentação cadastrada com sucesso."))
 
+    def movimentacao_gravada(self, mensagem):
+        self.movimentacao_edit_id = None
+        QMessageBox.information(self, "Sucesso", mensagem)
         self.limpar_itens()
         self.input_valor_abatimento.clear()
         self.atualizar_tabela()
@@ -1251,36 +992,32 @@ class MovimentacaoTabUI(QWidget):
     def atualizar_tabela(self):
         data_de = self.filtro_data_de.date().toPython()
         data_ate = self.filtro_data_ate.date().toPython()
-        movimentacoes = self.listar_movimentacoes(data_de, data_ate)
-        self.tabela_movimentacoes.setRowCount(len(movimentacoes))
-        for i, m in enumerate(movimentacoes):
-            self.tabela_movimentacoes.setItem(i, 0, QTableWidgetItem(str(m["id"])))
-            self.tabela_movimentacoes.setItem(i, 1, QTableWidgetItem(str(m["data"])))
-            self.tabela_movimentacoes.setItem(i, 2, QTableWidgetItem(m["tipo"].capitalize()))
-            self.tabela_movimentacoes.setItem(i, 3, QTableWidgetItem(m["direcao"].capitalize() if m["direcao"] else ""))
-            self.tabela_movimentacoes.setItem(i, 4, QTableWidgetItem(m["descricao"] or ""))
-            valor_op = m.get("valor_operacao")
-            if valor_op is not None:
-                valor_op_str = decimal_para_str_brasil(valor_op, self.locale)
-            else:
-                valor_op_str = ""
-            self.tabela_movimentacoes.setItem(i, 5, QTableWidgetItem(valor_op_str))
+        self.banco.executar(self.listar_movimentacoes, data_de, data_ate,
+                            ao_concluir=self.preencher_tabela, canal='movimentacoes')
         self.atualiza_saldo_total()
 
+    def preencher_tabela(self, movimentacoes):
+        self.modelo_movimentacoes.definir_linhas(movimentacoes)
+
     def atualiza_saldo_total(self):
-        saldo = self.obter_saldo_total()
+        self.banco.executar(self.obter_saldo_total, ao_concluir=self.mostrar_saldo_total, canal='saldo')
+
+    def mostrar_saldo_total(self, saldo):
         self.label_saldo_total.setText(f"Saldo total: R$ {self.locale.toString(float(saldo), 'f', 2)}")
 
-    def mostrar_itens_movimentacao(self, row, col):
-        item = self.tabela_movimentacoes.item(row, 0)
-        if not item:
+    def mostrar_itens_movimentacao(self, index):
+        m = self.modelo_movimentacoes.linha(index.row())
+        if m is None:
             return
-        movimentacao_id = int(item.text())
-        tipo = self.tabela_movimentacoes.item(row, 2).text().lower()
-        if tipo == "transação":
+        movimentacao_id = m["id"]
+        if m["tipo"].lower() == "transação":
+            self.banco.cancelar('itens')
             self.tabela_itens.setRowCount(0)
             return
-        itens = self.listar_itens_movimentacao(movimentacao_id)
+        self.banco.executar(self.listar_itens_movimentacao, movimentacao_id,
+                            ao_concluir=self.preencher_itens_movimentacao, canal='itens')
+
+    def preencher_itens_movimentacao(self, itens):
         self.tabela_itens.setRowCount(len(itens))
         for i, item in enumerate(itens):
             self.tabela_itens.setItem(i, 0, QTableWidgetItem(item["produto_nome"]))
@@ -1295,21 +1032,33 @@ class MovimentacoesUI(QWidget):
     def __init__(self):
         super().__init__()
         self.locale = QLocale(QLocale.Portuguese, QLocale.Brazil)
-        self.fornecedores = self.listar_fornecedores()
+        self.fornecedores = []
+        self.banco = ExecutorBanco(self)
         self.init_ui()
+        self.banco.executar(self.listar_fornecedores, ao_concluir=self.preencher_fornecedores, canal='fornecedores')
 
     def listar_fornecedores(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome, fornecedores_numerobalanca FROM fornecedores ORDER BY nome")
-            return cursor.fetchall()
+        return cache_referencia.listar_fornecedores()
+
+    def preencher_fornecedores(self, fornecedores):
+        self.fornecedores = fornecedores
+        for f in self.fornecedores:
+            self.combo_fornecedor.addItem(f"{f['nome']} - Balança {f['fornecedores_numerobalanca']}", f['id'])
+
+    def buscar_fornecedor_por_numero_balanca(self, numero):
+        return cache_referencia.obter_fornecedor_por_balanca(numero)
 
     def selecionar_fornecedor_por_numero_balanca(self, campo_input: QLineEdit, combo_fornecedor: QComboBox):
         numero = campo_input.text().strip()
         if not numero:
             return
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id FROM fornecedores WHERE fornecedores_numerobalanca = %s", (numero,))
-            resultado = cursor.fetchone()
+        self.banco.executar(
+            self.buscar_fornecedor_por_numero_balanca, numero, canal='balanca',
+            ao_concluir=lambda resultado: self.aplicar_fornecedor_da_balanca(resultado, numero, campo_input,
+                                                                           combo_fornecedor)
+        )
+
+    def aplicar_fornecedor_da_balanca(self, resultado, numero, campo_input, combo_fornecedor):
         if resultado:
             idx = -1
             for i in range(combo_fornecedor.count()):
@@ -1332,8 +1081,6 @@ class MovimentacoesUI(QWidget):
         self.input_numero_balanca.setPlaceholderText("Número da balança")
         self.combo_fornecedor = QComboBox()
         self.combo_fornecedor.addItem("Selecione um fornecedor", None)
-        for f in self.fornecedores:
-            self.combo_fornecedor.addItem(f"{f['nome']} - Balança {f['fornecedores_numerobalanca']}", f['id'])
         row.addWidget(QLabel("Fornecedor:"))
         row.addWidget(self.combo_fornecedor)
         row.addWidget(QLabel("ou"))
@@ -0,0 +1,45 @@
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QSpinBox, QLabel
+from PySide6.QtGui import QFont
+import diagnostico_sql
+
+class PainelDiagnostico(QDialog):
+    """Comandos SQL com maior tempo total desde que o programa abriu (Ctrl+Shift+D na janela principal)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnóstico de consultas")
+        self.resize(1000, 600)
+
+        self.texto = QPlainTextEdit()
+        self.texto.setReadOnly(True)
+        self.texto.setFont(QFont("Courier New", 9))
+
+        self.input_limite = QSpinBox()
+        self.input_limite.setRange(5, 200)
+        self.input_limite.setValue(20)
+        self.input_limite.valueChanged.connect(self.atualizar)
+
+        btn_atualizar = QPushButton("Atualizar")
+        btn_atualizar.clicked.connect(self.atualizar)
+        btn_limpar = QPushButton("Zerar")
+        btn_limpar.clicked.connect(self.zerar)
+
+        barra = QHBoxLayout()
+        barra.addWidget(QLabel("Mostrar"))
+        barra.addWidget(self.input_limite)
+        barra.addStretch()
+        barra.addWidget(btn_atualizar)
+        barra.addWidget(btn_limpar)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(barra)
+        layout.addWidget(self.texto)
+        self.atualizar()
+
+    def atualizar(self):
+        resumos = diagnostico_sql.mais_pesados(self.input_limite.value())
+        self.texto.setPlainText(diagnostico_sql.formatar(resumos) if resumos else "Nenhum comando registrado ainda.")
+
+    def zerar(self):
+        diagnostico_sql.limpar()
+        self.atualizar()
@@ -1,16 +1,46 @@
 import sys
+from decimal import Decimal
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout,
-    QLineEdit, QMessageBox, QTableWidget, QTableWidgetItem, QHBoxLayout, QGridLayout
+    QLineEdit, QMessageBox, QHBoxLayout, QGridLayout
 )
 from PySide6.QtCore import Qt, QLocale
 from db_context import get_cursor
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, TabelaView, Coluna, decimal
+import cache_referencia
 from utils_permissoes import requer_permissao
+from eventos import eventos
+
+# Gravações: rodam fora da thread da interface (ExecutorBanco.gravar)
+def incluir_produto(nome, preco):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute(
+            "INSERT INTO produtos (nome, preco_base) VALUES (%s, %s)",
+            (nome, preco)
+        )
+        produto_id = cursor.lastrowid
+    cache_referencia.invalidar(cache_referencia.PRODUTOS, cache_referencia.PRECOS)
+    return produto_id
+
+def atualizar_produto(produto_id, nome, preco):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute(
+            "UPDATE produtos SET nome=%s, preco_base=%s WHERE id=%s",
+            (nome, preco, produto_id)
+        )
+    cache_referencia.invalidar(cache_referencia.PRODUTOS, cache_referencia.PRECOS)
+
+def excluir_produto(produto_id):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM produtos WHERE id = %s", (produto_id,))
+    cache_referencia.invalidar(cache_referencia.PRODUTOS, cache_referencia.PRECOS)
 
 class ProdutosUI(QWidget):
     def __init__(self):
         super().__init__()
         self.dado_selecionado = None
+        self.banco = ExecutorBanco(self)
         self.init_ui()
 
     def init_ui(self):
@@ -42,11 +72,13 @@ class ProdutosUI(QWidget):
         btn_layout.addWidget(self.btn_excluir)
         btn_layout.addWidget(self.btn_limpar)
 
-        self.tabela = QTableWidget()
-        self.tabela.setColumnCount(3)
-        self.tabela.setHorizontalHeaderLabels(['ID', 'Nome', 'Preço Base'])
-        self.tabela.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela.cellClicked.connect(self.carregar_dado_selecionado)
+        self.modelo = TabelaModel([
+            Coluna('ID', 'id'),
+            Coluna('Nome', 'nome'),
+            Coluna('Preço Base', 'preco_base', decimal),
+        ], QLocale(QLocale.Portuguese, QLocale.Brazil), self)
+        self.tabela = TabelaView(self.modelo)
+        self.tabela.clicked.connect(self.carregar_dado_selecionado)
 
         layout_principal.addLayout(form_layout)
         layout_principal.addLayout(btn_layout)
@@ -57,17 +89,10 @@ class ProdutosUI(QWidget):
         self.carregar_tabela()
 
     def carregar_tabela(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT * FROM produtos")
-            dados = cursor.fetchall()
-
-        locale = QLocale(QLocale.Portuguese, QLocale.Brazil)
-        self.tabela.setRowCount(len(dados))
-        for i, dado in enumerate(dados):
-            self.tabela.setItem(i, 0, QTableWidgetItem(str(dado['id'])))
-            self.tabela.setItem(i, 1, QTableWidgetItem(dado['nome']))
-            preco_formatado = locale.toString(float(dado['preco_base']), 'f', 2)
-            self.tabela.setItem(i, 2, QTableWidgetItem(preco_formatado))
+        self.banco.executar(cache_referencia.listar_produtos, ao_concluir=self.preencher_tabela, canal='tabela')
+
+    def preencher_tabela(self, dados):
+        self.modelo.definir_linhas(dados)
 
     @requer_permissao(['admin', 'gerente', 'operador'])
     def adicionar(self):
@@ -76,23 +101,26 @@ class ProdutosUI(QWidget):
 
         if nome and preco:
             try:
-                preco = float(preco.replace(',', '.'))
-                with get_cursor(commit=True) as cursor:
-                    cursor.execute(
-                        "INSERT INTO produtos (nome, preco_base) VALUES (%s, %s)",
-                        (nome, preco)
-                    )
-                self.carregar_tabela()
-                self.limpar()
+                preco = Decimal(str(float(preco.replace(',', '.'))))
             except ValueError:
                 QMessageBox.warning(self, 'Erro', 'Preço inválido. Use ponto ou vírgula para os decimais.')
+                return
+            self.banco.gravar(self, incluir_produto, nome, preco,
+                              ao_concluir=lambda produto_id: self.produto_incluido(produto_id, nome, preco))
         else:
             QMessageBox.warning(self, 'Campos obrigatórios', 'Preencha todos os campos.')
 
-    def carregar_dado_selecionado(self, row, column):
-        self.dado_selecionado = int(self.tabela.item(row, 0).text())
-        self.input_nome.setText(self.tabela.item(row, 1).text())
-        self.input_preco.setText(self.tabela.item(row, 2).text())
+    def produto_incluido(self, produto_id, nome, preco):
+        produto = {'id': produto_id, 'nome': nome, 'preco_base': preco}
+        self.modelo.inserir_linha(produto, self.modelo.posicao_ordenada(produto, lambda p: p['nome']))
+        eventos().produto_alterado.emit(produto_id)
+        self.limpar()
+
+    def carregar_dado_selecionado(self, index):
+        dado = self.modelo.linha(index.row())
+        self.dado_selecionado = dado['id']
+        self.input_nome.setText(dado['nome'])
+        self.input_preco.setText(self.modelo.index(index.row(), 2).data())
 
     @requer_permissao(['admin', 'gerente', 'operador'])
     def atualizar(self):
@@ -100,24 +128,34 @@ class ProdutosUI(QWidget):
             nome = self.input_nome.text()
             preco = self.input_preco.text()
             try:
-                preco = float(preco.replace(',', '.'))
-                with get_cursor(commit=True) as cursor:
-                    cursor.execute(
-                        "UPDATE produtos SET nome=%s, preco_base=%s WHERE id=%s",
-                        (nome, preco, self.dado_selecionado)
-                    )
-                self.carregar_tabela()
-                self.limpar()
+                preco = Decimal(str(float(preco.replace(',', '.'))))
             except ValueError:
                 QMessageBox.warning(self, 'Erro', 'Preço inválido. Use ponto ou vírgula para os decimais.')
+                return
+            produto_id = self.dado_selecionado
+            self.banco.gravar(self, atualizar_produto, produto_id, nome, preco,
+                              ao_concluir=lambda _: self.produto_atualizado(produto_id, nome, preco))
+
+    def produto_atualizado(self, produto_id, nome, preco):
+        row = self.modelo.encontrar(produto_id)
+        if row >= 0:
+            self.modelo.atualizar_linha(row, nome=nome, preco_base=preco)
+        eventos().produto_alterado.emit(produto_id)
+        self.limpar()
 
     @requer_permissao(['admin', 'gerente', 'operador'])
     def excluir(self):
         if self.dado_selecionado:
-            with get_cursor(commit=True) as cursor:
-                cursor.execute("DELETE FROM produtos WHERE id = %s", (self.dado_selecionado,))
-            self.carregar_tabela()
-            self.limpar()
+            produto_id = self.dado_selecionado
+            self.banco.gravar(self, excluir_produto, produto_id,
+                              ao_concluir=lambda _: self.produto_excluido(produto_id))
+
+    def produto_excluido(self, produto_id):
+        row = self.modelo.encontrar(produto_id)
+        if row >= 0:
+            self.modelo.remover_linha(row)
+        eventos().produto_alterado.emit(produto_id)
+        self.limpar()
 
     def limpar(self):
         self.dado_selecionado = None
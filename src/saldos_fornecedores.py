@@ -0,0 +1,82 @@
+from decimal import Decimal
+from db_context import get_cursor
+
+# Valor do lançamento com o sinal que ele tem no saldo devedor
+VALOR_COM_SINAL = "CASE WHEN tipo IN ('inclusao', 'adiantamento') THEN valor ELSE -valor END"
+
+def _recalcular(cursor, fornecedor_id=None):
+    query = f"""
+        INSERT INTO saldos_fornecedores (fornecedor_id, saldo)
+        SELECT fornecedor_id, COALESCE(SUM({VALOR_COM_SINAL}), 0)
+        FROM debitos_fornecedores
+    """
+    params = ()
+    if fornecedor_id is not None:
+        query += " WHERE fornecedor_id = %s"
+        params = (fornecedor_id,)
+    query += " GROUP BY fornecedor_id ON DUPLICATE KEY UPDATE saldo = VALUES(saldo)"
+    cursor.execute(query, params)
+
+def recalcular_todos(cursor):
+    """Preenche a tabela de saldos a partir de debitos_fornecedores; usada pela migração que a cria."""
+    cursor.execute("SELECT COUNT(*) AS n FROM saldos_fornecedores")
+    if cursor.fetchone()["n"] == 0:
+        _recalcular(cursor)
+
+def recalcular_saldos(fornecedor_id=None):
+    """Refaz o saldo guardado a partir dos lançamentos (todos ou de um fornecedor)."""
+    with get_cursor(commit=True) as cursor:
+        if fornecedor_id is not None:
+            cursor.execute("UPDATE saldos_fornecedores SET saldo = 0 WHERE fornecedor_id = %s", (fornecedor_id,))
+        else:
+            cursor.execute("UPDATE saldos_fornecedores SET saldo = 0")
+        _recalcular(cursor, fornecedor_id)
+
+def aplicar_lancamento(cursor, fornecedor_id, tipo, valor):
+    """Soma um lançamento novo ao saldo, no mesmo cursor (e transação) do INSERT.
+
+    `valor` deve ser o mesmo gravado em debitos_fornecedores.
+    """
+    delta = Decimal(str(valor))
+    if tipo not in ("inclusao", "adiantamento"):
+        delta = -delta
+    _somar(cursor, fornecedor_id, delta)
+
+def estornar_lancamentos(cursor, condicao, params):
+    """Desconta do saldo os lançamentos que satisfazem `condicao`; chamar antes do DELETE."""
+    cursor.execute(f"""
+        SELECT fornecedor_id, SUM({VALOR_COM_SINAL}) AS valor
+        FROM debitos_fornecedores
+        WHERE {condicao}
+        GROUP BY fornecedor_id
+    """, params)
+    for row in cursor.fetchall():
+        if row["valor"]:
+            _somar(cursor, row["fornecedor_id"], -Decimal(str(row["valor"])))
+
+def _somar(cursor, fornecedor_id, delta):
+    cursor.execute("""
+        INSERT INTO saldos_fornecedores (fornecedor_id, saldo) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE saldo = saldo + VALUES(saldo)
+    """, (fornecedor_id, delta))
+
+def obter_saldo(fornecedor_id):
+    with get_cursor() as cursor:
+        cursor.execute("SELECT saldo FROM saldos_fornecedores WHERE fornecedor_id = %s", (fornecedor_id,))
+        row = cursor.fetchone()
+    return Decimal(str(row["saldo"])) if row else Decimal('0.00')
+
+def obter_saldos(fornecedor_ids):
+    """Saldos de vários fornecedores numa consulta: {fornecedor_id: saldo}."""
+    ids = list(set(fornecedor_ids))
+    saldos = {fid: Decimal('0.00') for fid in ids}
+    if not ids:
+        return saldos
+    marcadores = ", ".join(["%s"] * len(ids))
+    with get_cursor() as cursor:
+        cursor.execute(
+            f"SELECT fornecedor_id, saldo FROM saldos_fornecedores WHERE fornecedor_id IN ({marcadores})", ids
+        )
+        for row in cursor.fetchall():
+            saldos[row["fornecedor_id"]] = Decimal(str(row["saldo"]))
+    return saldos
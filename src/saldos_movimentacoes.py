@@ -0,0 +1,160 @@
+from datetime import date
+from decimal import Decimal
+from db_context import get_cursor
+
+# Efeito de cada movimentação no saldo: compra e entrada somam, venda e saída subtraem.
+# Aceita as grafias com e sem acento, como remove_acento em movimentacoes.py.
+VALOR_COM_SINAL = """
+    CASE
+        WHEN LOWER(TRIM(m.tipo)) = 'compra' THEN COALESCE(m.valor_operacao, 0)
+        WHEN LOWER(TRIM(m.tipo)) = 'venda' THEN -COALESCE(m.valor_operacao, 0)
+        WHEN LOWER(TRIM(m.tipo)) IN ('transação', 'transacao') THEN
+            CASE
+                WHEN LOWER(TRIM(m.direcao)) = 'entrada' THEN COALESCE(m.valor_operacao, 0)
+                WHEN LOWER(TRIM(m.direcao)) IN ('saída', 'saida') THEN -COALESCE(m.valor_operacao, 0)
+                ELSE 0
+            END
+        ELSE 0
+    END
+"""
+TAMANHO_LOTE_EXTRATO = 500  # movimentações lidas do servidor por vez no extrato
+MES_DA_DATA = "DATE_SUB(DATE(m.data), INTERVAL DAYOFMONTH(m.data) - 1 DAY)"
+
+def _primeiro_dia(data):
+    return data.replace(day=1)
+
+def _mes_seguinte(mes):
+    return date(mes.year + 1, 1, 1) if mes.month == 12 else date(mes.year, mes.month + 1, 1)
+
+def _travar_fornecedor(cursor, fornecedor_id):
+    # Serializa quem grava fechamentos e quem os invalida para o mesmo fornecedor
+    cursor.execute("SELECT id FROM fornecedores WHERE id = %s FOR UPDATE", (fornecedor_id,))
+    cursor.fetchall()
+
+def invalidar(cursor, fornecedor_id, data):
+    """Descarta os fechamentos afetados por uma movimentação gravada/removida em `data`.
+
+    Deve rodar no mesmo cursor da escrita: a trava do fornecedor fica com a transação
+    até o commit, e atualizar_fechamentos espera por ela.
+    """
+    _travar_fornecedor(cursor, fornecedor_id)
+    cursor.execute(
+        "DELETE FROM saldos_movimentacoes_mensais WHERE fornecedor_id = %s AND mes >= %s",
+        (fornecedor_id, _primeiro_dia(data))
+    )
+
+def _ultimo_fechamento(cursor, fornecedor_id, antes_de):
+    cursor.execute("""
+        SELECT mes, saldo FROM saldos_movimentacoes_mensais
+        WHERE fornecedor_id = %s AND mes < %s
+        ORDER BY mes DESC LIMIT 1
+    """, (fornecedor_id, antes_de))
+    return cursor.fetchone()
+
+def _fechar_meses(cursor, fornecedor_id, ate_mes):
+    """Grava o saldo de fim de mês dos meses completos anteriores a `ate_mes` que faltam."""
+    fechamento = _ultimo_fechamento(cursor, fornecedor_id, ate_mes)
+    condicoes = "m.fornecedor_id = %s AND m.data < %s"
+    params = [fornecedor_id, ate_mes]
+    base = Decimal("0.00")
+    if fechamento:
+        inicio = _mes_seguinte(fechamento["mes"])
+        if inicio >= ate_mes:
+            return
+        condicoes += " AND m.data >= %s"
+        params.append(inicio)
+        base = fechamento["saldo"]
+    # Leitura simples (sem travas nas movimentações) e gravação em seguida; a trava do
+    # fornecedor, pega antes, garante que ninguém invalidou nada no meio
+    cursor.execute(f"""
+        SELECT mes, %s + SUM(SUM(valor)) OVER (ORDER BY mes) AS saldo
+        FROM (
+            SELECT {MES_DA_DATA} AS mes, {VALOR_COM_SINAL} AS valor
+            FROM movimentacoes m
+            WHERE {condicoes}
+        ) t
+        GROUP BY mes
+    """, [base] + params)
+    fechamentos = [(fornecedor_id, r["mes"], r["saldo"]) for r in cursor.fetchall()]
+    if fechamentos:
+        cursor.executemany("""
+            INSERT INTO saldos_movimentacoes_mensais (fornecedor_id, mes, saldo)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE saldo = VALUES(saldo)
+        """, fechamentos)
+
+def _saldo_antes(cursor, fornecedor_id, data_limite=None):
+    # O mês corrente ainda recebe lançamentos; só meses encerrados viram fechamento
+    ate_mes = _primeiro_dia(date.today())
+    if data_limite:
+        ate_mes = min(ate_mes, _primeiro_dia(data_limite))
+    fechamento = _ultimo_fechamento(cursor, fornecedor_id, ate_mes)
+
+    query = f"SELECT COALESCE(SUM({VALOR_COM_SINAL}), 0) AS valor FROM movimentacoes m WHERE m.fornecedor_id = %s"
+    params = [fornecedor_id]
+    if fechamento:
+        query += " AND m.data >= %s"
+        params.append(_mes_seguinte(fechamento["mes"]))
+    if data_limite:
+        query += " AND m.data < %s"
+        params.append(data_limite)
+    cursor.execute(query, params)
+    base = fechamento["saldo"] if fechamento else Decimal("0.00")
+    return Decimal(str(base)) + Decimal(str(cursor.fetchone()["valor"]))
+
+def atualizar_fechamentos(fornecedor_id):
+    """Grava os fechamentos que faltam dos meses já encerrados do fornecedor.
+
+    Passo de escrita à parte da leitura: com a linha do fornecedor travada (a mesma trava
+    que invalidar() pega nas escritas), os saldos saem só de dados já confirmados e nenhuma
+    invalidação acontece entre o cálculo e o commit.
+    """
+    with get_cursor(commit=True) as cursor:
+        _travar_fornecedor(cursor, fornecedor_id)
+        _fechar_meses(cursor, fornecedor_id, _primeiro_dia(date.today()))
+
+def obter_saldo_ate(fornecedor_id, data_limite=None):
+    """Saldo das movimentações anteriores a `data_limite` (todas, se None).
+
+    Só lê: parte do último fechamento mensal guardado e soma as movimentações mais novas.
+    """
+    with get_cursor() as cursor:
+        return _saldo_antes(cursor, fornecedor_id, data_limite)
+
+def listar_extrato(fornecedor_id, data_de, data_ate, saldo_inicial):
+    """Movimentações do período em lotes (listas) de até TAMANHO_LOTE_EXTRATO, lidos do
+    servidor conforme a iteração avança.
+
+    Cada movimentação traz na coluna `saldo` o saldo acumulado após ela, partindo de
+    `saldo_inicial` (obter_saldo_ate(fornecedor_id, data_de)). A conexão fica ocupada
+    até o fim da iteração.
+    """
+    with get_cursor() as cursor:
+        cursor.execute(f"""
+            SELECT m.id,
+                   m.data,
+                   f.nome AS fornecedor,
+                   f.fornecedores_numerobalanca,
+                   m.tipo,
+                   m.direcao,
+                   m.descricao,
+                   m.valor_operacao,
+                   %s + SUM({VALOR_COM_SINAL}) OVER (
+                       ORDER BY m.data, m.id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS saldo
+            FROM movimentacoes m
+                     JOIN fornecedores f ON m.fornecedor_id = f.id
+            WHERE m.fornecedor_id = %s
+              AND m.data >= %s
+              AND m.data <= %s
+            ORDER BY m.data, m.id
+        """, (saldo_inicial, fornecedor_id, data_de, data_ate))
+        lote = cursor.fetchmany(TAMANHO_LOTE_EXTRATO)
+        try:
+            while lote:
+                yield lote
+                lote = cursor.fetchmany(TAMANHO_LOTE_EXTRATO)
+        finally:
+            # Iteração interrompida: o conector não fecha o cursor com linhas por ler
+            while lote:
+                lote = cursor.fetchmany(TAMANHO_LOTE_EXTRATO)
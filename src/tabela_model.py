@@ -0,0 +1,192 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex, QLocale
+from PySide6.QtWidgets import QTableView, QAbstractItemView
+
+# Tabelas das telas de listagem: as linhas ficam como vieram do banco (dicionários) e o texto
+# de cada célula só é montado em data(), quando a view pede — ou seja, para as linhas visíveis.
+
+def texto(valor, locale):
+    return "" if valor is None else str(valor)
+
+def decimal(valor, locale):
+    return "" if valor is None else locale.toString(float(valor), 'f', 2)
+
+def moeda(valor, locale):
+    return "" if valor is None else "R$ " + locale.toString(float(valor), 'f', 2)
+
+def sim_nao(valor, locale):
+    return "Sim" if valor else "Não"
+
+def _posicao(linhas, valor, chave, decrescente, inicio=0):
+    """Busca binária: primeira posição a partir de `inicio` cuja chave vem depois de `valor`."""
+    fim = len(linhas)
+    while inicio < fim:
+        meio = (inicio + fim) // 2
+        atual = chave(linhas[meio])
+        if (atual < valor) if decrescente else (atual > valor):
+            fim = meio
+        else:
+            inicio = meio + 1
+    return inicio
+
+class Coluna:
+    """Coluna de um TabelaModel.
+
+    `chave` é o campo da linha ou uma função que recebe a linha; `formato` recebe
+    (valor, locale) e devolve o texto mostrado.
+    """
+
+    def __init__(self, titulo, chave, formato=texto, alinhamento=None):
+        self.titulo = titulo
+        self.chave = chave
+        self.formato = formato
+        if alinhamento is None and formato in (decimal, moeda):
+            alinhamento = Qt.AlignRight | Qt.AlignVCenter
+        self.alinhamento = alinhamento
+
+    def valor(self, linha):
+        return self.chave(linha) if callable(self.chave) else linha.get(self.chave)
+
+class TabelaModel(QAbstractTableModel):
+    """Modelo somente leitura sobre uma lista de dicionários.
+
+    EditRole devolve o valor cru da coluna (o que a ordenação usa); DisplayRole, o texto formatado.
+    """
+
+    def __init__(self, colunas, locale=None, parent=None):
+        super().__init__(parent)
+        self.colunas = colunas
+        self.locale = locale or QLocale()
+        self._linhas = []
+
+    # ---- Dados ----
+
+    def definir_linhas(self, linhas):
+        self.beginResetModel()
+        self._linhas = list(linhas)
+        self.endResetModel()
+
+    def linhas(self):
+        return self._linhas
+
+    def linha(self, row):
+        if 0 <= row < len(self._linhas):
+            return self._linhas[row]
+        return None
+
+    def encontrar(self, valor, chave='id'):
+        """Índice da primeira linha com linha[chave] == valor, ou -1."""
+        for row, linha in enumerate(self._linhas):
+            if linha.get(chave) == valor:
+                return row
+        return -1
+
+    def atualizar_linha(self, row, **campos):
+        """Altera campos de uma linha no lugar e avisa a view só daquela linha."""
+        self._linhas[row].update(campos)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.colunas) - 1))
+
+    def inserir_linha(self, linha, row=None):
+        row = len(self._linhas) if row is None else row
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._linhas.insert(row, linha)
+        self.endInsertRows()
+
+    def remover_linha(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._linhas[row]
+        self.endRemoveRows()
+
+    def posicao_ordenada(self, linha, chave, decrescente=False):
+        """Onde `linha` entra numa lista que já está ordenada por chave(linha) (depois das iguais)."""
+        return _posicao(self._linhas, chave(linha), chave, decrescente)
+
+    def substituir_linhas(self, pertence, novas, chave, decrescente=False):
+        """Troca só as linhas em que pertence(linha) é verdadeiro pelas `novas`, cada uma na sua posição.
+
+        Uma passada sobre a lista (já ordenada por chave), busca binária para cada linha nova e
+        um único aviso de layout para a view; seleção e linha atual acompanham as que ficaram.
+        """
+        antigas = self._linhas
+        restantes = [linha for linha in antigas if not pertence(linha)]
+        linhas, inicio = [], 0
+        for linha in sorted(novas, key=chave, reverse=decrescente):
+            fim = _posicao(restantes, chave(linha), chave, decrescente, inicio)
+            linhas.extend(restantes[inicio:fim])
+            linhas.append(linha)
+            inicio = fim
+        linhas.extend(restantes[inicio:])
+
+        self.layoutAboutToBeChanged.emit()
+        self._linhas = linhas
+        persistentes = self.persistentIndexList()
+        novos = []
+        for indice in persistentes:
+            linha = antigas[indice.row()]
+            row = None if pertence(linha) else _posicao(linhas, chave(linha), chave, decrescente) - 1
+            while row is not None and linhas[row] is not linha:
+                row -= 1  # entre chaves iguais, procura a própria linha
+            novos.append(QModelIndex() if row is None else self.index(row, indice.column()))
+        self.changePersistentIndexList(persistentes, novos)
+        self.layoutChanged.emit()
+
+    # ---- Interface do QAbstractTableModel ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._linhas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.colunas)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.colunas[section].titulo
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        coluna = self.colunas[index.column()]
+        if role == Qt.DisplayRole:
+            return coluna.formato(coluna.valor(self._linhas[index.row()]), self.locale)
+        if role == Qt.EditRole:
+            return coluna.valor(self._linhas[index.row()])
+        if role == Qt.TextAlignmentRole:
+            return coluna.alinhamento
+        return None
+
+    def chave_ordenacao(self, column):
+        """Chave de sort() para a coluna: valores vazios ficam por último na ordem crescente."""
+        coluna = self.colunas[column]
+
+        def chave(linha):
+            valor = coluna.valor(linha)
+            return (valor is None, valor if valor is not None else 0)
+        return chave
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._linhas.sort(key=self.chave_ordenacao(column), reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+class TabelaView(QTableView):
+    """QTableView com seleção por linha, como as QTableWidget que as telas usavam."""
+
+    def __init__(self, model=None, parent=None):
+        super().__init__(parent)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        if model is not None:
+            self.setModel(model)
+
+    def linha(self, index):
+        """Linha (dicionário) de um índice da view, passando pelo proxy de filtro se houver."""
+        model = self.model()
+        while isinstance(model, QAbstractProxyModel):
+            index = model.mapToSource(index)
+            model = model.sourceModel()
+        return model.linha(index.row()) if index.isValid() else None
+
+    def linha_atual(self):
+        """Linha (dicionário) selecionada, ou None."""
+        return self.linha(self.currentIndex())
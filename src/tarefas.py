@@ -0,0 +1,139 @@
+import traceback
+from itertools import count
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtWidgets import QMessageBox
+
+MAX_TAREFAS_SIMULTANEAS = 4  # teto; o pool de conexões ativo pode baixar (limitar_ao_pool_conexoes)
+
+_pool_threads = None
+_max_threads = MAX_TAREFAS_SIMULTANEAS
+
+def pool_threads():
+    global _pool_threads
+    if _pool_threads is None:
+        _pool_threads = QThreadPool()
+        _pool_threads.setMaxThreadCount(_max_threads)
+    return _pool_threads
+
+def limitar_ao_pool_conexoes(tamanho):
+    """Deixa no máximo `tamanho` - 1 tarefas simultâneas: uma conexão do pool fica livre
+    para a thread da interface, senão um transacao() nela espera o timeout do pool."""
+    global _max_threads
+    _max_threads = max(1, min(MAX_TAREFAS_SIMULTANEAS, tamanho - 1))
+    if _pool_threads is not None:
+        _pool_threads.setMaxThreadCount(_max_threads)
+
+class _Tarefa(QRunnable):
+    def __init__(self, executor, token, funcao, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.executor = executor
+        self.token = token
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            resultado = self.funcao(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self._avisar(False, e)
+        else:
+            self._avisar(True, resultado)
+
+    def _avisar(self, ok, valor):
+        try:
+            self.executor._terminou.emit(self.token, ok, valor)
+        except RuntimeError:
+            pass  # a tela dona do executor foi destruída (ex.: troca de banco); ninguém espera o resultado
+
+class ExecutorBanco(QObject):
+    """Roda funções de acesso ao banco fora da thread da interface.
+
+    O resultado volta pela thread da interface em `ao_concluir(resultado)`.
+    Tarefas do mesmo `canal` se substituem: ao pedir uma nova, a anterior
+    que ainda não começou é descartada, e o resultado de uma que já estava
+    rodando é ignorado. Assim, trocar filtros depressa só aplica o último.
+    """
+
+    _terminou = Signal(object, bool, object)
+    ocupado = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tokens = count(1)
+        self._tarefas = {}  # token -> (_Tarefa, canal, ao_concluir, ao_falhar)
+        self._atual_por_canal = {}  # canal -> token mais recente
+        self._terminou.connect(self._entregar)
+
+    def executar(self, funcao, *args, ao_concluir=None, ao_falhar=None, canal=None, **kwargs):
+        token = next(self._tokens)
+        tarefa = _Tarefa(self, token, funcao, args, kwargs)
+        if canal is not None:
+            anterior = self._atual_por_canal.get(canal)
+            if anterior in self._tarefas and pool_threads().tryTake(self._tarefas[anterior][0]):
+                del self._tarefas[anterior]
+            self._atual_por_canal[canal] = token
+        self._tarefas[token] = (tarefa, canal, ao_concluir, ao_falhar)
+        if len(self._tarefas) == 1:
+            self.ocupado.emit(True)
+        pool_threads().start(tarefa)
+        return token
+
+    def gravar(self, widget, funcao, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        """Como executar(), com `widget` desabilitado até a gravação terminar.
+
+        Evita um segundo clique (gravação em dobro) e edições no formulário que
+        a gravação em andamento não veria. Sem `canal`: uma tarefa descartada
+        deixaria o widget desabilitado.
+        """
+        widget.setEnabled(False)
+
+        def concluir(resultado):
+            widget.setEnabled(True)
+            if ao_concluir:
+                ao_concluir(resultado)
+
+        def falhar(erro):
+            widget.setEnabled(True)
+            (ao_falhar or self.ao_falhar_padrao)(erro)
+
+        return self.executar(funcao, *args, ao_concluir=concluir, ao_falhar=falhar, **kwargs)
+
+    def cancelar(self, canal):
+        """Descarta o que estiver pendente no canal; resultados atrasados são ignorados."""
+        token = self._atual_por_canal.pop(canal, None)
+        if token in self._tarefas and pool_threads().tryTake(self._tarefas[token][0]):
+            self._remover(token)
+
+    def pendente(self, canal):
+        return self._atual_por_canal.get(canal) in self._tarefas
+
+    def _remover(self, token):
+        self._tarefas.pop(token, None)
+        if not self._tarefas:
+            self.ocupado.emit(False)
+
+    def _entregar(self, token, ok, valor):
+        if token not in self._tarefas:
+            return
+        _, canal, ao_concluir, ao_falhar = self._tarefas[token]
+        self._remover(token)
+        if canal is not None:
+            if self._atual_por_canal.get(canal) != token:
+                return  # chegou depois de uma tarefa mais nova do mesmo canal
+            del self._atual_por_canal[canal]
+        if ok:
+            if ao_concluir:
+                ao_concluir(valor)
+        elif ao_falhar:
+            ao_falhar(valor)
+        else:
+            self.ao_falhar_padrao(valor)
+
+    def ao_falhar_padrao(self, erro):
+        janela = self.parent()
+        while janela is not None and not janela.isWidgetType():
+            janela = janela.parent()
+        QMessageBox.warning(janela, "Erro", f"Erro ao acessar o banco de dados:\n{erro}")
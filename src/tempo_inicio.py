@@ -0,0 +1,121 @@
+"""Quanto tempo o programa leva até mostrar o login, e com o quê.
+
+    python main.py --tempo-inicio               # imprime o relatório quando o login aparece
+    python main.py --tempo-inicio=inicio.json   # grava em JSON (usado pelos benchmarks)
+    python main.py --tempo-inicio --sair-no-login
+
+Com a opção ligada, cada módulo importado depois de main.py é cronometrado como no
+`python -X importtime`: tempo próprio e acumulado (com o que ele importou). Além disso,
+main() marca etapas (QApplication, configuração, login) com o tempo desde o início.
+"""
+import json
+import sys
+import threading
+import time
+
+OPCAO = '--tempo-inicio'
+OPCAO_SAIR = '--sair-no-login'
+
+_inicio = time.perf_counter()
+_ligado = False
+_arquivo = None
+_etapas = []        # (nome, ms desde o início)
+_importacoes = []   # (módulo, ms próprio, ms acumulado, profundidade)
+_pilhas = threading.local()
+
+class _LoaderMedido:
+    """Repassa ao loader original, cronometrando exec_module."""
+
+    def __init__(self, loader, nome):
+        self._loader = loader
+        self._nome = nome
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        pilha = getattr(_pilhas, 'pilha', None)
+        if pilha is None:
+            pilha = _pilhas.pilha = []
+        pilha.append(0.0)
+        inicio = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - inicio
+            filhos = pilha.pop()
+            if pilha:
+                pilha[-1] += total
+            _importacoes.append((self._nome, (total - filhos) * 1000, total * 1000, len(pilha)))
+
+    def __getattr__(self, nome):
+        return getattr(self._loader, nome)
+
+class _Cronometro:
+    """Finder que pergunta aos outros finders e embrulha o loader encontrado."""
+
+    def find_spec(self, nome, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(nome, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _LoaderMedido(spec.loader, nome)
+        return spec
+
+def ligar_se_pedido(argv):
+    """Liga a medição se `--tempo-inicio[=arquivo]` estiver em argv. Devolve se ligou."""
+    global _ligado, _arquivo
+    for arg in argv[1:]:
+        if arg == OPCAO or arg.startswith(OPCAO + '='):
+            _arquivo = arg.partition('=')[2] or None
+            _ligado = True
+    if _ligado and not any(isinstance(f, _Cronometro) for f in sys.meta_path):
+        sys.meta_path.insert(0, _Cronometro())
+    return _ligado
+
+def ligado():
+    return _ligado
+
+def sair_no_login(argv):
+    return OPCAO_SAIR in argv[1:]
+
+def marcar(etapa):
+    if _ligado:
+        _etapas.append((etapa, (time.perf_counter() - _inicio) * 1000))
+
+def relatorio(limite=30):
+    """Etapas e as importações mais caras por tempo acumulado."""
+    mais_caras = sorted(_importacoes, key=lambda i: i[2], reverse=True)[:limite]
+    return {
+        'etapas': [{'etapa': nome, 'ms': round(ms, 1)} for nome, ms in _etapas],
+        'modulos_importados': len(_importacoes),
+        'importacoes_ms': round(sum(i[1] for i in _importacoes), 1),
+        'mais_caras': [
+            {'modulo': nome, 'proprio_ms': round(proprio, 2), 'acumulado_ms': round(acumulado, 2)}
+            for nome, proprio, acumulado, _ in mais_caras
+        ],
+    }
+
+def formatar(dados):
+    linhas = ["Etapas (ms desde o início):"]
+    linhas += [f"{e['ms']:>10.1f}  {e['etapa']}" for e in dados['etapas']]
+    linhas.append(f"\n{dados['modulos_importados']} módulos importados em {dados['importacoes_ms']:.1f} ms")
+    linhas.append(f"{'próprio':>10} | {'acumulado':>10} | módulo")
+    linhas += [f"{i['proprio_ms']:>10.1f} | {i['acumulado_ms']:>10.1f} | {i['modulo']}" for i in dados['mais_caras']]
+    return "\n".join(linhas)
+
+def concluir():
+    """Grava ou imprime o relatório (chamado quando o login aparece)."""
+    if not _ligado:
+        return
+    dados = relatorio()
+    if _arquivo:
+        with open(_arquivo, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+    else:
+        print(formatar(dados), file=sys.stderr)
@@ -1,17 +1,40 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton,
-    QTableWidget, QTableWidgetItem, QMessageBox, QCheckBox
+    QMessageBox, QCheckBox
 )
 from utils_permissoes import requer_permissao
 from db_context import get_cursor
+from tarefas import ExecutorBanco
+from tabela_model import TabelaModel, TabelaView, Coluna, sim_nao
 from auth_utils import hash_senha
 
 NIVEIS = ["admin", "gerente", "operador", "consulta"]
 
+def listar_usuarios():
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id, nome, username, nivel, ativo FROM usuarios")
+        return cursor.fetchall()
+
+def cadastrar_usuario(nome, usuario, senha, nivel, ativo):
+    """Grava o usuário e devolve a linha da tabela; None se o login já existe. Roda fora da
+    thread da interface: o hash da senha é lento de propósito."""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("SELECT id FROM usuarios WHERE username = %s", (usuario,))
+        if cursor.fetchone():
+            return None
+
+        senha_hash = hash_senha(senha)
+        cursor.execute(
+            "INSERT INTO usuarios (username, senha_hash, nome, nivel, ativo) VALUES (%s, %s, %s, %s, %s)",
+            (usuario, senha_hash, nome, nivel, ativo)
+        )
+        return {"id": cursor.lastrowid, "nome": nome, "username": usuario, "nivel": nivel, "ativo": ativo}
+
 class UsuariosUI(QWidget):
     def __init__(self, usuario_logado):
         super().__init__()
         self.usuario_logado = usuario_logado
+        self.banco = ExecutorBanco(self)
         self.setWindowTitle("Gestão de Usuários")
         layout = QVBoxLayout(self)
         self.setLayout(layout)
@@ -45,9 +68,14 @@ class UsuariosUI(QWidget):
 
         layout.addLayout(form)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "Nome", "Usuário", "Nível", "Ativo"])
+        self.modelo = TabelaModel([
+            Coluna("ID", "id"),
+            Coluna("Nome", "nome"),
+            Coluna("Usuário", "username"),
+            Coluna("Nível", "nivel"),
+            Coluna("Ativo", "ativo", sim_nao),
+        ], parent=self)
+        self.table = TabelaView(self.modelo)
         layout.addWidget(self.table)
 
         self.carregar_usuarios()
@@ -64,34 +92,25 @@ class UsuariosUI(QWidget):
             QMessageBox.warning(self, "Erro", "Preencha todos os campos.")
             return
 
-        with get_cursor(commit=True) as cursor:
-            cursor.execute("SELECT id FROM usuarios WHERE username = %s", (usuario,))
-            if cursor.fetchone():
-                QMessageBox.warning(self, "Erro", "Já existe um usuário com esse login.")
-                return
-
-            senha_hash = hash_senha(senha)
-            cursor.execute(
-                "INSERT INTO usuarios (username, senha_hash, nome, nivel, ativo) VALUES (%s, %s, %s, %s, %s)",
-                (usuario, senha_hash, nome, nivel, ativo)
-            )
+        self.banco.gravar(self, cadastrar_usuario, nome, usuario, senha, nivel, ativo,
+                          ao_concluir=self.usuario_cadastrado)
+
+    def usuario_cadastrado(self, novo):
+        if novo is None:
+            QMessageBox.warning(self, "Erro", "Já existe um usuário com esse login.")
+            return
         self.input_nome.clear()
         self.input_usuario.clear()
         self.input_senha.clear()
         self.combo_nivel.setCurrentIndex(0)
         self.check_ativo.setChecked(True)
-        self.carregar_usuarios()
+        # Só a linha nova entra na tabela; não precisa reler a lista
+        self.modelo.inserir_linha(novo)
         QMessageBox.information(self, "Sucesso", "Usuário cadastrado!")
 
     @requer_permissao(['admin'])
     def carregar_usuarios(self):
-        with get_cursor() as cursor:
-            cursor.execute("SELECT id, nome, username, nivel, ativo FROM usuarios")
-            usuarios = cursor.fetchall()
-        self.table.setRowCount(len(usuarios))
-        for i, user in enumerate(usuarios):
-            self.table.setItem(i, 0, QTableWidgetItem(str(user["id"])))
-            self.table.setItem(i, 1, QTableWidgetItem(user["nome"]))
-            self.table.setItem(i, 2, QTableWidgetItem(user["username"]))
-            self.table.setItem(i, 3, QTableWidgetItem(user["nivel"]))
-            self.table.setItem(i, 4, QTableWidgetItem("Sim" if user["ativo"] else "Não"))
\ No newline at end of file
+        self.banco.executar(listar_usuarios, ao_concluir=self.preencher_tabela, canal='usuarios')
+
+    def preencher_tabela(self, usuarios):
+        self.modelo.definir_linhas(usuarios)
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do programa importam uns aos outros pelo nome, a partir de src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
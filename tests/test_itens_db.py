@@ -0,0 +1,123 @@
+import re
+from decimal import Decimal
+
+from itens_db import sincronizar_itens
+
+class CursorFalso:
+    """Tabela de itens em memória que entende os comandos gerados por itens_db.
+
+    `leitura` substitui o que o SELECT devolve, para simular linhas alteradas
+    por outra estação entre a leitura e a escrita.
+    """
+
+    def __init__(self, linhas, leitura=None):
+        self.linhas = [dict(l) for l in linhas]
+        self.leitura = leitura
+        self.comandos = []
+        self.rowcount = 0
+        self._resultado = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.comandos.append(sql.split()[0])
+        if sql.startswith("SELECT"):
+            linhas = self.leitura if self.leitura is not None else self.linhas
+            self._resultado = [
+                {'produto_id': l['produto_id'], 'quantidade': l['quantidade'], 'preco_unitario': l['preco_unitario']}
+                for l in linhas if l['compra_id'] == params[0]
+            ]
+        elif sql.startswith("DELETE") and "LIMIT" not in sql:
+            antes = len(self.linhas)
+            self.linhas = [l for l in self.linhas if l['compra_id'] != params[0]]
+            self.rowcount = antes - len(self.linhas)
+        else:
+            raise AssertionError(f"comando inesperado: {sql}")
+
+    def executemany(self, sql, seq_params):
+        sql = " ".join(sql.split())
+        self.comandos.append(sql.split()[0])
+        self.rowcount = 0
+        for params in seq_params:
+            if sql.startswith("INSERT"):
+                compra_id, produto_id, quantidade, preco = params
+                self.linhas.append(self._linha(compra_id, produto_id, quantidade, preco))
+                self.rowcount += 1
+            elif sql.startswith("UPDATE"):
+                quantidade, preco = params[:2]
+                linha = self._localizar(*params[2:])
+                if linha is not None:
+                    linha.update(quantidade=quantidade, preco_unitario=preco)
+                    self.rowcount += 1
+            elif sql.startswith("DELETE") and re.search(r"LIMIT 1$", sql):
+                linha = self._localizar(*params)
+                if linha is not None:
+                    self.linhas.remove(linha)
+                    self.rowcount += 1
+            else:
+                raise AssertionError(f"comando inesperado: {sql}")
+
+    def fetchall(self):
+        return self._resultado
+
+    def _localizar(self, compra_id, produto_id, quantidade, preco):
+        for linha in self.linhas:
+            if (linha['compra_id'], linha['produto_id'], linha['quantidade'], linha['preco_unitario']) == \
+                    (compra_id, produto_id, quantidade, preco):
+                return linha
+        return None
+
+    @staticmethod
+    def _linha(compra_id, produto_id, quantidade, preco):
+        return {'compra_id': compra_id, 'produto_id': produto_id,
+                'quantidade': Decimal(str(quantidade)), 'preco_unitario': Decimal(str(preco))}
+
+def _linhas(compra_id, *itens):
+    return [CursorFalso._linha(compra_id, *item) for item in itens]
+
+def _itens(*itens):
+    return [{'produto_id': p, 'quantidade': q, 'preco': preco} for p, q, preco in itens]
+
+def _conteudo(cursor, compra_id=1):
+    return sorted(
+        (l['produto_id'], l['quantidade'], l['preco_unitario']) for l in cursor.linhas if l['compra_id'] == compra_id
+    )
+
+def _sincronizar(cursor, itens):
+    sincronizar_itens(cursor, 'itens_compra', 'compra_id', 1, itens)
+
+def test_sem_mudancas_so_le():
+    cursor = CursorFalso(_linhas(1, (10, 2, "5.00"), (11, 1, "3.50")))
+    _sincronizar(cursor, _itens((11, 1, 3.5), (10, 2, 5)))
+    assert cursor.comandos == ["SELECT"]
+
+def test_linhas_repetidas_contam_pela_quantidade_de_copias():
+    cursor = CursorFalso(_linhas(1, (10, 2, "5.00"), (10, 2, "5.00"), (10, 2, "5.00")))
+    _sincronizar(cursor, _itens((10, 2, "5.00")))
+    assert cursor.comandos == ["SELECT", "DELETE"]
+    assert _conteudo(cursor) == [(10, Decimal("2"), Decimal("5.00"))]
+
+def test_mesmo_produto_alterado_vira_update():
+    cursor = CursorFalso(_linhas(1, (10, 2, "5.00"), (11, 1, "3.50")))
+    _sincronizar(cursor, _itens((10, 3, "5.00"), (11, 1, "3.50")))
+    assert cursor.comandos == ["SELECT", "UPDATE"]
+    assert _conteudo(cursor) == [(10, Decimal("3"), Decimal("5.00")), (11, Decimal("1"), Decimal("3.50"))]
+
+def test_produto_trocado_vira_delete_e_insert():
+    cursor = CursorFalso(_linhas(1, (10, 2, "5.00")) + _linhas(2, (10, 2, "5.00")))
+    _sincronizar(cursor, _itens((12, 2, "5.00")))
+    assert cursor.comandos == ["SELECT", "DELETE", "INSERT"]
+    assert _conteudo(cursor) == [(12, Decimal("2"), Decimal("5.00"))]
+    assert _conteudo(cursor, 2) == [(10, Decimal("2"), Decimal("5.00"))]  # outra compra intocada
+
+def test_preco_arredondado_como_na_coluna_nao_conta_como_mudanca():
+    cursor = CursorFalso(_linhas(1, (10, 2, "5.01")))
+    _sincronizar(cursor, _itens((10, 2, 5.005)))
+    assert cursor.comandos == ["SELECT"]
+
+def test_linha_nao_localizada_regrava_tudo():
+    # Outra estação mudou a linha depois do SELECT: o UPDATE não acha o que leu
+    leitura = _linhas(1, (10, 2, "5.00"))
+    cursor = CursorFalso(_linhas(1, (10, 4, "5.00")), leitura=leitura)
+    _sincronizar(cursor, _itens((10, 3, "5.00"), (11, 1, "1.00")))
+    assert cursor.comandos == ["SELECT", "UPDATE", "DELETE", "INSERT"]
+    assert _conteudo(cursor) == [(10, Decimal("3"), Decimal("5.00")), (11, Decimal("1"), Decimal("1.00"))]